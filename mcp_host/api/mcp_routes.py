@@ -1,74 +1,179 @@
 from fastapi import APIRouter, HTTPException, Body, Request
 from sse_starlette.sse import EventSourceResponse
 try:
-    from services.process_manager import mcp_manager
-    from services.stdio_client import StdioRpcClient
+    from services.atomic_file import atomic_write
+    from services.client_pool import ClientPool
+    from services.process_manager import mcp_manager, replica_count
+    from services.skill_loader import DEPENDENCIES_CHANGED, RELOAD_METHOD
+    from services.skill_watcher import SkillWatcher
+    from services.stdio_client import RpcError, StdioRpcClient
+    from services.tool_registry import tool_registry
 except ImportError:
-    from ..services.process_manager import mcp_manager
-    from ..services.stdio_client import StdioRpcClient
-from typing import Dict, Any, List
+    from ..services.atomic_file import atomic_write
+    from ..services.client_pool import ClientPool
+    from ..services.process_manager import mcp_manager, replica_count
+    from ..services.skill_loader import DEPENDENCIES_CHANGED, RELOAD_METHOD
+    from ..services.skill_watcher import SkillWatcher
+    from ..services.stdio_client import RpcError, StdioRpcClient
+    from ..services.tool_registry import tool_registry
+from typing import Dict, Any, List, Optional, Set
 import asyncio
 import json
 import logging
 import os
+import time
 from pathlib import Path
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-clients: Dict[str, StdioRpcClient] = {}
-clients_lock = asyncio.Lock()
+# 每个服务器一个 client 池，池中每个副本进程一个 client
+clients: Dict[str, ClientPool] = {}
+# 每个服务器一把锁：某个服务器初始化卡住时不阻塞其他服务器的 client 获取
+client_locks: Dict[str, asyncio.Lock] = {}
+# 后台重连失效副本的任务，每个服务器至多一个
+reconnect_tasks: Dict[str, asyncio.Task] = {}
+reconnect_attempted: Dict[str, float] = {}
+# 新 client 或 list_changed 触发的后台工具刷新任务；保留引用，避免任务在完成前被垃圾回收
+refresh_tasks: Dict[str, Set[asyncio.Task]] = {}
+# 同一服务器两次后台重连的最小间隔（秒），避免反复启动失败的副本拖垮主机
+RECONNECT_INTERVAL = 5.0
+
+# 列出工具时等待各服务器响应的总时限（秒）；超时的服务器标记为 pending，在后台继续刷新
+LIST_TOOLS_DEADLINE = 2.0
+
+def _client_lock(server_name: str) -> asyncio.Lock:
+    return client_locks.setdefault(server_name, asyncio.Lock())
 
 async def get_client(server_name: str) -> StdioRpcClient:
-    async with clients_lock:
-        # 检查已有 client 是否有效
-        existing = clients.get(server_name)
-        mcp_proc = mcp_manager.processes.get(server_name)
-        
-        if existing:
-            # 检查 client 运行状态以及底层进程是否依然存活且管道未关闭
-            is_alive = (
-                existing._is_running and 
-                mcp_proc and 
-                mcp_proc.process and 
-                mcp_proc.process.returncode is None and
-                not mcp_proc.process.stdin.is_closing()
-            )
-            
-            if is_alive:
-                return existing
-            
-            # 否则清理掉旧的
-            logger.info(f"Client for {server_name} is stale or process died, recreating...")
-            await existing.stop()
-            if server_name in clients:
-                del clients[server_name]
-
-        if not mcp_proc or not mcp_proc.is_running or not mcp_proc.process or mcp_proc.process.returncode is not None:
-            # 如果进程没在运行或已退出，尝试根据配置启动
+    """
+    返回服务器在途请求最少的副本的 client。
+    部分副本失效时先用存活的副本服务，失效副本在后台单独重启；全部失效时同步重启。
+    """
+    pool = clients.get(server_name)
+    client = pool.pick() if pool else None
+    if client is not None:
+        if pool.missing(len(mcp_manager.replicas.get(server_name, ()))):
+            _schedule_reconnect(server_name)
+        return client
+
+    async with _client_lock(server_name):
+        pool = clients.get(server_name)
+        client = pool.pick() if pool else None
+        if client is not None:
+            return client
+
+        if server_name not in mcp_manager.replicas:
+            # 如果服务器没在运行，尝试根据配置启动；已退出的副本由 _connect_replicas 重启
             config = mcp_manager.load_config()
             info = config.get("servers", {}).get(server_name)
             if info:
                 await mcp_manager.start_server(server_name, info)
-                mcp_proc = mcp_manager.processes.get(server_name)
-            
-            if not mcp_proc or not mcp_proc.is_running:
-                raise HTTPException(status_code=404, detail=f"Server {server_name} not found or failed to start")
 
-        client = StdioRpcClient(mcp_proc)
-        await client.start()
-        # ... 初始化逻辑保持不变 ...
-        try:
-            await client.call("initialize", {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {},
-                "clientInfo": {"name": "PromptStudio-Hub", "version": "1.0.0"}
-            })
-            await client.notify("notifications/initialized")
-        except Exception as e:
-            pass
-        clients[server_name] = client
-        return clients[server_name]
+        await _connect_replicas(server_name)
+        pool = clients.get(server_name)
+        client = pool.pick() if pool else None
+        if client is None:
+            raise HTTPException(status_code=404, detail=f"Server {server_name} not found or failed to start")
+        return client
+
+async def _connect_replicas(server_name: str):
+    """重启已退出的副本，并为尚未连接的副本建立 client。调用方需持有该服务器的锁。"""
+    replicas = mcp_manager.replicas.get(server_name)
+    if not replicas:
+        return
+    for index, proc in enumerate(list(replicas)):
+        if not proc.process or proc.process.returncode is not None:
+            logger.info(f"Replica {proc.label} is not running, restarting...")
+            try:
+                await mcp_manager.restart_replica(server_name, index)
+            except Exception as e:
+                logger.error(f"Error restarting {proc.label}: {e}")
+    replicas = mcp_manager.replicas.get(server_name)
+    if not replicas:
+        return
+    pool = clients.setdefault(server_name, ClientPool(server_name))
+    for client in await pool.connect(replicas):
+        client.on_notification = lambda message, client=client: _on_server_notification(server_name, client, message)
+        # 新客户端意味着服务器（副本）刚启动或重启，工具集合可能变化
+        tool_registry.invalidate(server_name)
+        _schedule_refresh(server_name, client)
+
+async def _reconnect(server_name: str):
+    async with _client_lock(server_name):
+        if server_name in clients:
+            await _connect_replicas(server_name)
+
+def _schedule_reconnect(server_name: str):
+    task = reconnect_tasks.get(server_name)
+    now = time.monotonic()
+    if (task is None or task.done()) and now - reconnect_attempted.get(server_name, float("-inf")) >= RECONNECT_INTERVAL:
+        reconnect_attempted[server_name] = now
+        task = asyncio.create_task(_reconnect(server_name))
+        task.add_done_callback(lambda done: _on_reconnect_done(server_name, done))
+        reconnect_tasks[server_name] = task
+
+def _on_reconnect_done(server_name: str, task: asyncio.Task):
+    if reconnect_tasks.get(server_name) is task:
+        del reconnect_tasks[server_name]
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Error reconnecting replicas of {server_name}: {task.exception()}")
+
+async def _discard_client(server_name: str):
+    """停止并移除该服务器全部副本的 client，同时移除该服务器的工具。"""
+    task = reconnect_tasks.pop(server_name, None)
+    if task is not None:
+        task.cancel()
+    for task in refresh_tasks.pop(server_name, ()):
+        task.cancel()
+    async with _client_lock(server_name):
+        pool = clients.pop(server_name, None)
+        if pool is not None:
+            await pool.close()
+    tool_registry.remove(server_name)
+
+async def _fetch_tools(server_name: str) -> Dict[str, Any]:
+    # 后台刷新期间服务器可能已被停止，不经 get_client 重新拉起
+    if server_name not in mcp_manager.processes:
+        raise RuntimeError(f"Server {server_name} is not running")
+    client = await get_client(server_name)
+    return await client.call("tools/list", timeout=5.0)
+
+async def _refresh_from_client(server_name: str, client: StdioRpcClient):
+    """
+    后台用指定 client 强制刷新工具。client 已被替换或移除时放弃，
+    不经 get_client，避免把刚停止的服务器重新拉起。
+    """
+    pool = clients.get(server_name)
+    if pool is None or client not in pool:
+        return
+    try:
+        await tool_registry.refresh(
+            server_name, lambda: client.call("tools/list", timeout=5.0), force=True
+        )
+    except Exception as e:
+        logger.error(f"Error refreshing tools for {server_name}: {e}")
+    if server_name not in clients:
+        tool_registry.remove(server_name)
+
+def _schedule_refresh(server_name: str, client: StdioRpcClient):
+    task = asyncio.create_task(_refresh_from_client(server_name, client))
+    tasks = refresh_tasks.setdefault(server_name, set())
+    tasks.add(task)
+    task.add_done_callback(lambda done: _on_refresh_done(server_name, done))
+
+def _on_refresh_done(server_name: str, task: asyncio.Task):
+    tasks = refresh_tasks.get(server_name)
+    if tasks is not None:
+        tasks.discard(task)
+        if not tasks:
+            del refresh_tasks[server_name]
+
+def _on_server_notification(server_name: str, client: StdioRpcClient, message: Dict[str, Any]):
+    if message.get("method") == "notifications/tools/list_changed":
+        logger.info(f"Server {server_name} reported tools/list_changed")
+        tool_registry.invalidate(server_name)
+        _schedule_refresh(server_name, client)
 
 # --- Server State Management ---
 
@@ -93,7 +198,8 @@ async def list_all_servers():
             "name": name,
             "status": "running" if is_running else "stopped",
             "last_status": info.get("last_status"),
-            "auto_start": info.get("auto_start", True)
+            "auto_start": info.get("auto_start", True),
+            "replicas": len(mcp_manager.replicas.get(name, ())) if is_running else info.get("replicas", 1)
         })
     return {"servers": servers}
 
@@ -111,11 +217,8 @@ async def start_server(name: str):
 async def stop_server(name: str):
     try:
         await mcp_manager.stop_server(name)
-        # 清理缓存的 client
-        async with clients_lock:
-            if name in clients:
-                await clients[name].stop()
-                del clients[name]
+        # 清理缓存的 client 与工具
+        await _discard_client(name)
         return {"status": "stopped"}
     except Exception as e:
         logger.error(f"Error stopping server {name}: {e}", exc_info=True)
@@ -129,16 +232,10 @@ async def delete_server(name: str):
     try:
         # 先停止进程
         await mcp_manager.stop_server(name)
-        async with clients_lock:
-            if name in clients:
-                await clients[name].stop()
-                del clients[name]
+        await _discard_client(name)
             
         # 从配置中移除
-        config = mcp_manager.load_config()
-        if name in config.get("servers", {}):
-            del config["servers"][name]
-            mcp_manager._save_config(config)
+        mcp_manager.update_config(lambda config: config.get("servers", {}).pop(name, None))
             
         return {"status": "deleted"}
     except Exception as e:
@@ -148,35 +245,47 @@ async def delete_server(name: str):
 # --- REST API Endpoints (Gateway / Frontend) ---
 
 @router.get("/tools")
-async def list_tools():
-    all_tools = []
+async def list_tools(deadline: float = LIST_TOOLS_DEADLINE):
+    """
+    列出所有运行中服务器的工具。缓存过期的服务器并发刷新，最多等待 deadline 秒：
+    按时返回的为 ok，仍未返回的为 pending（沿用旧缓存，刷新完成后向 MCP 客户端推送 list_changed），
+    失败的为 error。总耗时取决于最慢的健康服务器，而不是各服务器耗时之和。
+    """
     # 确保所有配置的服务都已启动
     await mcp_manager.start_all_configured()
     
     # 使用 list() 包装 keys 以避免 RuntimeError: dictionary changed size during iteration
     server_names = list(mcp_manager.processes.keys())
-    logger.info(f"Checking tools for processes: {server_names}")
+    tasks = {
+        name: tool_registry.schedule(name, lambda name=name: _fetch_tools(name))
+        for name in server_names
+        if not tool_registry.is_fresh(name)
+    }
+    if tasks:
+        logger.info(f"Refreshing tools for processes: {list(tasks)}")
+        await asyncio.wait(tasks.values(), timeout=max(deadline, 0))
 
-    for server_name in server_names:
-        try:
-            client = await get_client(server_name)
-            result = await client.call("tools/list", timeout=5.0)
-            tools = result.get("tools", [])
-            logger.info(f"Server {server_name} returned {len(tools)} tools")
-            for tool in tools:
-                tool["_server_name"] = server_name
-            all_tools.extend(tools)
-        except Exception as e:
-            logger.error(f"Error listing tools for {server_name}: {e}")
-            pass
-    return {"tools": all_tools}
+    servers = {}
+    for name in server_names:
+        task = tasks.get(name)
+        if task is None or (task.done() and not task.cancelled() and task.exception() is None):
+            servers[name] = {"status": "ok"}
+        elif not task.done():
+            servers[name] = {"status": "pending"}
+        else:
+            error = "cancelled" if task.cancelled() else str(task.exception())
+            servers[name] = {"status": "error", "error": error}
+    tools = tool_registry.tools(server_names)
+    for tool in tools:
+        servers[tool["_server_name"]]["tools"] = servers[tool["_server_name"]].get("tools", 0) + 1
+    return {"tools": tools, "servers": servers}
 
 @router.post("/tools/{tool_name}/call")
 async def call_tool(tool_name: str, payload: Dict[str, Any]):
     """
     前端和 ps-cli 使用的 REST 风格调用接口
     """
-    server_name = payload.get("server_name")
+    server_name = payload.get("server_name") or tool_registry.lookup(tool_name)
     if not server_name:
         raise HTTPException(status_code=400, detail="server_name required")
     
@@ -195,6 +304,13 @@ async def call_tool(tool_name: str, payload: Dict[str, Any]):
 # SSE 连接队列，用于广播通知
 sse_queues = []
 
+def _broadcast_tools_changed():
+    """工具集合变化时通知已连接的 MCP 客户端（initialize 中声明了 listChanged）。"""
+    for q in sse_queues:
+        q.put_nowait({"jsonrpc": "2.0", "method": "notifications/tools/list_changed"})
+
+tool_registry.add_listener(_broadcast_tools_changed)
+
 @router.get("/sse")
 async def handle_sse(request: Request):
     """标准的 MCP SSE 端点"""
@@ -255,13 +371,13 @@ async def handle_messages(request: Request):
         }
     
     elif method == "tools/list":
-        # 复用 REST 函数逻辑
+        # 复用 REST 函数逻辑；pending 的服务器刷新完成后会推送 notifications/tools/list_changed
         try:
             all_tools_resp = await list_tools()
             response = {
                 "jsonrpc": "2.0",
                 "id": msg_id,
-                "result": all_tools_resp
+                "result": {"tools": all_tools_resp["tools"]}
             }
         except Exception as e:
              response = {
@@ -275,16 +391,14 @@ async def handle_messages(request: Request):
         tool_name = params.get("name")
         args = params.get("arguments", {})
         
-        # 查找 server
-        target_server = None
-        try:
-            all_tools_resp = await list_tools()
-            for t in all_tools_resp["tools"]:
-                if t["name"] == tool_name:
-                    target_server = t.get("_server_name")
-                    break
-        except:
-            pass
+        # 查找 server：命中注册表时为 O(1)，未知工具才刷新一次工具列表再查
+        target_server = tool_registry.lookup(tool_name)
+        if target_server is None:
+            try:
+                await list_tools()
+            except Exception:
+                pass
+            target_server = tool_registry.lookup(tool_name)
         
         if target_server:
             try:
@@ -337,6 +451,81 @@ SKILLS_DIR = Path.home() / ".promptstudio" / "skills"
 if not SKILLS_DIR.exists():
     SKILLS_DIR.mkdir(parents=True, exist_ok=True)
 
+# 等待各副本原地重新加载脚本的时限（秒）
+RELOAD_TIMEOUT = 30.0
+# 同一 Skill 的保存、重载与重启串行进行
+skill_locks: Dict[str, asyncio.Lock] = {}
+# 经 API 写入磁盘的各 Skill 源码：监视器随后收到的同一内容的文件事件由写入方已处理，跳过
+written_sources: Dict[str, str] = {}
+
+class SkillReloadError(Exception):
+    """新代码执行出错，运行中的 Skill 保持旧版本。"""
+
+def _skill_lock(name: str) -> asyncio.Lock:
+    return skill_locks.setdefault(name, asyncio.Lock())
+
+async def _reload_skill(name: str) -> bool:
+    """
+    让运行中 Skill 的各副本原地重新加载脚本，保留进程内已导入的库与缓存，工具变化时由运行器发出 list_changed。
+    成功返回 True；依赖声明变化、副本无响应等需要整体重启时返回 False；新代码出错时抛出 SkillReloadError。
+    尚未连接或已退出的副本之后会以新代码启动，无需重载。
+    """
+    try:
+        await get_client(name)
+    except Exception:
+        return False
+    pool = clients.get(name)
+    targets = pool.alive() if pool else []
+    if not targets:
+        return False
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(client.call(RELOAD_METHOD, timeout=RELOAD_TIMEOUT) for client in targets), return_exceptions=True
+    )
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        for error in errors:
+            if isinstance(error, RpcError) and error.code not in (DEPENDENCIES_CHANGED, -32601):
+                raise SkillReloadError(str(error))
+        logger.info(f"Skill {name} cannot be reloaded in place: {errors[0]}")
+        return False
+    logger.info(f"Skill {name} reloaded in place in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return True
+
+async def _restart_server(name: str, info: Optional[dict] = None):
+    """停止并按配置（或 info）重新启动服务器。"""
+    info = info or mcp_manager.load_config().get("servers", {}).get(name)
+    await mcp_manager.stop_server(name)
+    await _discard_client(name)
+    if info:
+        await mcp_manager.start_server(name, info)
+
+async def _on_skill_file_changed(name: str):
+    """Skill 脚本在磁盘上被修改：运行中的 Skill 原地重载，依赖变化时整体重启，新代码出错时保持旧版本。"""
+    if name not in mcp_manager.processes:
+        return
+    try:
+        with open(SKILLS_DIR / f"{name}.py", "r", encoding="utf-8") as f:
+            source = f.read()
+    except OSError:
+        return
+    if written_sources.get(name) == source:
+        return
+    written_sources.pop(name, None)
+    async with _skill_lock(name):
+        if name not in mcp_manager.processes:
+            return
+        try:
+            if await _reload_skill(name):
+                return
+        except SkillReloadError as e:
+            logger.error(f"Skill {name} reload failed, keeping the previous version: {e}")
+            return
+        logger.info(f"Restarting skill {name}")
+        await _restart_server(name)
+
+skill_watcher = SkillWatcher(SKILLS_DIR, _on_skill_file_changed)
+
 @router.get("/skills")
 async def list_skills():
     skills = []
@@ -350,26 +539,61 @@ async def list_skills():
 async def create_skill(
     name: str = Body(...), 
     code: str = Body(...),
-    env: Dict[str, str] = Body(None)
+    env: Dict[str, str] = Body(None),
+    replicas: Optional[int] = Body(None)
 ):
+    """
+    保存 Skill 并（重新）启动。已在运行且环境变量、副本数不变时原地重新加载代码，
+    不重启进程；依赖声明变化或无法重载时整体重启。
+    """
     filename = f"{name}.py"
     filepath = SKILLS_DIR / filename
-    
-    # 如果服务已在运行，先停止并清理
-    if name in mcp_manager.processes:
-        await mcp_manager.stop_server(name)
-        async with clients_lock:
-            if name in clients:
-                await clients[name].stop()
-                del clients[name]
-        
-    with open(filepath, "w", encoding="utf-8") as f:
-        f.write(code)
-    
-    # 自动注册并启动
-    await mcp_manager.start_skill(name, str(filepath), env=env)
+
+    async with _skill_lock(name):
+        info = mcp_manager.load_config().get("servers", {}).get(name) or {}
+        reloadable = (
+            name in mcp_manager.processes
+            and (info.get("env") or {}) == (env or {})
+            and (replicas is None or replica_count({"replicas": replicas}) == len(mcp_manager.replicas.get(name, ())))
+        )
+
+        # 原子写入，监视器不会读到写了一半的文件；同一内容的文件事件不再重复重载
+        written_sources[name] = code
+        with atomic_write(filepath) as f:
+            f.write(code)
+
+        if reloadable:
+            try:
+                if await _reload_skill(name):
+                    return {"status": "reloaded", "name": name}
+            except SkillReloadError as e:
+                raise HTTPException(status_code=400, detail=f"Skill reload failed, previous version still running: {e}")
+
+        # 如果服务已在运行，先停止并清理
+        if name in mcp_manager.processes:
+            await mcp_manager.stop_server(name)
+            await _discard_client(name)
+
+        # 自动注册并启动
+        if replicas is None:
+            replicas = info.get("replicas", 1)
+        await mcp_manager.start_skill(name, str(filepath), env=env, replicas=replicas)
     return {"status": "created", "name": name}
 
+@router.post("/skills/{name}/reload")
+async def reload_skill(name: str):
+    """按磁盘上的代码重新加载运行中的 Skill：能原地重载时不重启进程。"""
+    if name not in mcp_manager.processes:
+        raise HTTPException(status_code=404, detail="Skill not running")
+    async with _skill_lock(name):
+        try:
+            if await _reload_skill(name):
+                return {"status": "reloaded"}
+        except SkillReloadError as e:
+            raise HTTPException(status_code=400, detail=f"Skill reload failed, previous version still running: {e}")
+        await _restart_server(name)
+    return {"status": "restarted"}
+
 @router.get("/skills/{name}")
 async def get_skill(name: str):
     filepath = SKILLS_DIR / f"{name}.py"
@@ -383,5 +607,7 @@ async def delete_skill(name: str):
     filepath = SKILLS_DIR / f"{name}.py"
     if filepath.exists():
         os.remove(filepath)
+    written_sources.pop(name, None)
     await mcp_manager.stop_server(name)
+    await _discard_client(name)
     return {"status": "deleted"}
\ No newline at end of file
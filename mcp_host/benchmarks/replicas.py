@@ -0,0 +1,84 @@
+"""
+多副本吞吐基准：启动一个 CPU 密集的本地 JSON-RPC 服务器，分别以 1、2、4… 个副本运行，
+经 ClientPool 按最少在途请求路由并发调用，输出每秒调用数与相对单副本的加速比。
+
+在仓库根目录运行：python -m mcp_host.benchmarks.replicas [--calls 400] [--work 200000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mcp_host.services.client_pool import ClientPool
+from mcp_host.services.process_manager import mcp_manager
+
+
+def serve():
+    """CPU 密集的服务器：每个请求做 params.work 次整数运算后返回结果。"""
+    for line in sys.stdin:
+        request = json.loads(line)
+        if "id" not in request:
+            continue
+        total = 0
+        for i in range(request["params"].get("work", 0)):
+            total += i * i % 7
+        sys.stdout.write(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": {"total": total}}) + "\n")
+        sys.stdout.flush()
+
+
+async def run(replicas: int, calls: int, concurrency: int, work: int) -> float:
+    name = "cpu-bench"
+    await mcp_manager.start_server(name, {
+        "command": sys.executable,
+        "args": ["-m", "mcp_host.benchmarks.replicas", "--serve"],
+        "replicas": replicas,
+    })
+    pool = ClientPool(name)
+    try:
+        await pool.connect(mcp_manager.replicas[name])
+        remaining = calls
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await pool.pick().call("work", {"work": work}, timeout=120)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return calls / (time.perf_counter() - started)
+    finally:
+        await pool.close()
+        await mcp_manager.stop_server(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help="作为 CPU 密集服务器运行（基准内部使用）")
+    parser.add_argument("--calls", type=int, default=400, help="每轮调用次数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发调用方数量")
+    parser.add_argument("--work", type=int, default=200000, help="每次调用的循环次数")
+    parser.add_argument("--replicas", type=int, nargs="+", help="要对比的副本数，默认 1、2、4… 直到 CPU 核数")
+    args = parser.parse_args()
+    if args.serve:
+        serve()
+        return
+
+    counts = args.replicas or [n for n in (1, 2, 4, 8, 16) if n <= (os.cpu_count() or 1)]
+    # 使用临时配置文件，不改动用户的 MCP 配置
+    mcp_manager.config_path = Path(tempfile.mkdtemp()) / "mcp_config.json"
+    mcp_manager._ensure_config_dir()
+    print(f"{args.calls} 次调用，{args.concurrency} 个并发调用方，CPU 核数 {os.cpu_count()}")
+    baseline = None
+    for count in counts:
+        rate = asyncio.run(run(count, args.calls, args.concurrency, args.work))
+        baseline = baseline or rate
+        print(f"{count:>2} 个副本：{rate:>8.1f} 次/秒（{rate / baseline:.2f}x）")
+
+
+if __name__ == "__main__":
+    main()
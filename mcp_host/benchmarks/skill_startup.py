@@ -0,0 +1,67 @@
+"""
+Skill 启动耗时基准：分别以冷启动、预热进程池、fork 服务器三种方式启动一个简单的 Skill，
+测量从 start_skill 到 initialize 完成并收到 tools/list 响应的耗时。
+预热本身（进程池补足、fork 服务器启动）不计入，对应主机启动后的常态。
+
+需要 mcp_host 的完整依赖（fastmcp）。在仓库根目录运行：
+python -m mcp_host.benchmarks.skill_startup [--rounds 10]
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from mcp_host.services.client_pool import ClientPool
+from mcp_host.services.process_manager import mcp_manager
+from mcp_host.services.warm_pool import WarmPool, fork_server_supported
+
+SKILL = '''
+def add(a: int, b: int) -> int:
+    """两数相加"""
+    return a + b
+'''
+
+
+async def measure(mode: str, script: Path, rounds: int):
+    pool = WarmPool(*mcp_manager._runner_command(), size=0 if mode == "cold" else 1, fork_server=mode == "fork")
+    mcp_manager.warm_pool = pool
+    timings = []
+    try:
+        for _ in range(rounds):
+            await pool.fill()
+            started = time.perf_counter()
+            await mcp_manager.start_skill("startup-bench", str(script))
+            clients = ClientPool("startup-bench")
+            try:
+                await clients.connect(mcp_manager.replicas["startup-bench"])
+                await clients.pick().call("tools/list", timeout=60)
+                timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                await clients.close()
+                await mcp_manager.stop_server("startup-bench")
+    finally:
+        await pool.close()
+    print(f"{mode:>5}：中位数 {statistics.median(timings):.0f}ms，最慢 {max(timings):.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10, help="每种方式启动的次数")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp())
+    # 使用临时配置文件，不改动用户的 MCP 配置
+    mcp_manager.config_path = workdir / "mcp_config.json"
+    mcp_manager._ensure_config_dir()
+    script = workdir / "startup_bench.py"
+    script.write_text(SKILL, encoding="utf-8")
+
+    modes = ["cold", "pool"] + (["fork"] if fork_server_supported() else [])
+    for mode in modes:
+        asyncio.run(measure(mode, script, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
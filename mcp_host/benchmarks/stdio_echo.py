@@ -0,0 +1,87 @@
+"""
+StdioRpcClient 吞吐基准：启动一个本地回显 JSON-RPC 服务器，在不同在途窗口下并发调用，
+输出每秒调用数与延迟分位数。
+
+在仓库根目录运行：python -m mcp_host.benchmarks.stdio_echo [--calls 20000] [--concurrency 256]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from mcp_host.services.process_manager import McpProcess
+from mcp_host.services.stdio_client import StdioRpcClient
+
+
+def serve():
+    """回显服务器：把每个请求的 params 原样作为 result 返回；一次读到的多个请求合并回写。"""
+    pending = b""
+    while True:
+        chunk = os.read(0, 1 << 20)
+        if not chunk:
+            return
+        *lines, pending = (pending + chunk).split(b"\n")
+        replies = []
+        for line in lines:
+            request = json.loads(line)
+            replies.append(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": request["params"]}).encode())
+        if replies:
+            sys.stdout.buffer.write(b"\n".join(replies) + b"\n")
+            sys.stdout.buffer.flush()
+
+
+async def run(window: int, calls: int, concurrency: int, payload_bytes: int):
+    process = McpProcess("echo", sys.executable, ["-m", "mcp_host.benchmarks.stdio_echo", "--serve"])
+    await process.start()
+    client = StdioRpcClient(process, max_in_flight=window)
+    await client.start()
+    params = {"text": "x" * payload_bytes}
+    latencies = []
+    remaining = calls
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            await client.call("echo", params, timeout=60)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    try:
+        # 等回显进程完成启动，避免把解释器启动时间计入延迟
+        await client.call("echo", params, timeout=60)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.stop()
+        await process.stop()
+
+    latencies.sort()
+    print(
+        f"窗口 {window:>4}：{calls / elapsed:>9.0f} 次/秒，"
+        f"p50 {statistics.median(latencies):.2f}ms，p99 {latencies[int(len(latencies) * 0.99)]:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help="作为回显服务器运行（基准内部使用）")
+    parser.add_argument("--calls", type=int, default=20000, help="每轮调用次数")
+    parser.add_argument("--concurrency", type=int, default=256, help="并发调用方数量")
+    parser.add_argument("--payload", type=int, default=256, help="每个请求的负载字节数")
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 8, 64, 256], help="要对比的在途窗口大小")
+    args = parser.parse_args()
+    if args.serve:
+        serve()
+        return
+    print(f"{args.calls} 次调用，{args.concurrency} 个并发调用方，负载 {args.payload} 字节")
+    for window in args.windows:
+        asyncio.run(run(window, args.calls, args.concurrency, args.payload))
+
+
+if __name__ == "__main__":
+    main()
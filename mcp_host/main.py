@@ -34,10 +34,13 @@ app.include_router(mcp_routes.router, prefix="/api/v1/mcp")
 async def startup_event():
     logger.info("Local MCP Host Starting...")
     await mcp_manager.start_all_configured()
+    # Skill 文件保存后原地热重载
+    mcp_routes.skill_watcher.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down MCP processes...")
+    mcp_routes.skill_watcher.stop()
     await mcp_manager.shutdown()
 
 if __name__ == "__main__":
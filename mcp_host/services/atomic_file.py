@@ -0,0 +1,135 @@
+"""
+原子文件写入：先写同目录下的临时文件并 fsync，再 rename 覆盖目标文件。
+
+读者要么看到旧内容，要么看到完整的新内容，进程崩溃或断电不会留下截断的文件。
+对同一路径的写入（以及通过 path_lock 包裹的“读-改-写”）按路径串行：进程内用可重入的线程锁，
+进程间用同目录下 .<文件名>.lock 上的 flock；没有 fcntl 的平台（Windows）只在进程内串行。
+
+server/prompt_studio_be/atomic_file.py 与 mcp_host/services/atomic_file.py 分属不同的部署单元，
+两份内容必须完全一致（由 mcp_host/tests/test_atomic_file.py 检查），修改时请同步。
+"""
+import json
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, IO, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+PathLike = Union[str, os.PathLike]
+
+
+class PathLock:
+    """某一路径的锁：进程内可重入，持有期间同时持有锁文件上的 flock（首次进入时获取、最后退出时释放）。"""
+
+    def __init__(self, key: str):
+        directory, name = os.path.split(key)
+        self.lock_path = os.path.join(directory, f".{name}.lock")
+        self._thread_lock = threading.RLock()
+        # 以下两项只由持有 _thread_lock 的线程修改
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            if self._depth == 0 and fcntl is not None:
+                os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+                fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+                self._fd = fd
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fd, self._fd = self._fd, None
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+_locks: Dict[str, PathLock] = {}
+_locks_guard = threading.Lock()
+
+
+def path_lock(path: PathLike) -> PathLock:
+    """返回与路径对应的锁，同一文件的不同写法（相对/绝对路径）共享同一把锁。"""
+    key = os.path.realpath(path)
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = PathLock(key)
+        return lock
+
+
+def _fsync_dir(directory: str):
+    """rename 之后同步目录项，保证新文件名落盘；不支持打开目录的平台（Windows）跳过。"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path: PathLike, mode: str = "w", encoding: str = "utf-8") -> Iterator[IO]:
+    """
+    以原子方式写入 path：with 块内写入临时文件，正常退出时替换目标文件，异常时丢弃临时文件、
+    目标文件保持不变。整个过程持有该路径的锁。
+    """
+    path = os.fspath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with path_lock(path):
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            # 沿用目标文件原有的权限；新文件保持 mkstemp 的 0600
+            try:
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+            except FileNotFoundError:
+                pass
+            with os.fdopen(fd, mode, encoding=None if "b" in mode else encoding) as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        _fsync_dir(directory)
+
+
+def atomic_write_json(path: PathLike, data: Any, **dump_kwargs):
+    """将 data 序列化为 JSON 并原子写入 path。"""
+    with atomic_write(path) as f:
+        json.dump(data, f, **dump_kwargs)
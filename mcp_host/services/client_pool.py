@@ -0,0 +1,90 @@
+"""
+同一 MCP 服务器多个副本进程的 client 集合。
+
+每个副本一条 stdio 连接（StdioRpcClient），调用按最少在途请求数路由到存活的副本；
+在途数相同时轮流选择，使突发的并发调用均匀分布到各副本。
+某个副本退出后只需重新连接该副本，其余副本照常服务。
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from .process_manager import McpProcess
+from .stdio_client import StdioRpcClient
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    def __init__(self, server_name: str):
+        self.server_name = server_name
+        # 副本序号 -> client
+        self.clients: Dict[int, StdioRpcClient] = {}
+        self._next = 0
+
+    def __contains__(self, client: StdioRpcClient) -> bool:
+        return any(existing is client for existing in self.clients.values())
+
+    def alive(self) -> List[StdioRpcClient]:
+        return [self.clients[i] for i in sorted(self.clients) if self.clients[i].is_alive]
+
+    def pick(self) -> Optional[StdioRpcClient]:
+        """返回在途请求最少的存活 client；没有存活副本时返回 None。"""
+        alive = self.alive()
+        if not alive:
+            return None
+        start = self._next % len(alive)
+        self._next += 1
+        rotated = alive[start:] + alive[:start]
+        return min(rotated, key=lambda client: client.outstanding)
+
+    def missing(self, replica_total: int) -> List[int]:
+        """尚未连接或连接已失效的副本序号。"""
+        return [
+            i for i in range(replica_total)
+            if i not in self.clients or not self.clients[i].is_alive
+        ]
+
+    async def connect(self, processes: List[McpProcess]) -> List[StdioRpcClient]:
+        """
+        为 processes（按副本序号排列）中尚无存活 client 的运行中副本建立连接并完成 initialize，
+        各副本并发进行。返回新建的 client；单个副本失败只记录日志。
+        """
+        indexes = [
+            i for i, proc in enumerate(processes)
+            if proc.process is not None and proc.process.returncode is None
+            and (i not in self.clients or not self.clients[i].is_alive)
+        ]
+        results = await asyncio.gather(
+            *(self._open(i, processes[i]) for i in indexes), return_exceptions=True
+        )
+        created = []
+        for i, result in zip(indexes, results):
+            if isinstance(result, Exception):
+                logger.error(f"连接 {processes[i].label} 失败: {result}")
+                continue
+            stale = self.clients.get(i)
+            if stale is not None:
+                await stale.stop()
+            self.clients[i] = result
+            created.append(result)
+        return created
+
+    async def _open(self, index: int, proc: McpProcess) -> StdioRpcClient:
+        client = StdioRpcClient(proc)
+        await client.start()
+        try:
+            await client.call("initialize", {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "PromptStudio-Hub", "version": "1.0.0"}
+            })
+            await client.notify("notifications/initialized")
+        except Exception as e:
+            logger.warning(f"{proc.label} initialize 失败: {e}")
+        return client
+
+    async def close(self):
+        clients, self.clients = list(self.clients.values()), {}
+        for client in clients:
+            await client.stop()
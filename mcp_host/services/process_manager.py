@@ -5,47 +5,74 @@ import os
 import shutil
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 import time
 
+from .atomic_file import atomic_write_json, path_lock
+from .warm_pool import WarmPool
+
 logger = logging.getLogger(__name__)
 
+# 单个服务器最多启动的副本数
+MAX_REPLICAS = 16
+
+
+def replica_count(info: dict) -> int:
+    """配置中的副本数（replicas 项），缺省为 1，限制在 [1, MAX_REPLICAS]。"""
+    try:
+        count = int(info.get("replicas") or 1)
+    except (TypeError, ValueError):
+        count = 1
+    return min(max(count, 1), MAX_REPLICAS)
+
+
 class McpProcess:
     """封装单个 MCP 服务器进程及其通信管道 (异步版)"""
-    def __init__(self, name: str, command: str, args: List[str], cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None):
+    def __init__(self, name: str, command: str, args: List[str], cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None, replica: int = 0,
+                 spawn: Optional[Callable[[], Awaitable[Any]]] = None):
         self.name = name
+        # 同一服务器的第几个副本；日志中以 name#replica 区分
+        self.replica = replica
         self.command = command
         self.args = args
         self.cwd = cwd
         self.env = env
+        # 可选的快速启动方式（如取用预热进程），返回进程对象或 None（回退为按命令启动）
+        self.spawn = spawn
         self.process: Optional[asyncio.subprocess.Process] = None
         self.is_running = False
 
+    @property
+    def label(self) -> str:
+        return self.name if self.replica == 0 else f"{self.name}#{self.replica}"
+
     async def start(self):
         try:
             full_command = [self.command] + self.args
-            logger.info(f"正在启动 MCP 服务器 [{self.name}]: {' '.join(full_command)}")
+            logger.info(f"正在启动 MCP 服务器 [{self.label}]: {' '.join(full_command)}")
             
             # Combine system env with custom env
             process_env = os.environ.copy()
             if self.env:
                 process_env.update(self.env)
 
-            self.process = await asyncio.create_subprocess_exec(
-                self.command, *self.args,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=self.cwd,
-                env=process_env
-            )
+            self.process = await self.spawn() if self.spawn else None
+            if self.process is None:
+                self.process = await asyncio.create_subprocess_exec(
+                    self.command, *self.args,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=self.cwd,
+                    env=process_env
+                )
             self.is_running = True
-            logger.info(f"MCP 服务器 [{self.name}] 已启动，PID: {self.process.pid}")
+            logger.info(f"MCP 服务器 [{self.label}] 已启动，PID: {self.process.pid}")
             
             # 启动一个后台任务读取 stderr，记录到日志
             asyncio.create_task(self._read_stderr())
         except Exception as e:
-            logger.error(f"启动 MCP 服务器 [{self.name}] 失败: {e}")
+            logger.error(f"启动 MCP 服务器 [{self.label}] 失败: {e}")
             self.is_running = False
             raise
 
@@ -61,23 +88,26 @@ class McpProcess:
                 # 根据内容简单判断日志级别，避免全是 ERROR 误导用户
                 lower_content = content.lower()
                 if "error" in lower_content or "exception" in lower_content or "traceback" in lower_content:
-                    logger.error(f"[{self.name} STDERR] {content}")
+                    logger.error(f"[{self.label} STDERR] {content}")
                 elif "warn" in lower_content:
-                    logger.warning(f"[{self.name} STDERR] {content}")
+                    logger.warning(f"[{self.label} STDERR] {content}")
                 else:
                     # 默认使用 INFO，因为 FastMCP 很多正常状态输出在 stderr
-                    logger.info(f"[{self.name} STDERR] {content}")
+                    logger.info(f"[{self.label} STDERR] {content}")
 
     async def stop(self):
         if self.process:
-            logger.info(f"正在停止 MCP 服务器 [{self.name}]")
+            logger.info(f"正在停止 MCP 服务器 [{self.label}]")
             try:
                 self.process.terminate()
                 await asyncio.wait_for(self.process.wait(), timeout=5.0)
+            except ProcessLookupError:
+                # 进程已自行退出
+                pass
             except asyncio.TimeoutError:
                 self.process.kill()
             self.is_running = False
-            logger.info(f"MCP 服务器 [{self.name}] 已停止")
+            logger.info(f"MCP 服务器 [{self.label}] 已停止")
 
 class McpProcessManager:
     """管理所有本地 MCP 服务器进程的单例类"""
@@ -92,9 +122,13 @@ class McpProcessManager:
     def __init__(self):
         if self._initialized:
             return
+        # 每个服务器的首个运行中副本，用于判断服务器是否在运行
         self.processes: Dict[str, McpProcess] = {}
+        # 每个服务器的全部副本，按副本序号排列
+        self.replicas: Dict[str, List[McpProcess]] = {}
         self.config_path = Path.home() / ".promptstudio" / "mcp_config.json"
         self.uv_path = self._find_uv()
+        self.warm_pool = WarmPool(*self._runner_command())
         self._initialized = True
         self._ensure_config_dir()
 
@@ -107,31 +141,55 @@ class McpProcessManager:
         logger.warning("未找到 uv，将回退到标准 python 运行器")
         return sys.executable
 
+    def _runner_command(self, *runner_args: str):
+        """运行 script_runner.py 的命令与参数。"""
+        runner_path = os.path.join(os.path.dirname(__file__), "script_runner.py")
+        # 优先使用 uv run 来运行脚本，支持 PEP 723 依赖自动管理
+        if self.uv_path and "uv" in self.uv_path:
+            return self.uv_path, ["run", runner_path, *runner_args]
+        return sys.executable, [runner_path, *runner_args]
+
     def _ensure_config_dir(self):
         self.config_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.config_path.exists():
-            with open(self.config_path, "w", encoding="utf-8") as f:
-                json.dump({"servers": {}}, f, indent=2)
+        with path_lock(self.config_path):
+            if not self.config_path.exists():
+                atomic_write_json(self.config_path, {"servers": {}}, indent=2)
 
     def load_config(self) -> dict:
         try:
             with open(self.config_path, "r", encoding="utf-8") as f:
                 return json.load(f)
+        except json.JSONDecodeError as e:
+            # 配置文件只经原子写入更新，损坏通常来自外部编辑；保留原文件，避免随后的保存将其覆盖
+            corrupt_path = self.config_path.with_name(f"{self.config_path.name}.corrupt-{int(time.time())}")
+            logger.error(f"MCP 配置文件损坏: {e}，已另存为 {corrupt_path}")
+            try:
+                shutil.copyfile(self.config_path, corrupt_path)
+            except OSError as copy_error:
+                logger.error(f"保存损坏的配置文件失败: {copy_error}")
+            return {"servers": {}}
         except Exception as e:
             logger.error(f"读取 MCP 配置文件失败: {e}")
             return {"servers": {}}
 
     def _save_config(self, config: dict):
         try:
-            with open(self.config_path, "w", encoding="utf-8") as f:
-                json.dump(config, f, indent=2)
+            atomic_write_json(self.config_path, config, indent=2)
         except Exception as e:
             logger.error(f"保存配置文件失败: {e}")
 
+    def update_config(self, mutate: Callable[[dict], None]) -> dict:
+        """在配置文件锁内完成“读取-修改-保存”，并发更新不会互相覆盖。"""
+        with path_lock(self.config_path):
+            config = self.load_config()
+            mutate(config)
+            self._save_config(config)
+            return config
+
     async def start_all_configured(self):
         # 新逻辑：不再自动启动，而是由前端决定恢复
-        # 这里只加载配置，不执行操作
-        pass
+        # 这里只加载配置，并在后台预热 Skill 运行器
+        self.warm_pool.schedule_fill()
 
     async def get_last_active_servers(self) -> List[str]:
         config = self.load_config()
@@ -143,21 +201,25 @@ class McpProcessManager:
 
     async def start_server(self, name: str, info: dict):
         # 更新配置中的状态
-        config = self.load_config()
-        if "servers" not in config:
-            config["servers"] = {}
-        
-        if name not in config["servers"]:
-            config["servers"][name] = info
-        
-        config["servers"][name]["last_status"] = "running"
-        # 更新 info 以防参数变化
-        config["servers"][name]["command"] = info.get("command")
-        config["servers"][name]["args"] = info.get("args")
-        # Ensure env is saved
-        config["servers"][name]["env"] = info.get("env")
-        
-        self._save_config(config)
+        def mark_running(config: dict):
+            if "servers" not in config:
+                config["servers"] = {}
+
+            if name not in config["servers"]:
+                config["servers"][name] = info
+
+            config["servers"][name]["last_status"] = "running"
+            # 更新 info 以防参数变化
+            config["servers"][name]["command"] = info.get("command")
+            config["servers"][name]["args"] = info.get("args")
+            # Ensure env is saved
+            config["servers"][name]["env"] = info.get("env")
+            if "replicas" in info:
+                config["servers"][name]["replicas"] = replica_count(info)
+            if "skill" in info:
+                config["servers"][name]["skill"] = info["skill"]
+
+        self.update_config(mark_running)
 
         if name in self.processes and self.processes[name].is_running:
             logger.warning(f"MCP 服务器 [{name}] 已经在运行中")
@@ -172,58 +234,77 @@ class McpProcessManager:
             logger.error(f"服务器 [{name}] 配置缺失 command 项")
             return
 
-        mcp_proc = McpProcess(name, command, args, cwd, env=env)
-        try:
-            await mcp_proc.start()
-            self.processes[name] = mcp_proc
-        except Exception:
-            pass
+        spawn = None
+        skill = info.get("skill")
+        if skill and command == self.warm_pool.command and not cwd:
+            # Skill 优先取用预热的运行器进程
+            spawn = lambda: self.warm_pool.adopt(skill, env)
+        replicas = [McpProcess(name, command, args, cwd, env=env, replica=i, spawn=spawn) for i in range(replica_count(info))]
+        results = await asyncio.gather(*(proc.start() for proc in replicas), return_exceptions=True)
+        running = [proc for proc, result in zip(replicas, results) if not isinstance(result, Exception)]
+        if running:
+            # 启动失败的副本保留在列表中，之后由 restart_replica 单独重试
+            self.replicas[name] = replicas
+            self.processes[name] = running[0]
 
-    async def start_skill(self, name: str, script_path: str, env: Optional[Dict[str, str]] = None):
-        """以 MCP 服务器形式启动一个本地 Python 脚本 (Skill)"""
-        runner_path = os.path.join(os.path.dirname(__file__), "script_runner.py")
-        
-        # 优先使用 uv run 来运行脚本，支持 PEP 723 依赖自动管理
-        if self.uv_path and "uv" in self.uv_path:
-            command = self.uv_path
-            args = ["run", runner_path, script_path]
-        else:
-            command = sys.executable
-            args = [runner_path, script_path]
-            
+    async def restart_replica(self, name: str, index: int) -> Optional[McpProcess]:
+        """单独重启服务器的一个副本（进程已退出或启动失败），不影响其他副本。"""
+        replicas = self.replicas.get(name)
+        if not replicas or index >= len(replicas):
+            return None
+        old = replicas[index]
+        if old.process and old.process.returncode is None:
+            await old.stop()
+        proc = McpProcess(old.name, old.command, old.args, old.cwd, env=old.env, replica=index, spawn=old.spawn)
+        await proc.start()
+        # 重启期间服务器可能已被停止
+        if self.replicas.get(name) is not replicas:
+            await proc.stop()
+            return None
+        replicas[index] = proc
+        if self.processes.get(name) is old:
+            self.processes[name] = proc
+        return proc
+
+    async def start_skill(self, name: str, script_path: str, env: Optional[Dict[str, str]] = None, replicas: int = 1):
+        """以 MCP 服务器形式启动一个本地 Python 脚本 (Skill)；CPU 密集的 Skill 可启动多个副本分担调用"""
+        command, args = self._runner_command(script_path)
         info = {
             "command": command,
             "args": args,
+            "skill": script_path,
             "auto_start": True,
             "last_status": "running",
-            "env": env
+            "env": env,
+            "replicas": replicas
         }
         await self.start_server(name, info)
 
     async def stop_server(self, name: str):
         # 更新配置状态
-        try:
-            config = self.load_config()
+        def mark_stopped(config: dict):
             if name in config.get("servers", {}):
                 config["servers"][name]["last_status"] = "stopped"
-                self._save_config(config)
+
+        try:
+            self.update_config(mark_stopped)
         except Exception as e:
             logger.error(f"Error updating config in stop_server for {name}: {e}")
 
-        if name in self.processes:
+        replicas = self.replicas.pop(name, None) or ([self.processes[name]] if name in self.processes else [])
+        self.processes.pop(name, None)
+        for proc in replicas:
             try:
-                await self.processes[name].stop()
+                await proc.stop()
             except Exception as e:
-                logger.error(f"Error calling stop() on process {name}: {e}")
-            finally:
-                if name in self.processes:
-                    del self.processes[name]
+                logger.error(f"Error calling stop() on process {proc.label}: {e}")
 
     async def shutdown(self):
         tasks = []
         for name in list(self.processes.keys()):
             tasks.append(self.stop_server(name))
         await asyncio.gather(*tasks)
+        await self.warm_pool.close()
 
 # 全局单例
 mcp_manager = McpProcessManager()
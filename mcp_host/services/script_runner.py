@@ -1,11 +1,78 @@
 import sys
 import os
-import importlib.util
+from importlib import metadata
+import anyio
 from fastmcp import FastMCP
+from mcp import types
+from mcp.server import NotificationOptions
+from mcp.server.stdio import stdio_server
+
+from skill_loader import DEPENDENCIES_CHANGED, RELOAD_METHOD, DependenciesChanged, SkillLoader
+
+# 原地重载依赖 FastMCP 的私有属性（_mcp_server、_tool_manager._tools），只在经 tests/test_script_runner.py
+# 验证过的版本上启用；其他版本照常 mcp.run()，主机的重载请求得到 -32601（方法不存在），改为整体重启 Skill
+VERIFIED_VERSIONS = {"mcp": "1.2.1", "fastmcp": "0.4.1"}
+
+def hot_reload_supported(mcp: FastMCP) -> bool:
+    for distribution, version in VERIFIED_VERSIONS.items():
+        try:
+            if metadata.version(distribution) != version:
+                return False
+        except metadata.PackageNotFoundError:
+            return False
+    tool_manager = getattr(mcp, "_tool_manager", None)
+    return hasattr(mcp, "_mcp_server") and isinstance(getattr(tool_manager, "_tools", None), dict)
+
+def _register(mcp: FastMCP, function):
+    mcp.tool()(function)
+    print(f"已注册工具: {function.__name__}", file=sys.stderr)
+
+def _reload(loader: SkillLoader, request_id):
+    """重新加载脚本，返回 (响应, 工具是否可能变化)。"""
+    try:
+        changed = loader.load()
+    except DependenciesChanged as e:
+        error = types.ErrorData(code=DEPENDENCIES_CHANGED, message=str(e))
+    except Exception as e:
+        print(f"重新加载 Skill 失败，继续使用旧版本: {e}", file=sys.stderr)
+        error = types.ErrorData(code=types.INTERNAL_ERROR, message=f"reload failed: {e}")
+    else:
+        result = {"changed": changed, "tools": sorted(loader.tools)}
+        return types.JSONRPCMessage(types.JSONRPCResponse(jsonrpc="2.0", id=request_id, result=result)), changed
+    return types.JSONRPCMessage(types.JSONRPCError(jsonrpc="2.0", id=request_id, error=error)), False
+
+async def _serve(mcp: FastMCP, loader: SkillLoader):
+    """
+    与 FastMCP.run() 相同地在 stdio 上运行 MCP 服务器，另外拦截 RELOAD_METHOD 请求：
+    原地重载脚本并在工具变化时发送 notifications/tools/list_changed。
+    """
+    server = mcp._mcp_server
+    options = server.create_initialization_options(NotificationOptions(tools_changed=True))
+    async with stdio_server() as (read_stream, write_stream):
+        forward_writer, forward_reader = anyio.create_memory_object_stream(0)
+
+        async def intercept():
+            async with forward_writer:
+                async for message in read_stream:
+                    request = getattr(message, "root", None)
+                    if isinstance(request, types.JSONRPCRequest) and request.method == RELOAD_METHOD:
+                        response, changed = _reload(loader, request.id)
+                        await write_stream.send(response)
+                        if changed:
+                            await write_stream.send(types.JSONRPCMessage(types.JSONRPCNotification(
+                                jsonrpc="2.0", method="notifications/tools/list_changed"
+                            )))
+                        continue
+                    await forward_writer.send(message)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(intercept)
+            await server.run(forward_reader, write_stream, options)
+            tg.cancel_scope.cancel()
 
 def run_skill(script_path: str):
     """
-    加载指定的 Python 脚本并使用 FastMCP 运行
+    加载指定的 Python 脚本并使用 FastMCP 运行，支持主机请求原地重新加载
     """
     if not os.path.exists(script_path):
         print(f"Error: 脚本不存在 {script_path}", file=sys.stderr)
@@ -13,39 +80,40 @@ def run_skill(script_path: str):
 
     skill_name = os.path.basename(script_path).replace(".py", "")
     mcp = FastMCP(skill_name)
+    # 只注册脚本中定义的函数；重新加载时先移除旧版本的同名工具，FastMCP 不会覆盖已存在的工具
+    loader = SkillLoader(
+        script_path,
+        register=lambda function: _register(mcp, function),
+        unregister=lambda name: mcp._tool_manager._tools.pop(name, None),
+    )
 
     try:
-        # 动态加载模块
-        spec = importlib.util.spec_from_file_location("user_skill", script_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-
-        import inspect
-
-        # 扫描模块中的函数，只注册真正的函数，跳过类
-        for attr_name in dir(module):
-            attr = getattr(module, attr_name)
-            
-            # 必须是可调用的，且不是私有的，且定义在该模块中
-            if callable(attr) and not attr_name.startswith("_") and getattr(attr, "__module__", "") == "user_skill":
-                # 排除类，只接受函数
-                if inspect.isfunction(attr):
-                    # 如果已经有 mcp 实例注册过了，FastMCP 会处理
-                    # 这里我们统一注册到 runner 创建的 mcp 实例上
-                    mcp.tool()(attr)
-                    print(f"已注册工具: {attr_name}", file=sys.stderr)
-
+        loader.load()
         logger_info = f"已从 {script_path} 加载并注册工具"
         print(logger_info, file=sys.stderr)
-        
-        mcp.run()
+
+        if hot_reload_supported(mcp):
+            anyio.run(_serve, mcp, loader)
+        else:
+            print("当前 fastmcp / mcp 版本未经验证，不支持原地重载，脚本变化时将整体重启", file=sys.stderr)
+            mcp.run()
     except Exception as e:
         print(f"运行 Skill 失败: {e}", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python script_runner.py <path_to_script>", file=sys.stderr)
+        print("Usage: python script_runner.py <path_to_script> | --warm | --fork-server <fd>", file=sys.stderr)
         sys.exit(1)
-    
-    run_skill(sys.argv[1])
+
+    if sys.argv[1] in ("--warm", "--fork-server"):
+        # 预热模式：fastmcp 已在模块顶部导入，等待主机分配脚本（见 warm_runner.py）
+        import warm_runner
+        if sys.argv[1] == "--warm":
+            script_path, env = warm_runner.wait_for_adoption()
+        else:
+            script_path, env = warm_runner.serve_forks(int(sys.argv[2]))
+        os.environ.update(env)
+        run_skill(script_path)
+    else:
+        run_skill(sys.argv[1])
@@ -0,0 +1,93 @@
+"""
+Skill 脚本的加载与原地热重载，由 script_runner.py 以同目录模块导入（只依赖标准库）。
+
+重载时在旧命名空间的副本中重新执行脚本（与 importlib.reload 类似），执行成功后才替换模块，
+出错时旧模块与已注册的工具都不受影响。进程中已导入的第三方库、已加载的模型都留在内存中；
+模块级变量写成 `cache = globals().get("cache") or {}` 的形式即可跨重载保留（副本是浅拷贝，
+新旧命名空间共享同一对象，执行出错前对这些对象的原地修改不会回滚）。
+脚本的 PEP 723 内联元数据（# /// script 块）变化时依赖可能不同，无法原地生效，
+抛出 DependenciesChanged，由主机整体重启该 Skill。
+"""
+import importlib.util
+import inspect
+import re
+from typing import Callable, Optional, Set
+
+MODULE_NAME = "user_skill"
+# 主机请求运行器原地重新加载脚本的 JSON-RPC 方法，由 script_runner.py 拦截处理，不交给 FastMCP
+RELOAD_METHOD = "promptstudio/reload"
+# 依赖声明变化、无法原地重载时返回的错误码，主机据此整体重启
+DEPENDENCIES_CHANGED = -32001
+
+# PEP 723 给出的参考正则
+_METADATA = re.compile(r"(?m)^# /// (?P<type>[a-zA-Z0-9-]+)$\s(?P<content>(^#(| .*)$\s)+)^# ///$")
+
+
+def dependencies(source: str) -> Optional[str]:
+    """脚本的 PEP 723 script 元数据块原文，没有时返回 None。"""
+    for match in _METADATA.finditer(source):
+        if match.group("type") == "script":
+            return match.group("content")
+    return None
+
+
+class DependenciesChanged(Exception):
+    pass
+
+
+class SkillLoader:
+    def __init__(self, script_path: str, register: Callable[[Callable], None], unregister: Callable[[str], None]):
+        """register(fn) 把函数注册为工具，unregister(name) 移除同名工具。"""
+        self.script_path = script_path
+        self.register = register
+        self.unregister = unregister
+        self.module = None
+        self.source: Optional[str] = None
+        self.tools: Set[str] = set()
+
+    def load(self) -> bool:
+        """
+        加载或重新加载脚本并同步注册的工具，返回工具是否可能变化（脚本内容未变时为 False）。
+        语法错误或执行出错时抛出异常，已注册的工具保持旧版本。
+        """
+        with open(self.script_path, "r", encoding="utf-8") as f:
+            source = f.read()
+        if source == self.source:
+            return False
+        if self.module is not None and dependencies(source) != dependencies(self.source):
+            raise DependenciesChanged(f"{self.script_path} 的依赖声明已变化，需要重启")
+
+        code = compile(source, self.script_path, "exec")
+        spec = importlib.util.spec_from_file_location(MODULE_NAME, self.script_path)
+        module = importlib.util.module_from_spec(spec)
+        previous = {}
+        if self.module is not None:
+            previous = dict(vars(self.module))
+            vars(module).update(previous)
+        exec(code, module.__dict__)
+
+        # 只注册脚本中定义的公开函数（跳过类与导入的函数），以及本次执行重新定义的函数：
+        # 已从脚本中删除的函数仍留在命名空间里，但对象未变
+        functions = {
+            name: attr for name, attr in vars(module).items()
+            if not name.startswith("_")
+            and inspect.isfunction(attr)
+            and attr.__module__ == MODULE_NAME
+            and previous.get(name) is not attr
+        }
+        for name in self.tools:
+            self.unregister(name)
+        registered = []
+        try:
+            for function in functions.values():
+                self.register(function)
+                registered.append(function.__name__)
+        except BaseException:
+            # 注册失败时恢复旧版本的工具
+            for name in registered:
+                self.unregister(name)
+            for name in self.tools:
+                self.register(previous[name])
+            raise
+        self.module, self.source, self.tools = module, source, set(functions)
+        return True
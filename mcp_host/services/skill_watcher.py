@@ -0,0 +1,73 @@
+"""
+监视 Skill 目录，Skill 脚本（<name>.py）保存后回调 on_change(name)。
+
+编辑器保存一次文件往往产生多个事件（写入、替换、重命名），同一 Skill 在 debounce 秒内的事件合并为一次回调。
+watchdog 在自己的线程中分发事件，这里转交到主机的事件循环处理。
+"""
+import asyncio
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+logger = logging.getLogger(__name__)
+
+# 同一 Skill 的文件事件合并窗口（秒）
+DEBOUNCE = 0.2
+
+
+class SkillWatcher(FileSystemEventHandler):
+    def __init__(self, directory: Path, on_change: Callable[[str], Awaitable[None]], debounce: float = DEBOUNCE):
+        self.directory = directory
+        self.on_change = on_change
+        self.debounce = debounce
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._observer: Optional[Observer] = None
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        # 进行中的 on_change 任务；保留引用，避免任务在完成前被垃圾回收
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._observer = Observer()
+        self._observer.schedule(self, str(self.directory), recursive=False)
+        self._observer.start()
+        logger.info(f"正在监视 Skill 目录 {self.directory}")
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    def on_any_event(self, event: FileSystemEvent):
+        if event.is_directory or event.event_type not in ("created", "modified", "moved"):
+            return
+        # 编辑器常先写临时文件再改名覆盖，改名事件以目标路径为准
+        path = Path(getattr(event, "dest_path", "") or event.src_path)
+        if path.suffix != ".py" or path.parent != self.directory:
+            return
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._schedule, path.stem)
+
+    def _schedule(self, name: str):
+        timer = self._timers.pop(name, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[name] = self._loop.call_later(self.debounce, self._fire, name)
+
+    def _fire(self, name: str):
+        self._timers.pop(name, None)
+        task = asyncio.ensure_future(self.on_change(name))
+        self._tasks.add(task)
+        task.add_done_callback(lambda done: self._on_done(name, done))
+
+    def _on_done(self, name: str, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"处理 Skill {name} 的文件变化失败: {task.exception()}")
@@ -1,18 +1,82 @@
 import json
 import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from .process_manager import McpProcess
 
 logger = logging.getLogger(__name__)
 
+# 同一 client 同时等待响应的请求上限；窗口占满时新的 call 排队等待（背压），等待时间计入 timeout
+# 取 256：benchmarks/stdio_echo.py 中 64 的吞吐低于改造前的逐条收发，256 时明显高于后者
+DEFAULT_MAX_IN_FLIGHT = 256
+# 单条消息（一行 JSON）的字节上限，超出的消息被丢弃并记录日志，不影响后续消息
+DEFAULT_MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+# 每次从 stdout 读取的字节数；一次读取可能包含多条消息，也可能只是大消息的一部分
+READ_CHUNK_BYTES = 256 * 1024
+
+
+class RpcError(Exception):
+    """服务器返回的 JSON-RPC 错误，code 为错误码（非标准错误对象时为 None）。"""
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
 class StdioRpcClient:
-    """处理与 MCP 服务器的 JSON-RPC stdio 通信 (Async) """
-    def __init__(self, mcp_process: McpProcess):
+    """
+    处理与 MCP 服务器的 JSON-RPC stdio 通信 (Async)
+
+    多个请求在同一管道上流水线发送：call 只把请求放入写缓冲，由写任务把同一轮事件循环中积攒的请求
+    合并为一次 write + drain。同时在途的请求数受 max_in_flight 限制。
+    stdout 按块读取并自行按换行分帧，单条消息大小只受 max_message_bytes 限制，不受 asyncio
+    StreamReader 默认 64 KiB 行长度限制。
+    """
+    def __init__(
+        self,
+        mcp_process: McpProcess,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        max_message_bytes: int = DEFAULT_MAX_MESSAGE_BYTES,
+    ):
         self.mcp_process = mcp_process
+        self.max_in_flight = max_in_flight
+        self.max_message_bytes = max_message_bytes
         self.request_id = 0
         self.pending_requests: Dict[int, asyncio.Future] = {}
         self._is_running = False
+        self._window = asyncio.Semaphore(max_in_flight)
+        # 因窗口已满而排队、尚未发出的请求数
+        self._queued = 0
+        # 待写出的 (数据, 写出完成后需要通知的 future)
+        self._write_buffer: List[Tuple[bytes, Optional[asyncio.Future]]] = []
+        self._write_ready = asyncio.Event()
+        # 服务器主动发来的通知（如 notifications/tools/list_changed）交给此回调处理
+        self.on_notification: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    @property
+    def in_flight(self) -> int:
+        """已发出（或排队写出）且尚未收到响应的请求数。"""
+        return len(self.pending_requests)
+
+    @property
+    def outstanding(self) -> int:
+        """在途与排队中的请求总数，副本路由按它选择最空闲的 client。"""
+        return len(self.pending_requests) + self._queued
+
+    @property
+    def is_alive(self) -> bool:
+        """读写循环仍在运行，且底层进程未退出、管道未关闭。"""
+        process = self.mcp_process.process
+        return (
+            self._is_running and
+            process is not None and
+            process.returncode is None and
+            not process.stdin.is_closing()
+        )
+
+    @property
+    def saturated(self) -> bool:
+        """在途窗口已满，新的 call 需要排队。"""
+        return self._window.locked()
 
     async def start(self):
         if not self.mcp_process.process:
@@ -21,47 +85,122 @@ class StdioRpcClient:
             return
         self._is_running = True
         self._read_task = asyncio.create_task(self._read_loop())
+        self._write_task = asyncio.create_task(self._write_loop())
 
     async def stop(self):
         """停止客户端并清理任务"""
         self._is_running = False
-        if hasattr(self, '_read_task'):
-            self._read_task.cancel()
+        # 清理待处理的请求
+        self._fail_pending(Exception("Client stopped"))
+        for name in ('_read_task', '_write_task'):
+            task = getattr(self, name, None)
+            if task is None:
+                continue
+            task.cancel()
             try:
-                await self._read_task
+                await task
             except asyncio.CancelledError:
                 pass
-        
-        # 清理待处理的请求
+
+    def _fail_pending(self, error: Exception):
+        """让所有等待响应或等待写出的调用立即失败，而不是等到各自超时。"""
         for future in self.pending_requests.values():
             if not future.done():
-                future.set_exception(Exception("Client stopped"))
+                future.set_exception(error)
         self.pending_requests.clear()
+        for _, flushed in self._write_buffer:
+            if flushed is not None and not flushed.done():
+                flushed.set_exception(error)
+        self._write_buffer.clear()
+
+    async def _write_loop(self):
+        """把写缓冲中积攒的请求合并写出，drain 期间到达的请求留到下一次一起写。"""
+        stdin = self.mcp_process.process.stdin
+        try:
+            while self._is_running:
+                await self._write_ready.wait()
+                self._write_ready.clear()
+                batch, self._write_buffer = self._write_buffer, []
+                if not batch:
+                    continue
+                try:
+                    stdin.write(b"".join(data for data, _ in batch))
+                    await stdin.drain()
+                except Exception as e:
+                    # 管道已断开（进程退出），后续请求不可能得到响应
+                    logger.error(f"[{self.mcp_process.name}] Write error: {e}")
+                    error = Exception(f"Server {self.mcp_process.name} stdin closed: {e}")
+                    self._write_buffer = batch + self._write_buffer
+                    self._is_running = False
+                    self._fail_pending(error)
+                    return
+                for _, flushed in batch:
+                    if flushed is not None and not flushed.done():
+                        flushed.set_result(None)
+        except asyncio.CancelledError:
+            pass
+
+    def _send(self, message: Dict[str, Any], flushed: Optional[asyncio.Future] = None):
+        if not self._is_running:
+            raise RuntimeError(f"服务器 [{self.mcp_process.name}] 的连接已关闭")
+        payload = json.dumps(message, ensure_ascii=False).encode('utf-8') + b"\n"
+        self._write_buffer.append((payload, flushed))
+        self._write_ready.set()
 
     async def _read_loop(self):
-        """循环读取 stdout 中的 JSON-RPC 消息"""
+        """按块读取 stdout，按换行拆分出 JSON-RPC 消息"""
         stdout = self.mcp_process.process.stdout
+        buffer = bytearray()
+        # 正在丢弃一条超长消息，直到遇到它的换行
+        discarding = False
         try:
             while self._is_running:
-                line = await stdout.readline()
-                if not line:
+                chunk = await stdout.read(READ_CHUNK_BYTES)
+                if not chunk:
                     break
-                
-                clean_line = line.decode('utf-8').strip()
-                if not clean_line:
-                    continue
 
-                try:
-                    message = json.loads(clean_line)
-                    self._handle_message(message)
-                except json.JSONDecodeError:
-                    logger.debug(f"[{self.mcp_process.name}] 非 JSON 输出: {clean_line}")
+                start = 0
+                end = chunk.find(b"\n")
+                while end != -1:
+                    if discarding:
+                        discarding = False
+                    elif buffer:
+                        buffer += chunk[start:end]
+                        self._handle_line(bytes(buffer))
+                        buffer.clear()
+                    else:
+                        self._handle_line(chunk[start:end])
+                    start = end + 1
+                    end = chunk.find(b"\n", start)
+
+                if not discarding:
+                    buffer += chunk[start:]
+                    if len(buffer) > self.max_message_bytes:
+                        logger.error(
+                            f"[{self.mcp_process.name}] 消息超过 {self.max_message_bytes} 字节，已丢弃"
+                        )
+                        buffer.clear()
+                        discarding = True
         except asyncio.CancelledError:
             pass
         except Exception as e:
             logger.error(f"[{self.mcp_process.name}] Read loop error: {e}")
         finally:
             self._is_running = False
+            self._write_ready.set()
+            self._fail_pending(Exception(f"Server {self.mcp_process.name} closed the connection"))
+
+    def _handle_line(self, line: bytes):
+        clean_line = line.decode('utf-8', errors='replace').strip()
+        if not clean_line:
+            return
+        try:
+            message = json.loads(clean_line)
+        except json.JSONDecodeError:
+            logger.debug(f"[{self.mcp_process.name}] 非 JSON 输出: {clean_line[:200]}")
+            return
+        if isinstance(message, dict):
+            self._handle_message(message)
 
     def _handle_message(self, message: Dict[str, Any]):
         msg_id = message.get("id")
@@ -73,50 +212,62 @@ class StdioRpcClient:
                     if "error" in message:
                         error_obj = message["error"]
                         # 提取更详细的错误信息，包括 data 字段（通常包含堆栈）
+                        code = None
                         if isinstance(error_obj, dict):
                             msg = error_obj.get("message", "")
                             data = error_obj.get("data", "")
                             error_msg = f"{msg} {data}".strip() or json.dumps(error_obj)
+                            code = error_obj.get("code")
                         else:
                             error_msg = str(error_obj)
-                        future.set_exception(Exception(error_msg))
+                        future.set_exception(RpcError(error_msg, code))
                     else:
                         future.set_result(message.get("result"))
-        else:
-            # 通知 (暂时忽略)
-            pass
+        elif self.on_notification is not None:
+            try:
+                self.on_notification(message)
+            except Exception as e:
+                logger.error(f"[{self.mcp_process.name}] 处理通知失败: {e}")
 
     async def call(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10.0) -> Any:
-        self.request_id += 1
-        current_id = self.request_id
-        
-        future = asyncio.Future()
-        self.pending_requests[current_id] = future
-        
-        request = {
-            "jsonrpc": "2.0",
-            "id": current_id,
-            "method": method,
-            "params": params or {}
-        }
-        
+        """
+        发送请求并等待响应。在途窗口已满时先排队，排队时间计入 timeout；
+        超时抛出 asyncio.TimeoutError，调用方可据此降级或换用其他服务器。
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        if self._window.locked():
+            self._queued += 1
+            try:
+                await asyncio.wait_for(self._window.acquire(), timeout)
+            finally:
+                self._queued -= 1
+        else:
+            # 窗口未满时直接获取，不为等待额外创建任务
+            await self._window.acquire()
         try:
-            payload = json.dumps(request) + "\n"
-            self.mcp_process.process.stdin.write(payload.encode('utf-8'))
-            await self.mcp_process.process.stdin.drain()
-            
-            return await asyncio.wait_for(future, timeout=timeout)
+            self.request_id += 1
+            current_id = self.request_id
+
+            future = loop.create_future()
+            self.pending_requests[current_id] = future
+            self._send({
+                "jsonrpc": "2.0",
+                "id": current_id,
+                "method": method,
+                "params": params or {}
+            })
+            return await asyncio.wait_for(future, max(deadline - loop.time(), 0))
         finally:
             self.pending_requests.pop(current_id, None)
-    
+            self._window.release()
+
     async def notify(self, method: str, params: Optional[Dict[str, Any]] = None):
-        """发送通知 (无需等待响应)"""
-        notification = {
+        """发送通知 (无需等待响应)，返回时通知已写入管道"""
+        flushed = asyncio.get_running_loop().create_future()
+        self._send({
             "jsonrpc": "2.0",
             "method": method,
             "params": params or {}
-        }
-        payload = json.dumps(notification) + "\n"
-        self.mcp_process.process.stdin.write(payload.encode('utf-8'))
-        await self.mcp_process.process.stdin.drain()
-
+        }, flushed)
+        await flushed
@@ -0,0 +1,116 @@
+"""
+MCP 工具注册表：工具名 -> (所属服务器, 工具 schema)。
+
+各服务器的 tools/list 结果按服务器缓存，在服务器启动（新建客户端）、收到
+notifications/tools/list_changed、重启或超过 TTL 时刷新；停止或删除服务器时移除。
+路由 tools/call 只需一次字典查找，耗时与服务器数量无关。
+多个服务器提供同名工具时，先注册的服务器优先，该服务器移除后自动由其他服务器接替。
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 缓存的工具列表在此时长（秒）后视为过期，下次列出工具时重新拉取
+DEFAULT_TTL = 300.0
+
+
+class ToolRegistry:
+    def __init__(self, ttl: float = DEFAULT_TTL):
+        self.ttl = ttl
+        self._by_server: Dict[str, List[dict]] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._index: Dict[str, str] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._listeners: List[Callable[[], None]] = []
+
+    def add_listener(self, callback: Callable[[], None]):
+        """注册工具集合变化时的回调（用于向 MCP 客户端转发 list_changed）。"""
+        self._listeners.append(callback)
+
+    def lookup(self, tool_name: str) -> Optional[str]:
+        """返回提供该工具的服务器名，未知工具返回 None。"""
+        return self._index.get(tool_name)
+
+    def is_fresh(self, server_name: str) -> bool:
+        fetched_at = self._fetched_at.get(server_name)
+        return fetched_at is not None and time.monotonic() - fetched_at < self.ttl
+
+    def tools(self, server_names: Optional[List[str]] = None) -> List[dict]:
+        """已缓存的工具列表（附带 _server_name），可限定服务器。"""
+        names = self._by_server.keys() if server_names is None else server_names
+        result = []
+        for name in names:
+            for tool in self._by_server.get(name, ()):
+                result.append({**tool, "_server_name": name})
+        return result
+
+    def update(self, server_name: str, tools: List[dict]):
+        previous = self._by_server.get(server_name)
+        self._by_server[server_name] = [tool for tool in tools if isinstance(tool, dict) and tool.get("name")]
+        self._fetched_at[server_name] = time.monotonic()
+        if previous != self._by_server[server_name]:
+            self._rebuild()
+
+    def invalidate(self, server_name: str):
+        """标记为过期，保留旧结果供路由使用，下次列出工具时刷新。"""
+        self._fetched_at.pop(server_name, None)
+
+    def remove(self, server_name: str):
+        """移除服务器的工具，并取消其进行中的后台刷新，避免刷新完成后又把工具加回来。"""
+        task = self._tasks.pop(server_name, None)
+        if task is not None:
+            task.cancel()
+        self._fetched_at.pop(server_name, None)
+        if self._by_server.pop(server_name, None) is not None:
+            self._rebuild()
+
+    async def refresh(self, server_name: str, fetch: Callable[[], Awaitable[Any]], force: bool = False) -> List[dict]:
+        """
+        用 fetch()（返回 tools/list 的结果）刷新一个服务器的工具。
+        同一服务器的并发刷新合并为一次；未过期且未强制时直接返回缓存。
+        """
+        lock = self._locks.setdefault(server_name, asyncio.Lock())
+        async with lock:
+            if force or not self.is_fresh(server_name):
+                result = await fetch()
+                self.update(server_name, (result or {}).get("tools", []))
+        return self._by_server.get(server_name, [])
+
+    def schedule(self, server_name: str, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        在后台刷新一个服务器的工具并返回任务；该服务器已有进行中的刷新时复用同一任务。
+        调用方可以只等待一段时间，超时的任务继续运行，完成后更新注册表并触发变更回调。
+        """
+        task = self._tasks.get(server_name)
+        if task is None or task.done():
+            task = asyncio.create_task(self.refresh(server_name, fetch))
+            task.add_done_callback(lambda done: self._on_scheduled_done(server_name, done))
+            self._tasks[server_name] = task
+        return task
+
+    def _on_scheduled_done(self, server_name: str, task: asyncio.Task):
+        if self._tasks.get(server_name) is task:
+            del self._tasks[server_name]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error listing tools for {server_name}: {task.exception()}")
+
+    def _rebuild(self):
+        index: Dict[str, str] = {}
+        for server_name, tools in self._by_server.items():
+            for tool in tools:
+                owner = index.setdefault(tool["name"], server_name)
+                if owner != server_name:
+                    logger.warning(f"工具 {tool['name']} 同时由 {owner} 与 {server_name} 提供，使用 {owner}")
+        self._index = index
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"工具变更回调失败: {e}")
+
+
+tool_registry = ToolRegistry()
@@ -0,0 +1,299 @@
+"""
+预热的 Skill 运行器池，消除 Skill 启动时解析依赖、导入 fastmcp 的冷启动开销。
+
+- 进程池模式（默认，各平台可用）：预先启动 size 个以 --warm 运行的 script_runner，
+  它们导入完成后空闲等待；启动 Skill 时取出一个，经 stdin 发送脚本路径与环境变量即可开始服务，
+  随后在后台补足空闲进程。池为空时返回 None，由调用方照常冷启动。
+- fork 服务器模式（可选，需要 fork 与 SCM_RIGHTS，即 Linux / macOS）：只常驻一个已完成导入的
+  script_runner --fork-server，每个 Skill 由它 fork 出子进程，stdio 管道经 Unix socket 传给子进程。
+  子进程不是主机的直接子进程，由 ForkedProcess 提供与 asyncio 子进程相同的接口。
+
+进程池大小由环境变量 PROMPTSTUDIO_WARM_RUNNERS 设置（0 表示关闭），
+PROMPTSTUDIO_SKILL_FORK_SERVER=1 启用 fork 服务器模式。
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WARM_POOL_SIZE = int(os.environ.get("PROMPTSTUDIO_WARM_RUNNERS", "2"))
+FORK_SERVER = os.environ.get("PROMPTSTUDIO_SKILL_FORK_SERVER") == "1"
+# 子进程 stdout 的 StreamReader 缓冲上限，与 asyncio.create_subprocess_exec 的默认值一致
+STREAM_LIMIT = 2 ** 16
+# 等待预热进程完成导入的时限（秒），uv 首次解析依赖可能较慢
+WARM_UP_TIMEOUT = 120.0
+# 与 warm_runner.READY 一致
+READY = b"warm runner ready\n"
+
+
+def fork_server_supported() -> bool:
+    return hasattr(os, "fork") and hasattr(socket, "send_fds")
+
+
+def _adoption(script_path: str, env: Optional[Dict[str, str]]) -> bytes:
+    return json.dumps({"script": script_path, "env": env or {}}).encode("utf-8") + b"\n"
+
+
+class ForkedProcess:
+    """fork 服务器创建的 Skill 进程，接口与 asyncio.subprocess.Process 中 McpProcess 用到的部分一致。"""
+
+    def __init__(self, pid: int, stdin: asyncio.StreamWriter, stdout: asyncio.StreamReader, stderr: asyncio.StreamReader):
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self._exited = asyncio.get_running_loop().create_future()
+
+    def _set_exit(self, status: int):
+        if self.returncode is None:
+            self.returncode = status
+            self._exited.set_result(status)
+            self.stdin.close()
+
+    def send_signal(self, sig: int):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+    async def wait(self) -> int:
+        return await asyncio.shield(self._exited)
+
+
+class ForkServer:
+    def __init__(self, command: str, args: List[str]):
+        self.command = command
+        self.args = args
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._sock: Optional[socket.socket] = None
+        self._children: Dict[int, ForkedProcess] = {}
+        # 在登记为 ForkedProcess 之前就已退出的子进程
+        self._early_exits: Dict[int, int] = {}
+        # 按发送顺序等待 fork 服务器回报 pid
+        self._spawning: List[asyncio.Future] = []
+        self._lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self):
+        async with self._lock:
+            if self.running:
+                return
+            ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    self.command, *self.args, "--fork-server", str(theirs.fileno()),
+                    pass_fds=(theirs.fileno(),),
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.DEVNULL,
+                )
+            except Exception:
+                ours.close()
+                raise
+            finally:
+                theirs.close()
+            ours.setblocking(False)
+            self._sock = ours
+            self._tasks = [
+                asyncio.create_task(self._read_loop(ours)),
+                asyncio.create_task(self._watch(self._process)),
+            ]
+            logger.info(f"Skill fork 服务器已启动，PID: {self._process.pid}")
+
+    async def _read_loop(self, sock: socket.socket):
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await loop.sock_recv(sock, 64 * 1024)
+            if not data:
+                return
+            message = json.loads(data)
+            if "pid" in message:
+                if self._spawning:
+                    self._spawning.pop(0).set_result(message["pid"])
+            elif "exit" in message:
+                child = self._children.pop(message["exit"], None)
+                if child is not None:
+                    child._set_exit(message["status"])
+                else:
+                    self._early_exits[message["exit"]] = message["status"]
+
+    async def _watch(self, process: asyncio.subprocess.Process):
+        await process.wait()
+        logger.warning(f"Skill fork 服务器已退出，返回码 {process.returncode}")
+        self._shutdown_children()
+
+    def _shutdown_children(self):
+        """fork 服务器退出后无人回报子进程的退出码，结束其全部子进程并视为已退出。"""
+        for future in self._spawning:
+            if not future.done():
+                future.set_exception(RuntimeError("fork server exited"))
+        self._spawning.clear()
+        children, self._children = self._children, {}
+        for child in children.values():
+            child.kill()
+            child._set_exit(-signal.SIGKILL)
+
+    async def spawn(self, script_path: str, env: Optional[Dict[str, str]]) -> ForkedProcess:
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stdin_r, stdin_w = os.pipe()
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        pid_future = loop.create_future()
+        self._spawning.append(pid_future)
+        try:
+            socket.send_fds(self._sock, [_adoption(script_path, env)], [stdin_r, stdout_w, stderr_w])
+            pid = await asyncio.wait_for(pid_future, timeout=10)
+        except BaseException:
+            if pid_future in self._spawning:
+                self._spawning.remove(pid_future)
+            for fd in (stdin_w, stdout_r, stderr_r):
+                os.close(fd)
+            raise
+        finally:
+            for fd in (stdin_r, stdout_w, stderr_w):
+                os.close(fd)
+
+        transport, protocol = await loop.connect_write_pipe(
+            asyncio.streams.FlowControlMixin, os.fdopen(stdin_w, "wb", 0)
+        )
+        stdin = asyncio.StreamWriter(transport, protocol, None, loop)
+        stdout = asyncio.StreamReader(limit=STREAM_LIMIT)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stdout), os.fdopen(stdout_r, "rb", 0))
+        stderr = asyncio.StreamReader(limit=STREAM_LIMIT)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stderr), os.fdopen(stderr_r, "rb", 0))
+
+        child = ForkedProcess(pid, stdin, stdout, stderr)
+        if pid in self._early_exits:
+            child._set_exit(self._early_exits.pop(pid))
+        else:
+            self._children[pid] = child
+        return child
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self.running:
+            self._process.terminate()
+            await self._process.wait()
+        self._shutdown_children()
+
+
+class WarmPool:
+    def __init__(self, command: str, args: List[str], size: int = WARM_POOL_SIZE, fork_server: bool = FORK_SERVER):
+        """command / args 为运行 script_runner.py 的命令，不含脚本路径。"""
+        self.command = command
+        self.args = args
+        self.size = size
+        self.fork_server = ForkServer(command, args) if fork_server and fork_server_supported() else None
+        self._idle: List[asyncio.subprocess.Process] = []
+        self._fill_task: Optional[asyncio.Task] = None
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    async def adopt(self, script_path: str, env: Optional[Dict[str, str]] = None):
+        """
+        取一个预热进程运行 script_path，返回其进程对象；
+        没有可用的预热进程时返回 None，调用方应冷启动。
+        """
+        if self.fork_server is not None:
+            try:
+                return await self.fork_server.spawn(script_path, env)
+            except Exception as e:
+                logger.error(f"fork 服务器启动 Skill 失败，改为冷启动: {e}")
+                return None
+
+        self.schedule_fill()
+        while self._idle:
+            process = self._idle.pop(0)
+            if process.returncode is not None:
+                continue
+            try:
+                process.stdin.write(_adoption(script_path, env))
+                await process.stdin.drain()
+            except Exception as e:
+                logger.warning(f"预热进程 {process.pid} 不可用: {e}")
+                continue
+            return process
+        return None
+
+    def schedule_fill(self):
+        """在后台补足空闲的预热进程（fork 服务器模式下启动 fork 服务器）。"""
+        if self.size <= 0 and self.fork_server is None:
+            return
+        if self._fill_task is None or self._fill_task.done():
+            self._fill_task = asyncio.create_task(self._fill())
+
+    async def fill(self):
+        """补足空闲的预热进程并等待其完成导入；与后台补足共用同一任务。"""
+        self.schedule_fill()
+        if self._fill_task is not None:
+            await asyncio.shield(self._fill_task)
+
+    async def _fill(self):
+        try:
+            if self.fork_server is not None:
+                await self.fork_server.start()
+                return
+            self._idle = [process for process in self._idle if process.returncode is None]
+            while len(self._idle) < self.size:
+                process = await asyncio.create_subprocess_exec(
+                    self.command, *self.args, "--warm",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                # 只有完成导入的进程才放入池中，导入期间的 stderr 输出一并跳过
+                try:
+                    await asyncio.wait_for(self._ready(process), WARM_UP_TIMEOUT)
+                except BaseException:
+                    if process.returncode is None:
+                        process.kill()
+                    raise
+                self._idle.append(process)
+        except Exception as e:
+            logger.error(f"预热 Skill 运行器失败: {e}")
+
+    async def _ready(self, process: asyncio.subprocess.Process):
+        while True:
+            line = await process.stderr.readline()
+            if not line:
+                raise RuntimeError(f"预热进程 {process.pid} 在导入阶段退出")
+            if line == READY:
+                return
+
+    async def close(self):
+        if self._fill_task is not None:
+            self._fill_task.cancel()
+        idle, self._idle = self._idle, []
+        for process in idle:
+            if process.returncode is None:
+                process.stdin.close()
+                try:
+                    await asyncio.wait_for(process.wait(), timeout=5.0)
+                except asyncio.TimeoutError:
+                    process.kill()
+        if self.fork_server is not None:
+            await self.fork_server.close()
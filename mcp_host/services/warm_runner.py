@@ -0,0 +1,78 @@
+"""
+预热的 Skill 运行器进程一侧：先完成耗时的导入（fastmcp 等），再等待主机分配 Skill 脚本。
+
+- wait_for_adoption()：向 stderr 输出一行 READY 表示导入完成，然后空闲等待，从 stdin 读取一行 {"script": ..., "env": {...}} 后返回，
+  调用方随后在同一 stdio 上运行该 Skill；
+- serve_forks(fd)：fork 服务器，常驻并在 fd 对应的 Unix 数据报 socket 上接收请求及子进程的
+  stdin/stdout/stderr 管道，每个请求 fork 一个子进程。子进程中返回 (script, env)，父进程不返回，
+  只回报子进程的 pid 与退出码。
+
+只使用标准库，script_runner.py 以同目录模块导入；主机一侧见 warm_pool.py。
+"""
+import json
+import os
+import signal
+import socket
+import sys
+from typing import Dict, Tuple
+
+# 单个请求 / 回报数据报的最大字节数
+MESSAGE_BYTES = 64 * 1024
+# 预热进程完成导入后输出到 stderr 的一行
+READY = b"warm runner ready\n"
+
+
+def _parse(line: bytes) -> Tuple[str, Dict[str, str]]:
+    request = json.loads(line)
+    return request["script"], request.get("env") or {}
+
+
+def wait_for_adoption() -> Tuple[str, Dict[str, str]]:
+    os.write(2, READY)
+    # 逐字节读取，不经 sys.stdin 的缓冲，之后的 JSON-RPC 消息原样留给 Skill 读取
+    line = b""
+    while not line.endswith(b"\n"):
+        chunk = os.read(0, 1)
+        if not chunk:
+            # 主机关闭了空闲进程
+            sys.exit(0)
+        line += chunk
+    return _parse(line)
+
+
+def serve_forks(fd: int) -> Tuple[str, Dict[str, str]]:
+    sock = socket.socket(fileno=fd)
+
+    def send(message: dict):
+        try:
+            sock.send(json.dumps(message).encode("utf-8"))
+        except OSError:
+            # 主机已退出，下一次 recv 返回空后随之退出
+            pass
+
+    def reap(signum, frame):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            send({"exit": pid, "status": os.waitstatus_to_exitcode(status)})
+
+    signal.signal(signal.SIGCHLD, reap)
+    while True:
+        message, fds, _, _ = socket.recv_fds(sock, MESSAGE_BYTES, 3)
+        if not message:
+            sys.exit(0)
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            sock.close()
+            for target, received in enumerate(fds):
+                os.dup2(received, target)
+                os.close(received)
+            return _parse(message)
+        for received in fds:
+            os.close(received)
+        send({"pid": pid})
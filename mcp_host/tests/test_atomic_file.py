@@ -0,0 +1,135 @@
+"""
+MCP 配置文件并发写入压力测试，以及 atomic_file 跨进程加锁与两份副本一致性的检查。
+
+在仓库根目录运行：python -m unittest discover -s mcp_host/tests -t .
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+_home = tempfile.mkdtemp()
+
+with mock.patch.dict(os.environ, {"HOME": _home, "USERPROFILE": _home}):
+    from mcp_host.services.process_manager import McpProcessManager
+    from mcp_host.services import atomic_file
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def tearDownModule():
+    shutil.rmtree(_home, ignore_errors=True)
+
+
+class ConfigStressTests(unittest.TestCase):
+    THREADS = 8
+    ROUNDS = 50
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.manager = McpProcessManager()
+        self.original_path = self.manager.config_path
+        self.manager.config_path = Path(self.tmpdir) / "mcp_config.json"
+        self.addCleanup(setattr, self.manager, "config_path", self.original_path)
+        self.manager._ensure_config_dir()
+
+    def test_concurrent_updates_are_not_lost_or_truncated(self):
+        errors = []
+        done = threading.Event()
+
+        def writer(n: int):
+            for i in range(self.ROUNDS):
+                def mutate(config: dict):
+                    config["servers"][f"server-{n}-{i}"] = {"command": "x" * 200, "args": [n, i]}
+                self.manager.update_config(mutate)
+
+        def reader():
+            while not done.is_set():
+                try:
+                    with open(self.manager.config_path, "r", encoding="utf-8") as f:
+                        json.load(f)
+                except Exception as e:
+                    errors.append(e)
+
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(self.THREADS)]
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        config = self.manager.load_config()
+        self.assertEqual(len(config["servers"]), self.THREADS * self.ROUNDS)
+        # 除跨进程锁文件外不留下临时文件
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), [".mcp_config.json.lock", "mcp_config.json"])
+
+    def test_corrupt_config_is_preserved(self):
+        self.manager.config_path.write_text('{"servers": {"a": ', encoding="utf-8")
+        self.assertEqual(self.manager.load_config(), {"servers": {}})
+        backups = [name for name in os.listdir(self.tmpdir) if ".corrupt-" in name]
+        self.assertEqual(len(backups), 1)
+
+
+# 子进程中以 path_lock 包裹“读-改-写”，对同一文件中的计数器累加 ROUNDS 次
+_INCREMENT = """
+import importlib.util, json, sys
+spec = importlib.util.spec_from_file_location("atomic_file", sys.argv[1])
+atomic_file = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(atomic_file)
+path, rounds = sys.argv[2], int(sys.argv[3])
+for _ in range(rounds):
+    with atomic_file.path_lock(path):
+        with open(path, encoding="utf-8") as f:
+            count = json.load(f)["count"]
+        atomic_file.atomic_write_json(path, {"count": count + 1})
+"""
+
+
+class AtomicFileTests(unittest.TestCase):
+    PROCESSES = 4
+    ROUNDS = 200
+
+    def test_copies_are_identical(self):
+        server_copy = REPO_ROOT / "server" / "prompt_studio_be" / "atomic_file.py"
+        if not server_copy.exists():
+            self.skipTest("仓库中没有 server 目录")
+        host_copy = Path(atomic_file.__file__)
+        self.assertEqual(server_copy.read_bytes(), host_copy.read_bytes(), "两份 atomic_file.py 需保持一致")
+
+    @unittest.skipIf(atomic_file.fcntl is None, "平台不支持 flock")
+    def test_path_lock_serializes_processes(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        path = os.path.join(tmpdir, "counter.json")
+        atomic_file.atomic_write_json(path, {"count": 0})
+        processes = [
+            subprocess.Popen([sys.executable, "-c", _INCREMENT, atomic_file.__file__, path, str(self.ROUNDS)])
+            for _ in range(self.PROCESSES)
+        ]
+        for process in processes:
+            self.assertEqual(process.wait(timeout=60), 0)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["count"], self.PROCESSES * self.ROUNDS)
+
+    def test_path_lock_is_reentrant(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        path = os.path.join(tmpdir, "config.json")
+        with atomic_file.path_lock(path), atomic_file.path_lock(os.path.relpath(path)):
+            atomic_file.atomic_write_json(path, {})
+        self.assertEqual(atomic_file.path_lock(path)._depth, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
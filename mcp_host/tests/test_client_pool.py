@@ -0,0 +1,90 @@
+"""
+多副本服务器的 client 路由与单副本重启测试。
+
+在仓库根目录运行：python -m unittest discover -s mcp_host/tests -t .
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+_home = tempfile.mkdtemp()
+
+with mock.patch.dict(os.environ, {"HOME": _home, "USERPROFILE": _home}):
+    from mcp_host.services.client_pool import ClientPool
+    from mcp_host.services.process_manager import McpProcessManager
+    from mcp_host.tests.test_stdio_client import ECHO_SERVER
+
+
+def tearDownModule():
+    shutil.rmtree(_home, ignore_errors=True)
+
+
+class FakeClient:
+    def __init__(self, outstanding=0, is_alive=True):
+        self.outstanding = outstanding
+        self.is_alive = is_alive
+
+
+class PickTests(unittest.TestCase):
+    def test_least_outstanding_and_rotation(self):
+        pool = ClientPool("s")
+        pool.clients = {0: FakeClient(3), 1: FakeClient(1), 2: FakeClient(1, is_alive=False)}
+        self.assertIs(pool.pick(), pool.clients[1])
+        self.assertEqual(pool.missing(3), [2])
+
+        pool.clients = {i: FakeClient() for i in range(3)}
+        self.assertEqual({id(pool.pick()) for _ in range(3)}, {id(c) for c in pool.clients.values()})
+
+        pool.clients = {0: FakeClient(is_alive=False)}
+        self.assertIsNone(pool.pick())
+
+
+class ReplicaTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = McpProcessManager()
+        original_path = self.manager.config_path
+        self.manager.config_path = Path(_home) / "replica_config.json"
+        self.addCleanup(setattr, self.manager, "config_path", original_path)
+        await self.manager.start_server("echo", {
+            "command": sys.executable, "args": ["-c", ECHO_SERVER], "replicas": 3
+        })
+        self.addAsyncCleanup(self.manager.stop_server, "echo")
+        self.pool = ClientPool("echo")
+        self.addAsyncCleanup(self.pool.close)
+
+    async def test_calls_spread_across_replicas(self):
+        self.assertEqual(len(await self.pool.connect(self.manager.replicas["echo"])), 3)
+        self.assertEqual(self.manager.load_config()["servers"]["echo"]["replicas"], 3)
+
+        calls = [asyncio.create_task(self.pool.pick().call("hold", {"n": n})) for n in range(6)]
+        await asyncio.sleep(0.2)
+        self.assertEqual([c.outstanding for c in self.pool.clients.values()], [2, 2, 2])
+        for client in self.pool.clients.values():
+            await client.notify("release")
+        self.assertEqual(sorted(r["n"] for r in await asyncio.gather(*calls)), list(range(6)))
+
+    async def test_replica_restarts_independently(self):
+        await self.pool.connect(self.manager.replicas["echo"])
+        survivors = [self.pool.clients[0], self.pool.clients[2]]
+        crashed = self.manager.replicas["echo"][1]
+        crashed.process.kill()
+        await crashed.process.wait()
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.pool.missing(3), [1])
+        for _ in range(4):
+            self.assertIn(self.pool.pick(), survivors)
+
+        await self.manager.restart_replica("echo", 1)
+        self.assertEqual(len(await self.pool.connect(self.manager.replicas["echo"])), 1)
+        self.assertEqual(self.pool.missing(3), [])
+        self.assertEqual([self.pool.clients[0], self.pool.clients[2]], survivors)
+        self.assertEqual(await self.pool.clients[1].call("echo", {"n": 1}), {"n": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
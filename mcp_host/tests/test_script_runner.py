@@ -0,0 +1,119 @@
+"""
+script_runner.py 与 FastMCP 的桥接测试：通过 stdio 启动真实的 Skill 运行器，验证原地重载
+（依赖 FastMCP 私有属性）在 requirements.txt 固定的 mcp / fastmcp 版本上可用；
+其他版本上运行器不启用原地重载，重载请求返回 -32601，由主机整体重启。
+未安装 fastmcp 时跳过。
+
+在仓库根目录运行：python -m unittest discover -s mcp_host/tests -t .
+"""
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+import unittest
+from importlib import metadata
+from pathlib import Path
+from unittest import mock
+
+_home = tempfile.mkdtemp()
+
+with mock.patch.dict(os.environ, {"HOME": _home, "USERPROFILE": _home}):
+    from mcp_host.services.process_manager import McpProcess
+    from mcp_host.services.skill_loader import RELOAD_METHOD
+    from mcp_host.services.stdio_client import RpcError, StdioRpcClient
+
+
+def tearDownModule():
+    shutil.rmtree(_home, ignore_errors=True)
+
+
+SCRIPT_RUNNER = str(Path(__file__).resolve().parent.parent / "services" / "script_runner.py")
+# 与 script_runner.VERIFIED_VERSIONS 一致（该模块依赖 fastmcp，这里不导入）
+VERIFIED_VERSIONS = {"mcp": "1.2.1", "fastmcp": "0.4.1"}
+
+V1 = '''
+def add(a: int, b: int) -> int:
+    return a + b
+'''
+
+V2 = '''
+def add(a: int, b: int) -> int:
+    return a + b + 1
+
+def greet(name: str) -> str:
+    return f"hello {name}"
+'''
+
+
+def _installed_versions():
+    try:
+        return {name: metadata.version(name) for name in VERIFIED_VERSIONS}
+    except metadata.PackageNotFoundError:
+        return None
+
+
+@unittest.skipUnless(importlib.util.find_spec("fastmcp") is not None, "fastmcp 未安装")
+class ScriptRunnerBridgeTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.script = self.tmpdir / "demo.py"
+        self.script.write_text(textwrap.dedent(V1), encoding="utf-8")
+
+        proc = McpProcess("demo", sys.executable, [SCRIPT_RUNNER, str(self.script)])
+        await proc.start()
+        self.addAsyncCleanup(proc.stop)
+        self.client = StdioRpcClient(proc)
+        self.notifications = []
+        self.client.on_notification = self.notifications.append
+        await self.client.start()
+        self.addAsyncCleanup(self.client.stop)
+
+        self.initialized = await self.client.call("initialize", {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "test", "version": "0"},
+        }, timeout=60)
+        await self.client.notify("notifications/initialized")
+
+    async def tool_names(self):
+        result = await self.client.call("tools/list")
+        return sorted(tool["name"] for tool in result["tools"])
+
+    async def call_tool(self, name, arguments):
+        result = await self.client.call("tools/call", {"name": name, "arguments": arguments})
+        return result["content"][0]["text"]
+
+    async def test_reload_in_place(self):
+        if _installed_versions() != VERIFIED_VERSIONS:
+            self.skipTest(f"已安装的版本 {_installed_versions()} 不是 {VERIFIED_VERSIONS}")
+        self.assertTrue(self.initialized["capabilities"]["tools"]["listChanged"])
+        self.assertEqual(await self.tool_names(), ["add"])
+        self.assertEqual(await self.call_tool("add", {"a": 1, "b": 2}), "3")
+
+        self.script.write_text(textwrap.dedent(V2), encoding="utf-8")
+        self.assertEqual(await self.client.call(RELOAD_METHOD), {"changed": True, "tools": ["add", "greet"]})
+        self.assertEqual(await self.tool_names(), ["add", "greet"])
+        self.assertEqual(await self.call_tool("add", {"a": 1, "b": 2}), "4")
+        self.assertEqual(await self.call_tool("greet", {"name": "mcp"}), "hello mcp")
+        self.assertIn("notifications/tools/list_changed", [n.get("method") for n in self.notifications])
+
+        # 新代码出错时保持旧版本
+        self.script.write_text("def add(:\n", encoding="utf-8")
+        with self.assertRaises(RpcError):
+            await self.client.call(RELOAD_METHOD)
+        self.assertEqual(await self.call_tool("add", {"a": 1, "b": 2}), "4")
+
+    async def test_unverified_versions_fall_back_to_restart(self):
+        if _installed_versions() == VERIFIED_VERSIONS:
+            self.skipTest("已安装经验证的版本")
+        self.assertEqual(await self.tool_names(), ["add"])
+        with self.assertRaises(RpcError) as raised:
+            await self.client.call(RELOAD_METHOD)
+        self.assertEqual(raised.exception.code, -32601)
+
+
+if __name__ == "__main__":
+    unittest.main()
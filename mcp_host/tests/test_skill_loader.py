@@ -0,0 +1,140 @@
+"""
+Skill 脚本原地热重载测试。
+
+在仓库根目录运行：python -m unittest discover -s mcp_host/tests -t .
+"""
+import shutil
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from mcp_host.services.skill_loader import DependenciesChanged, SkillLoader, dependencies
+
+V1 = '''
+import json
+
+calls = globals().get("calls") or []
+
+def add(a: int, b: int) -> int:
+    calls.append("add")
+    return a + b
+
+def old_tool() -> str:
+    return "old"
+
+class Helper:
+    pass
+'''
+
+V2 = '''
+import json
+
+calls = globals().get("calls") or []
+
+def add(a: int, b: int) -> int:
+    calls.append("add2")
+    return a + b + 1
+
+def new_tool() -> str:
+    return "new"
+'''
+
+METADATA = '''# /// script
+# dependencies = ["requests<3"]
+# ///
+'''
+
+
+class SkillLoaderTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.script = self.tmpdir / "demo.py"
+        self.tools = {}
+        self.loader = SkillLoader(
+            str(self.script),
+            register=lambda fn: self.tools.__setitem__(fn.__name__, fn),
+            unregister=lambda name: self.tools.pop(name),
+        )
+
+    def save(self, source: str):
+        self.script.write_text(textwrap.dedent(source), encoding="utf-8")
+
+    def test_reload_replaces_tools_and_keeps_state(self):
+        self.save(V1)
+        self.assertTrue(self.loader.load())
+        self.assertEqual(sorted(self.tools), ["add", "old_tool"])
+        self.tools["add"](1, 2)
+
+        self.save(V2)
+        self.assertTrue(self.loader.load())
+        self.assertEqual(sorted(self.tools), ["add", "new_tool"])
+        self.assertEqual(self.tools["add"](1, 2), 4)
+        self.assertEqual(self.loader.module.calls, ["add", "add2"])
+
+        self.assertFalse(self.loader.load())
+
+    def test_broken_code_keeps_previous_version(self):
+        self.save(V1)
+        self.loader.load()
+        self.save("def add(:\n")
+        with self.assertRaises(SyntaxError):
+            self.loader.load()
+        self.save(V1 + "\nraise RuntimeError('boom')\n")
+        with self.assertRaises(RuntimeError):
+            self.loader.load()
+        self.assertEqual(sorted(self.tools), ["add", "old_tool"])
+        self.assertEqual(self.tools["add"](1, 2), 3)
+
+    def test_failed_reload_leaves_namespace_untouched(self):
+        self.save(V1)
+        self.loader.load()
+        module = self.loader.module
+        self.tools["add"](1, 2)
+        self.save(V2 + "\ncalls = ['replaced']\nraise RuntimeError('boom')\n")
+        with self.assertRaises(RuntimeError):
+            self.loader.load()
+        self.assertIs(self.loader.module, module)
+        self.assertEqual(module.calls, ["add"])
+        self.assertIs(module.add, self.tools["add"])
+        self.assertFalse(hasattr(module, "new_tool"))
+
+        # 修复后的脚本照常生效，跨重载保留的状态仍是同一对象
+        self.save(V2)
+        self.assertTrue(self.loader.load())
+        self.assertIs(self.loader.module.calls, module.calls)
+        self.assertIs(self.loader.module.add.__globals__, vars(self.loader.module))
+
+    def test_failed_registration_restores_previous_tools(self):
+        self.save(V1)
+        self.loader.load()
+        previous = dict(self.tools)
+
+        def register(fn):
+            if fn.__name__ == "new_tool":
+                raise ValueError("invalid tool")
+            self.tools[fn.__name__] = fn
+
+        self.loader.register = register
+        self.save(V2)
+        with self.assertRaises(ValueError):
+            self.loader.load()
+        self.assertEqual(self.tools, previous)
+        self.assertEqual(sorted(self.loader.tools), ["add", "old_tool"])
+
+    def test_dependency_change_requires_restart(self):
+        self.save(METADATA + V1)
+        self.loader.load()
+        self.assertIn("requests<3", dependencies(self.loader.source))
+
+        self.save(METADATA + V2)
+        self.assertTrue(self.loader.load())
+        self.save(METADATA.replace("<3", "<4") + V2)
+        with self.assertRaises(DependenciesChanged):
+            self.loader.load()
+        self.assertEqual(sorted(self.tools), ["add", "new_tool"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+StdioRpcClient 的流水线、在途窗口与大消息测试，使用一个内联的回显服务器子进程。
+
+在仓库根目录运行：python -m unittest discover -s mcp_host/tests -t .
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+_home = tempfile.mkdtemp()
+
+with mock.patch.dict(os.environ, {"HOME": _home, "USERPROFILE": _home}):
+    from mcp_host.services.process_manager import McpProcess
+    from mcp_host.services.stdio_client import StdioRpcClient
+
+
+def tearDownModule():
+    shutil.rmtree(_home, ignore_errors=True)
+
+
+# echo 等请求立即回显 params；hold 暂不回复，直到收到 release 通知；exit 不回复直接退出；其他通知忽略
+ECHO_SERVER = """
+import json, sys
+held = []
+def reply(request):
+    sys.stdout.write(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": request["params"]}) + "\\n")
+for line in sys.stdin:
+    request = json.loads(line)
+    method = request["method"]
+    if method == "exit":
+        sys.exit(0)
+    if method == "hold":
+        held.append(request)
+        continue
+    if method == "release":
+        for request in held:
+            reply(request)
+        held.clear()
+    elif "id" in request:
+        reply(request)
+    sys.stdout.flush()
+"""
+
+
+class StdioRpcClientTests(unittest.IsolatedAsyncioTestCase):
+    async def start_client(self, **kwargs) -> StdioRpcClient:
+        process = McpProcess("echo", sys.executable, ["-c", ECHO_SERVER])
+        await process.start()
+        self.addAsyncCleanup(process.stop)
+        client = StdioRpcClient(process, **kwargs)
+        await client.start()
+        self.addAsyncCleanup(client.stop)
+        return client
+
+    async def test_pipelined_calls(self):
+        client = await self.start_client(max_in_flight=16)
+        results = await asyncio.gather(*(client.call("echo", {"n": n}) for n in range(200)))
+        self.assertEqual([r["n"] for r in results], list(range(200)))
+        self.assertEqual(client.in_flight, 0)
+
+    async def test_window_applies_backpressure(self):
+        client = await self.start_client(max_in_flight=2)
+        calls = [asyncio.create_task(client.call("hold", {"n": n})) for n in range(3)]
+        await asyncio.sleep(0.2)
+        self.assertEqual(client.in_flight, 2)
+        self.assertTrue(client.saturated)
+
+        # 第三个请求排队期间尚未发出，释放前两个后它才被服务器收到
+        await client.notify("release")
+        await asyncio.sleep(0.2)
+        self.assertEqual([(await call)["n"] for call in calls[:2]], [0, 1])
+        self.assertFalse(calls[2].done())
+        await client.notify("release")
+        self.assertEqual((await calls[2])["n"], 2)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.gather(*(client.call("hold", timeout=0.2) for _ in range(3)))
+
+    async def test_large_and_oversized_messages(self):
+        client = await self.start_client(max_message_bytes=2 * 1024 * 1024)
+        text = "长" * (1024 * 1024 // 3)
+        self.assertEqual((await client.call("echo", {"text": text}))["text"], text)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await client.call("echo", {"text": "x" * 3 * 1024 * 1024}, timeout=2)
+        self.assertEqual(await client.call("echo", {"n": 1}), {"n": 1})
+
+    async def test_server_exit_fails_pending_calls(self):
+        client = await self.start_client()
+        held = asyncio.create_task(client.call("hold", timeout=30))
+        await asyncio.sleep(0.1)
+        with self.assertRaisesRegex(Exception, "closed the connection"):
+            await client.call("exit", timeout=30)
+        with self.assertRaisesRegex(Exception, "closed the connection"):
+            await held
+
+
+if __name__ == "__main__":
+    unittest.main()
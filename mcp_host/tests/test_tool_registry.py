@@ -0,0 +1,97 @@
+"""
+工具注册表的路由、刷新与过期测试。
+
+在仓库根目录运行：python -m unittest discover -s mcp_host/tests -t .
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from mcp_host.services.tool_registry import ToolRegistry
+
+
+def tools_result(*names: str) -> dict:
+    return {"tools": [{"name": name, "inputSchema": {"type": "object"}} for name in names]}
+
+
+class ToolRegistryTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.registry = ToolRegistry(ttl=60)
+        self.calls = 0
+
+    def fetcher(self, *names: str):
+        async def fetch():
+            self.calls += 1
+            await asyncio.sleep(0)
+            return tools_result(*names)
+        return fetch
+
+    async def test_lookup_and_listing(self):
+        await self.registry.refresh("a", self.fetcher("read", "write"))
+        await self.registry.refresh("b", self.fetcher("search"))
+        self.assertEqual(self.registry.lookup("write"), "a")
+        self.assertEqual(self.registry.lookup("search"), "b")
+        self.assertIsNone(self.registry.lookup("missing"))
+        self.assertEqual(
+            [(t["name"], t["_server_name"]) for t in self.registry.tools(["b"])], [("search", "b")]
+        )
+
+    async def test_refresh_uses_cache_until_stale(self):
+        fetch = self.fetcher("read")
+        await asyncio.gather(*(self.registry.refresh("a", fetch) for _ in range(5)))
+        self.assertEqual(self.calls, 1)
+
+        self.registry.invalidate("a")
+        self.assertEqual(self.registry.lookup("read"), "a")
+        await self.registry.refresh("a", fetch)
+        self.assertEqual(self.calls, 2)
+
+        with mock.patch("mcp_host.services.tool_registry.time.monotonic", return_value=10 ** 9):
+            self.assertFalse(self.registry.is_fresh("a"))
+            await self.registry.refresh("a", fetch)
+        self.assertEqual(self.calls, 3)
+
+    async def test_list_changed_and_removal(self):
+        changes = []
+        self.registry.add_listener(lambda: changes.append(True))
+        await self.registry.refresh("a", self.fetcher("shared", "old"))
+        await self.registry.refresh("b", self.fetcher("shared"))
+        self.assertEqual(self.registry.lookup("shared"), "a")
+
+        await self.registry.refresh("a", self.fetcher("shared", "new"), force=True)
+        self.assertIsNone(self.registry.lookup("old"))
+        self.assertEqual(self.registry.lookup("new"), "a")
+
+        self.registry.remove("a")
+        self.assertEqual(self.registry.lookup("shared"), "b")
+        self.assertIsNone(self.registry.lookup("new"))
+        self.assertEqual(len(changes), 4)
+
+    async def test_scheduled_refresh_outlives_deadline(self):
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return tools_result("late")
+
+        task = self.registry.schedule("slow", slow)
+        self.assertIs(self.registry.schedule("slow", slow), task)
+        done, pending = await asyncio.wait([task], timeout=0.01)
+        self.assertEqual(pending, {task})
+        self.assertIsNone(self.registry.lookup("late"))
+
+        release.set()
+        await task
+        self.assertEqual(self.registry.lookup("late"), "slow")
+
+    async def test_remove_cancels_scheduled_refresh(self):
+        task = self.registry.schedule("gone", lambda: asyncio.sleep(60))
+        await asyncio.sleep(0)
+        self.registry.remove("gone")
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(self.registry.tools(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
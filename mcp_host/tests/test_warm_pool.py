@@ -0,0 +1,99 @@
+"""
+预热运行器池与 fork 服务器测试。运行器用一段内联程序代替 script_runner.py（不依赖 fastmcp），
+走的是相同的 warm_runner 协议；被“加载”的 Skill 是一个回显服务器。
+
+在仓库根目录运行：python -m unittest discover -s mcp_host/tests -t .
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+_home = tempfile.mkdtemp()
+
+with mock.patch.dict(os.environ, {"HOME": _home, "USERPROFILE": _home}):
+    from mcp_host.services.process_manager import McpProcess
+    from mcp_host.services.stdio_client import StdioRpcClient
+    from mcp_host.services.warm_pool import WarmPool, fork_server_supported
+    from mcp_host.tests.test_stdio_client import ECHO_SERVER
+
+
+def tearDownModule():
+    shutil.rmtree(_home, ignore_errors=True)
+
+
+SERVICES_DIR = str(Path(__file__).resolve().parent.parent / "services")
+
+RUNNER = f"""
+import os, sys
+from pathlib import Path
+sys.path.insert(0, {SERVICES_DIR!r})
+import warm_runner
+if sys.argv[1] == "--warm":
+    script_path, env = warm_runner.wait_for_adoption()
+else:
+    script_path, env = warm_runner.serve_forks(int(sys.argv[2]))
+os.environ.update(env)
+exec(Path(script_path).read_text())
+"""
+
+# 回显服务器，额外以 skill_env 方法返回 Skill 进程中的环境变量
+SKILL = ECHO_SERVER.replace(
+    '    if method == "exit":',
+    '    if method == "skill_env":\n'
+    '        request["params"] = {"flag": os.environ.get("SKILL_FLAG")}\n'
+    '    if method == "exit":',
+).replace("import json, sys", "import json, os, sys")
+
+
+class WarmPoolTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.script = Path(_home) / "echo_skill.py"
+        self.script.write_text(SKILL, encoding="utf-8")
+
+    async def start_skill(self, pool: WarmPool) -> StdioRpcClient:
+        proc = McpProcess("echo", "unused", [], spawn=lambda: pool.adopt(str(self.script), {"SKILL_FLAG": "on"}))
+        await proc.start()
+        self.addAsyncCleanup(proc.stop)
+        client = StdioRpcClient(proc)
+        await client.start()
+        self.addAsyncCleanup(client.stop)
+        return client
+
+    async def test_adopts_idle_runner_and_refills(self):
+        pool = WarmPool(sys.executable, ["-c", RUNNER], size=1, fork_server=False)
+        self.addAsyncCleanup(pool.close)
+        self.assertIsNone(await pool.adopt(str(self.script)))
+        await pool.fill()
+        self.assertEqual(pool.idle, 1)
+
+        client = await self.start_skill(pool)
+        self.assertEqual(await client.call("echo", {"n": 1}), {"n": 1})
+        self.assertEqual(await client.call("skill_env"), {"flag": "on"})
+        await pool._fill_task
+        self.assertEqual(pool.idle, 1)
+
+    @unittest.skipUnless(fork_server_supported(), "fork server requires fork and SCM_RIGHTS")
+    async def test_fork_server(self):
+        pool = WarmPool(sys.executable, ["-c", RUNNER], size=0, fork_server=True)
+        self.addAsyncCleanup(pool.close)
+        first, second = await self.start_skill(pool), await self.start_skill(pool)
+        self.assertEqual(await first.call("echo", {"n": 1}), {"n": 1})
+        self.assertEqual(await second.call("skill_env"), {"flag": "on"})
+
+        with self.assertRaisesRegex(Exception, "closed the connection"):
+            await first.call("exit", timeout=10)
+        process = first.mcp_process.process
+        self.assertEqual(await asyncio.wait_for(process.wait(), 10), 0)
+        self.assertEqual(await second.call("echo", {"n": 2}), {"n": 2})
+
+        second.mcp_process.process.terminate()
+        self.assertNotEqual(await asyncio.wait_for(second.mcp_process.process.wait(), 10), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
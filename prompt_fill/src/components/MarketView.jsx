@@ -16,7 +16,8 @@ const MarketView = ({ onClose, onInstall, t }) => {
         setLoading(true);
         try {
             const data = await marketService.listPrompts({ search });
-            setPrompts(data);
+            // 列表接口为游标分页，结果位于 results 中
+            setPrompts(data.results || []);
         } catch (err) {
             console.error(err);
         } finally {
@@ -115,7 +116,9 @@ const MarketPromptDetail = ({ promptUuid, onBack, onInstall, t }) => {
     };
 
     const handleInstall = () => {
-        if (prompt) onInstall(prompt);
+        if (!prompt) return;
+        onInstall(prompt);
+        marketService.subscribe(promptUuid).catch(err => console.error(err));
     };
 
     if (loading) return <div className="flex-1 flex items-center justify-center">加载中...</div>;
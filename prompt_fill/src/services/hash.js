@@ -0,0 +1,11 @@
+/**
+ * 计算字节内容的 SHA-256，返回小写十六进制字符串（与服务端内容寻址的哈希一致）
+ * @param {ArrayBuffer|Uint8Array} bytes
+ * @returns {Promise<string>}
+ */
+export async function sha256Hex(bytes) {
+    const digest = await crypto.subtle.digest('SHA-256', bytes);
+    return Array.from(new Uint8Array(digest))
+        .map((b) => b.toString(16).padStart(2, '0'))
+        .join('');
+}
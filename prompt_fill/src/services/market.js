@@ -1,4 +1,5 @@
 import { apiClient } from './api-client';
+import { sha256Hex } from './hash';
 
 export const marketService = {
     async listPrompts(params = {}) {
@@ -10,6 +11,24 @@ export const marketService = {
         return apiClient.get(`/market/prompts/${uuid}/`);
     },
 
+    /**
+     * 批量检查更新：versions 为 { uuid: 本地版本号 }，一次请求返回
+     * { results: { uuid: { latest_version, updated_at, has_update } }, missing: [uuid] }
+     */
+    async checkLatest(versions) {
+        return apiClient.post('/market/prompts/latest/', { prompts: versions });
+    },
+
+    /**
+     * 服务端计算的版本对比，mode 为 'line' 或 'word'；to 缺省为最新版本
+     */
+    async diffVersions(uuid, from, to = null, mode = 'line') {
+        const params = { from, mode };
+        if (to !== null) params.to = to;
+        const query = new URLSearchParams(params).toString();
+        return apiClient.get(`/market/prompts/${uuid}/diff/?${query}`);
+    },
+
     async publishPrompt(promptData) {
         // 如果包含 uuid，则是更新现有提示词
         if (promptData.uuid) {
@@ -22,6 +41,13 @@ export const marketService = {
         return apiClient.post('/market/interact/', { prompt: promptUuid, type });
     },
 
+    /**
+     * 导入提示词后订阅其更新，作者发布新版本时会收到通知
+     */
+    async subscribe(promptUuid) {
+        return apiClient.post(`/market/prompts/${promptUuid}/subscribe/`, {});
+    },
+
     async addComment(promptUuid, content, parentId = null) {
         return apiClient.post('/market/comments/', { 
             prompt: promptUuid, 
@@ -30,9 +56,41 @@ export const marketService = {
         });
     },
 
-    async uploadMedia(file) {
+    /**
+     * 上传单个媒体文件；name 决定服务端文件的扩展名，缺省使用 file.name
+     */
+    async uploadMedia(file, name = undefined) {
         const formData = new FormData();
-        formData.append('file', file);
+        formData.append('file', file, name ?? file.name);
         return apiClient.upload('/market/media/upload/', formData);
+    },
+
+    /**
+     * 上传前批量查询媒体库：files 为 [{ hash, size }]，
+     * 返回 { existing: { hash: url }, missing: [hash] }，只需上传 missing 中的文件
+     */
+    async checkMedia(files) {
+        return apiClient.post('/market/media/check/', { files });
+    },
+
+    /**
+     * 去重上传：先用一次 checkMedia 查询全部文件的哈希，只上传服务端缺失的文件，
+     * 同一批中内容相同的文件也只上传一次。files 为 [{ blob, name }]，返回与之一一对应的 URL
+     */
+    async uploadMediaDeduped(files) {
+        if (files.length === 0) return [];
+        const hashed = await Promise.all(files.map(async ({ blob, name }) => ({
+            blob,
+            name,
+            hash: await sha256Hex(await blob.arrayBuffer()),
+        })));
+        const { existing } = await this.checkMedia(hashed.map(({ blob, hash }) => ({ hash, size: blob.size })));
+        const urls = { ...existing };
+        for (const { blob, name, hash } of hashed) {
+            if (!urls[hash]) {
+                urls[hash] = (await this.uploadMedia(blob, name)).url;
+            }
+        }
+        return hashed.map(({ hash }) => urls[hash]);
     }
 };
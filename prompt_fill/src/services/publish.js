@@ -1,4 +1,33 @@
 import { marketService } from './market';
+import { getMediaUrl } from './tauri-service';
+
+// 只存在于本机的媒体引用：内联 data URL、浏览器 blob URL 与 Tauri 媒体目录中的 media:// 路径
+const LOCAL_MEDIA_SRC = /src=["']((?:data:|blob:|media:\/\/)[^"']+)["']/g;
+
+function mediaFileName(mimeType) {
+    // image/svg+xml -> svg，未知类型不带扩展名
+    const subtype = (mimeType || '').split('/')[1]?.split('+')[0];
+    return subtype ? `media.${subtype}` : 'media';
+}
+
+/**
+ * 把 HTML 中的本地媒体上传到媒体库（已存在的按哈希复用，不重复上传），并替换为公开 URL
+ */
+async function uploadEmbeddedMedia(html) {
+    if (!html || typeof html !== 'string') return html;
+    const sources = [...new Set(Array.from(html.matchAll(LOCAL_MEDIA_SRC), (m) => m[1]))];
+    if (sources.length === 0) return html;
+
+    const files = await Promise.all(sources.map(async (src) => {
+        const response = await fetch(await getMediaUrl(src));
+        const blob = await response.blob();
+        return { blob, name: mediaFileName(blob.type) };
+    }));
+    const urls = await marketService.uploadMediaDeduped(files);
+    const replacements = Object.fromEntries(sources.map((src, i) => [src, urls[i]]));
+    // 使用函数形式避免 URL 中的 $ 被 replace 当作占位符
+    return html.replace(LOCAL_MEDIA_SRC, (full, src) => full.replace(src, () => replacements[src]));
+}
 
 /**
  * 发布提示词的工作流服务
@@ -35,10 +64,11 @@ export const publishService = {
             if (!proceed) return null;
         }
 
-        // 处理内容中的图片：扫描 base64 并上传
-        // 这一步较为复杂，MVP 阶段我们假设用户已经手动处理或我们只处理文本
-        // 如果要处理图片，我们需要解析 HTML，找到 img 标签，提取 base64
-        
-        return marketService.publishPrompt(promptData);
+        // 内容与说明中的本地图片/视频先上传到媒体库，发布后他人才能访问
+        return marketService.publishPrompt({
+            ...promptData,
+            content: await uploadEmbeddedMedia(promptData.content),
+            description: await uploadEmbeddedMedia(promptData.description),
+        });
     }
 };
@@ -1,20 +1,44 @@
 import { readDataFile, writeDataFile } from './tauri-service';
 import { apiClient } from './api-client';
+import { sha256Hex } from './hash';
+
+/**
+ * 将本地数据按顶层键拆分为 data/<key>.json 文件，返回 { manifest, blobs }
+ */
+async function buildManifest(localData) {
+    const encoder = new TextEncoder();
+    const manifest = {};
+    const blobs = {};
+    for (const [key, value] of Object.entries(localData)) {
+        const bytes = encoder.encode(JSON.stringify(value));
+        const hash = await sha256Hex(bytes);
+        manifest[`data/${key}.json`] = { hash, size: bytes.length };
+        blobs[hash] = bytes;
+    }
+    return { manifest, blobs };
+}
 
 /**
  * 云端同步服务
  */
 export const syncService = {
     /**
-     * 执行云端备份：上传本地所有数据
+     * 执行云端备份：提交清单，只上传服务端缺失的部分
      */
     async backup() {
         const localData = await readDataFile();
         if (!localData) throw new Error("无法读取本地数据");
 
-        // 也可以在这里处理多媒体文件的同步（如果需要的话）
-        // 目前简单处理，只上传 JSON
-        return apiClient.post('/market/backup/', localData);
+        const { manifest, blobs } = await buildManifest(localData);
+        const { missing } = await apiClient.post('/market/backup/manifest/', { files: manifest });
+        if (missing.length > 0) {
+            const formData = new FormData();
+            for (const hash of missing) {
+                formData.append(hash, new Blob([blobs[hash]]), hash);
+            }
+            await apiClient.upload('/market/backup/objects/', formData);
+        }
+        return apiClient.put('/market/backup/manifest/', { files: manifest });
     },
 
     /**
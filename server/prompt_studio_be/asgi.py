@@ -3,6 +3,10 @@ ASGI config for prompt_studio_be project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+通知推送（users.views_stream）依赖 ASGI 的长连接，生产环境请用 ASGI 服务器启动，例如：
+    uvicorn prompt_studio_be.asgi:application --workers 4
+多 worker 时需设置 REDIS_URL，让通知经 Redis 在进程间转发。
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -0,0 +1,29 @@
+"""
+基于游标（keyset）的分页，避免 OFFSET 在大表上的线性扫描。
+
+排序的首字段作为游标位置，其后的唯一字段作为同值时的稳定次序，
+因此并发插入不会导致翻页时重复或遗漏。
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        # 在实例化时读取配置，便于测试中使用 override_settings
+        self.page_size = getattr(settings, 'API_PAGE_SIZE', 20)
+        self.max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+
+
+class MarketPromptCursorPagination(BaseCursorPagination):
+    ordering = ('-updated_at', '-uuid')
+
+
+class CommentCursorPagination(BaseCursorPagination):
+    ordering = ('created_at', 'id')
+
+
+class NotificationCursorPagination(BaseCursorPagination):
+    ordering = ('-created_at', '-id')
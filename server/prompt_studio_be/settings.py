@@ -91,6 +91,51 @@ DATABASES = {
 }
 
 
+# Cache
+# 默认使用进程内缓存；设置 REDIS_URL 后切换为 Redis，多进程部署时缓存失效才能跨进程生效
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# 市场接口响应缓存的过期时间（秒）
+MARKET_CACHE_TIMEOUT = 60
+
+# 市场全文检索（SQLite）按 bm25 排序的命中数上限：任一检索词命中更多时改为按收录先后返回最新的命中，检索延迟不随数据量增长
+SEARCH_RANK_CANDIDATES = 200
+
+# 通知未读数缓存的过期时间（秒），写入时会主动失效
+NOTIFICATION_COUNT_TIMEOUT = 300
+
+# 通知实时推送的发布/订阅后端；设置 REDIS_URL 后经 Redis 转发，多进程部署时推送才能跨进程送达
+NOTIFICATION_BROKER = {
+    'BACKEND': 'users.pubsub.LocalBroker',
+}
+if os.environ.get('REDIS_URL'):
+    NOTIFICATION_BROKER = {
+        'BACKEND': 'users.pubsub.RedisBroker',
+        'OPTIONS': {'url': os.environ['REDIS_URL']},
+    }
+
+# 通知推送连接的心跳间隔（秒）
+NOTIFICATION_STREAM_HEARTBEAT = 15
+
+# 互动通知的聚合时间窗（秒）：同一提示词在一个时间窗内的点赞合并为一条通知
+NOTIFICATION_COALESCE_WINDOW = 3600
+
+# 提示词历史版本差量存储的关键帧间隔：版本号为其整数倍的版本保留全文（见 prompts/versioning.py）
+PROMPT_VERSION_KEYFRAME_INTERVAL = 20
+
+# 为真时 prompt_studio_be.tasks 的后台任务在调用处同步执行（测试中使用）
+TASKS_EAGER = False
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -130,6 +175,15 @@ STATIC_URL = 'static/'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# 媒体上传暂存目录中超过该时长未修改的文件视为中断上传的遗留，予以清理（秒）
+MEDIA_STAGING_MAX_AGE = 24 * 3600
+
+# 云端备份快照保留策略：保留最近 last 个快照，以及最近 daily 天、weekly 周中每天/每周的最后一个快照
+BACKUP_RETENTION = {'last': 5, 'daily': 7, 'weekly': 4}
+# 垃圾回收不删除该时长内写入的 blob，避免删掉已上传但尚未提交清单的文件（秒）
+BACKUP_GC_GRACE_SECONDS = 3600
+# 整份 JSON 备份（gzip 上传按解压后计）的大小上限，超出返回 413（字节）
+BACKUP_MAX_BYTES = 256 * 1024 * 1024
 
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
@@ -147,5 +201,9 @@ REST_FRAMEWORK = {
     )
 }
 
+# 游标分页：默认每页条数，以及客户端通过 page_size 参数可请求的上限
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
@@ -0,0 +1,53 @@
+"""
+进程内的轻量任务队列，把耗时的副作用（如通知扇出）移出请求路径。
+
+任务由一个后台守护线程按提交顺序执行，每个任务结束后关闭该线程的数据库连接。
+队列不持久化：进程退出时尚未执行的任务会丢失，只用于可以容忍丢失或可以重建的工作。
+settings.TASKS_EAGER 为真时任务在调用处同步执行（测试环境使用）。
+"""
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enqueue(func, *args, **kwargs):
+    """提交任务。请在事务提交后调用（transaction.on_commit），避免任务读到未提交的数据。"""
+    if getattr(settings, 'TASKS_EAGER', False):
+        func(*args, **kwargs)
+        return
+    _ensure_worker()
+    _queue.put((func, args, kwargs))
+
+
+def wait_until_idle():
+    """阻塞直到队列中已提交的任务全部执行完毕。"""
+    _queue.join()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='local-task-worker', daemon=True)
+            _worker.start()
+
+
+def _run():
+    while True:
+        func, args, kwargs = _queue.get()
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception('后台任务 %s 执行失败', getattr(func, '__qualname__', func))
+        finally:
+            connection.close()
+            _queue.task_done()
@@ -0,0 +1,429 @@
+"""
+云端备份的内容寻址存储与快照历史。
+
+每个用户一个目录：
+  backups/<user_id>/objects/<hash[:2]>/<hash>.gz   gzip 压缩的文件内容（blob），以原文的 SHA-256 命名，同内容只存一份
+  backups/<user_id>/snapshots/<id>.json         每次备份的清单 {"id", "timestamp", "files": {path: {"hash", "size"}}}
+  backups/<user_id>/manifest.json               最新快照的副本，读取当前备份时无需列目录
+
+同步流程：客户端提交清单 → 服务端返回缺失的哈希 → 客户端只上传这些 blob → 提交清单生成新快照。
+快照之间共享 blob，未变化的文件不占额外空间；提交后按 BACKUP_RETENTION 淘汰旧快照，
+并回收不再被任何快照引用的 blob。path 只是清单中的逻辑名称，从不拼接为磁盘路径。
+
+blob 的写入与读取都是流式的（BlobWriter / iter_object），整份 JSON 备份的上传与下载
+经 JsonObjectSplitter 逐块拆分、逐块拼装，服务端内存占用与备份大小无关。
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import secrets
+import tempfile
+import time
+import zlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from prompt_studio_be.atomic_file import atomic_write_json, path_lock
+
+from .json_stream import JsonObjectSplitter, KEY, DATA, END
+from .uploads import publish_staged_file
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+SNAPSHOT_ID_PATTERN = re.compile(r'^\d{8}T\d{12}Z-[0-9a-f]{6}$')
+PATH_MAX_LENGTH = 255
+# 兼容整份 JSON 备份接口：顶层键 <key> 存为清单中的 data/<key>.json
+DATA_PREFIX = 'data/'
+DATA_SUFFIX = '.json'
+LEGACY_BACKUP_FILENAME = 'backup.json'
+OBJECT_SUFFIX = '.gz'
+STREAM_CHUNK_SIZE = 64 * 1024
+# gzip 压缩级别：备份为一次写入、多次保留，取压缩率与速度的折中
+COMPRESS_LEVEL = 6
+DEFAULT_RETENTION = {'last': 5, 'daily': 7, 'weekly': 4}
+# 整份 JSON 备份（解压后）的默认大小上限
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ManifestError(ValueError):
+    pass
+
+
+class PayloadTooLarge(ValueError):
+    pass
+
+
+class BlobsMissing(Exception):
+    """提交时清单引用的 blob 已不存在（上传期间被垃圾回收），missing 为缺失的哈希。"""
+    def __init__(self, missing):
+        super().__init__(f'{len(missing)} 个 blob 在提交前已被清理')
+        self.missing = missing
+
+
+def parse_manifest_files(files):
+    """校验客户端提交的 {path: {"hash", "size"}}，返回规范化后的字典，非法时抛出 ManifestError。"""
+    if not isinstance(files, dict):
+        raise ManifestError("files 必须是以路径为键的对象")
+    parsed = {}
+    for path, entry in files.items():
+        if not path or len(path) > PATH_MAX_LENGTH:
+            raise ManifestError(f"无效的路径: {path!r}")
+        if not isinstance(entry, dict):
+            raise ManifestError(f"无效的条目: {path}")
+        file_hash = str(entry.get('hash', '')).lower()
+        size = entry.get('size')
+        if not SHA256_PATTERN.match(file_hash) or type(size) is not int or size < 0:
+            raise ManifestError(f"无效的哈希或大小: {path}")
+        parsed[path] = {"hash": file_hash, "size": size}
+    return parsed
+
+
+def select_retained(snapshots, policy):
+    """
+    snapshots 为按时间从新到旧排列的 (id, timestamp) 序列，返回应保留的 id 集合：
+    最近 policy['last'] 个快照，以及最近 policy['daily'] 个自然日 / policy['weekly'] 个 ISO 周中
+    各自最新的一个快照（UTC）。最新快照始终保留。
+    """
+    keep = set()
+    days, weeks = set(), set()
+    for index, (snapshot_id, timestamp) in enumerate(snapshots):
+        moment = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        day, week = moment.date(), moment.isocalendar()[:2]
+        if index < max(policy.get('last', 0), 1):
+            keep.add(snapshot_id)
+        if day not in days and len(days) < policy.get('daily', 0):
+            days.add(day)
+            keep.add(snapshot_id)
+        if week not in weeks and len(weeks) < policy.get('weekly', 0):
+            weeks.add(week)
+            keep.add(snapshot_id)
+    return keep
+
+
+def iter_gunzip(chunks, max_size=None):
+    """
+    对 gzip 字节块流逐块解压，每次输出不超过 STREAM_CHUNK_SIZE。
+    指定 max_size 时解压结果累计超过该字节数即抛出 PayloadTooLarge，防止压缩炸弹。
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    total = 0
+    for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk, STREAM_CHUNK_SIZE)
+            if data:
+                total += len(data)
+                if max_size is not None and total > max_size:
+                    raise PayloadTooLarge(f'解压后超过 {max_size} 字节')
+                yield data
+            chunk = decompressor.unconsumed_tail
+    data = decompressor.flush()
+    if data:
+        if max_size is not None and total + len(data) > max_size:
+            raise PayloadTooLarge(f'解压后超过 {max_size} 字节')
+        yield data
+
+
+def iter_limited(chunks, max_size):
+    """原样转发字节块流，累计超过 max_size 字节时抛出 PayloadTooLarge。"""
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        if total > max_size:
+            raise PayloadTooLarge(f'超过 {max_size} 字节')
+        yield chunk
+
+
+def iter_gzip(chunks):
+    """将字节块流逐块压缩为 gzip 格式。"""
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class BlobWriter:
+    """
+    边写入边计算原文哈希并以 gzip 压缩到暂存文件；close() 后得到 sha256 与原文大小，
+    再由 BackupStore.publish_blob 发布或 discard 丢弃。
+    """
+
+    def __init__(self, store):
+        os.makedirs(store.root, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=store.root, suffix='.upload', delete=False)
+        self.gzip = gzip.GzipFile(fileobj=self.file, mode='wb', compresslevel=COMPRESS_LEVEL, mtime=0)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.sha256 = None
+
+    def write(self, data):
+        self.gzip.write(data)
+        self.hasher.update(data)
+        self.size += len(data)
+
+    def close(self):
+        self.gzip.close()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.sha256 = self.hasher.hexdigest()
+        return self.sha256
+
+    def discard(self):
+        self.gzip.close()
+        self.file.close()
+        try:
+            os.unlink(self.file.name)
+        except FileNotFoundError:
+            pass
+
+
+class BlobUploadHandler(FileUploadHandler):
+    """multipart 上传处理器：每个文件直接写成压缩 blob，request.FILES 中得到已 close 的 BlobWriter。"""
+    chunk_size = 1024 * 1024
+
+    def __init__(self, request, store):
+        super().__init__(request)
+        self.store = store
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.writer = BlobWriter(self.store)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.writer.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.writer.close()
+        return self.writer
+
+    def upload_interrupted(self):
+        if hasattr(self, 'writer'):
+            self.writer.discard()
+
+
+class BackupStore:
+    """单个用户的备份目录。"""
+
+    def __init__(self, user_id):
+        self.root = os.path.join(settings.BASE_DIR, 'backups', str(user_id))
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.snapshots_dir = os.path.join(self.root, 'snapshots')
+        self.manifest_path = os.path.join(self.root, 'manifest.json')
+        self.legacy_path = os.path.join(self.root, LEGACY_BACKUP_FILENAME)
+
+    def object_path(self, file_hash):
+        return os.path.join(self.objects_dir, file_hash[:2], file_hash + OBJECT_SUFFIX)
+
+    def has_object(self, file_hash):
+        return os.path.exists(self.object_path(file_hash))
+
+    def missing(self, files):
+        """返回清单中尚未存储的哈希（去重，保持首次出现的顺序）。"""
+        hashes = dict.fromkeys(entry["hash"] for entry in files.values())
+        return [file_hash for file_hash in hashes if not self.has_object(file_hash)]
+
+    def publish_blob(self, writer):
+        """
+        发布已 close 的 BlobWriter，同内容已存在时丢弃暂存文件并刷新已有 blob 的修改时间，
+        使其在提交清单前同样受垃圾回收宽限期保护。返回是否新建。
+        """
+        target = self.object_path(writer.sha256)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 与垃圾回收互斥：不会在判断已存在之后、刷新修改时间之前被删除
+        with path_lock(self.root):
+            created = publish_staged_file(writer.file.name, target)
+            if not created:
+                os.utime(target)
+        return created
+
+    def write_object(self, chunks):
+        """流式写入一个 blob。返回 (hash, size)。"""
+        writer = BlobWriter(self)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+            writer.close()
+            self.publish_blob(writer)
+        finally:
+            writer.discard()
+        return writer.sha256, writer.size
+
+    def iter_object(self, file_hash, compressed=False):
+        """逐块读取 blob；compressed 为真时直接给出磁盘上的 gzip 字节。"""
+        with open(self.object_path(file_hash), 'rb') as f:
+            chunks = iter(lambda: f.read(STREAM_CHUNK_SIZE), b'')
+            yield from (chunks if compressed else iter_gunzip(chunks))
+
+    def _write_json(self, path, payload):
+        atomic_write_json(path, payload, ensure_ascii=False)
+
+    def _read_json(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def read_manifest(self, snapshot_id=None):
+        """读取指定快照的清单；snapshot_id 为空时读取最新快照。不存在时返回 None。"""
+        if snapshot_id is None:
+            return self._read_json(self.manifest_path)
+        if not SNAPSHOT_ID_PATTERN.match(snapshot_id):
+            return None
+        return self._read_json(os.path.join(self.snapshots_dir, f'{snapshot_id}.json'))
+
+    def snapshot_ids(self):
+        """按时间从新到旧返回全部快照 id。"""
+        try:
+            names = os.listdir(self.snapshots_dir)
+        except FileNotFoundError:
+            return []
+        ids = [name[:-len('.json')] for name in names if name.endswith('.json')]
+        return sorted((i for i in ids if SNAPSHOT_ID_PATTERN.match(i)), reverse=True)
+
+    def list_snapshots(self):
+        snapshots = []
+        for snapshot_id in self.snapshot_ids():
+            manifest = self.read_manifest(snapshot_id)
+            if manifest is None:
+                continue
+            snapshots.append({
+                "id": snapshot_id,
+                "timestamp": manifest["timestamp"],
+                "file_count": len(manifest["files"]),
+                "size": sum(entry["size"] for entry in manifest["files"].values()),
+            })
+        return snapshots
+
+    def commit(self, files):
+        """
+        以 files 生成新快照并设为当前备份，随后执行保留策略。
+        仍有 blob 缺失时不写入，返回 (None, 缺失的哈希列表)；成功时返回 (清单, [])。
+        """
+        # 同一用户的提交、淘汰与回收串行执行，manifest.json 始终指向最新的快照
+        with path_lock(self.root):
+            missing = self.missing(files)
+            if missing:
+                return None, missing
+            now = time.time()
+            moment = datetime.fromtimestamp(now, tz=timezone.utc)
+            snapshot_id = f'{moment:%Y%m%dT%H%M%S%f}Z-{secrets.token_hex(3)}'
+            manifest = {"id": snapshot_id, "timestamp": now, "files": files}
+            self._write_json(os.path.join(self.snapshots_dir, f'{snapshot_id}.json'), manifest)
+            self._write_json(self.manifest_path, manifest)
+            self.prune()
+            return manifest, []
+
+    def restore(self, snapshot_id):
+        """将历史快照恢复为当前备份（生成内容相同的新快照，不删除其后的历史）。"""
+        manifest = self.read_manifest(snapshot_id)
+        if manifest is None:
+            return None
+        restored, _ = self.commit(manifest["files"])
+        return restored
+
+    def prune(self, policy=None):
+        """按保留策略删除旧快照，有快照被删除时回收 blob。返回删除的快照数。"""
+        with path_lock(self.root):
+            policy = policy or getattr(settings, 'BACKUP_RETENTION', DEFAULT_RETENTION)
+            snapshots = [
+                (snapshot_id, manifest["timestamp"])
+                for snapshot_id in self.snapshot_ids()
+                if (manifest := self.read_manifest(snapshot_id)) is not None
+            ]
+            keep = select_retained(snapshots, policy)
+            removed = 0
+            for snapshot_id, _ in snapshots:
+                if snapshot_id not in keep:
+                    os.unlink(os.path.join(self.snapshots_dir, f'{snapshot_id}.json'))
+                    removed += 1
+            if removed:
+                self.collect_garbage()
+            return removed
+
+    def collect_garbage(self, grace_seconds=None):
+        """
+        删除不被任何快照引用的 blob。最近 grace_seconds 内写入的 blob 可能属于尚未提交的清单，予以保留。
+        返回 (删除数, 释放字节数)。
+        """
+        if grace_seconds is None:
+            grace_seconds = getattr(settings, 'BACKUP_GC_GRACE_SECONDS', 3600)
+        # 与提交、发布 blob 互斥
+        with path_lock(self.root):
+            referenced = set()
+            for snapshot_id in self.snapshot_ids():
+                manifest = self.read_manifest(snapshot_id)
+                if manifest is not None:
+                    referenced.update(entry["hash"] for entry in manifest["files"].values())
+            current = self.read_manifest()
+            if current is not None:
+                referenced.update(entry["hash"] for entry in current["files"].values())
+
+            cutoff = time.time() - grace_seconds
+            removed, freed = 0, 0
+            for dirpath, _, filenames in os.walk(self.objects_dir):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    if name.removesuffix(OBJECT_SUFFIX) in referenced:
+                        continue
+                    stat = os.stat(path)
+                    if stat.st_mtime >= cutoff:
+                        continue
+                    os.unlink(path)
+                    removed += 1
+                    freed += stat.st_size
+            return removed, freed
+
+    def save_json_stream(self, chunks):
+        """
+        整份 JSON 备份：从字节块流中逐个拆出顶层键值，每个值直接写为 blob，
+        未变化的键不产生新文件。请求体为空或为空对象时不生成快照，返回 None；
+        JSON 非法时抛出 JsonStreamError，不提交快照（已写入的 blob 由垃圾回收清理）；
+        上传耗时超过垃圾回收宽限期、复用的 blob 在提交前被清理时抛出 BlobsMissing。
+        """
+        splitter = JsonObjectSplitter()
+        files = {}
+        writer = None
+        try:
+            for chunk in chunks:
+                for event, value in splitter.feed(chunk):
+                    if event == KEY:
+                        path = f'{DATA_PREFIX}{value}{DATA_SUFFIX}'
+                        writer = BlobWriter(self)
+                    elif event == DATA:
+                        writer.write(value)
+                    elif event == END:
+                        writer.close()
+                        self.publish_blob(writer)
+                        writer.discard()
+                        files[path] = {"hash": writer.sha256, "size": writer.size}
+                        writer = None
+            if splitter.empty:
+                return None
+            splitter.close()
+        finally:
+            if writer is not None:
+                writer.discard()
+        if not files:
+            return None
+        manifest, missing = self.commit(files)
+        if missing:
+            raise BlobsMissing(missing)
+        return manifest
+
+    def iter_json(self, manifest):
+        """由快照清单中的 data/<key>.json 条目逐块拼装出整份 JSON。"""
+        yield b'{'
+        first = True
+        for path, entry in manifest["files"].items():
+            if not (path.startswith(DATA_PREFIX) and path.endswith(DATA_SUFFIX)):
+                continue
+            key = path[len(DATA_PREFIX):-len(DATA_SUFFIX)]
+            yield (b'' if first else b',') + json.dumps(key, ensure_ascii=False).encode('utf-8') + b':'
+            first = False
+            yield from self.iter_object(entry["hash"])
+        yield b'}'
@@ -0,0 +1,91 @@
+"""
+市场接口的响应缓存与条件请求（ETag / If-None-Match）。
+
+详情的 ETag 由 uuid、latest_version、updated_at 与互动计数决定，发布新版本、修改元数据
+或互动计数变化后自然换新；列表的 ETag 由全局列表版本号与完整查询串决定，任何提示词写入
+或互动变化都会在事务提交后递增版本号。缓存体以 ETag 为键存放，旧条目随超时淘汰。
+
+使用 settings.CACHES['default']，本地内存缓存与 Redis 均可。多进程部署应使用共享缓存，
+否则列表版本号只在当前进程内递增，陈旧列表最多保留 MARKET_CACHE_TIMEOUT 秒。
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+LIST_GENERATION_KEY = 'market:list:generation'
+
+
+def _timeout():
+    return getattr(settings, 'MARKET_CACHE_TIMEOUT', 60)
+
+
+def list_generation():
+    generation = cache.get(LIST_GENERATION_KEY)
+    if generation is None:
+        # 以时间戳作为初值，缓存被清空后不会与旧版本号重复而命中陈旧条目
+        cache.add(LIST_GENERATION_KEY, time.time_ns() // 1000, timeout=None)
+        generation = cache.get(LIST_GENERATION_KEY)
+    return generation
+
+
+def _bump_list_generation():
+    try:
+        cache.incr(LIST_GENERATION_KEY)
+    except ValueError:
+        list_generation()
+
+
+def invalidate_market_lists():
+    """在当前事务提交后使所有列表缓存失效。"""
+    transaction.on_commit(_bump_list_generation)
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(':'.join(str(p) for p in parts).encode('utf-8')).hexdigest())
+
+
+def prompt_etag(uuid, latest_version, updated_at, like_count, dislike_count):
+    return make_etag('prompt', uuid, latest_version, updated_at.isoformat(), like_count, dislike_count)
+
+
+def list_etag(request):
+    return make_etag('list', list_generation(), request.get_full_path())
+
+
+def _matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # If-None-Match 使用弱比较
+    candidates = [tag.removeprefix('W/') for tag in parse_etags(header)]
+    return '*' in candidates or etag in candidates
+
+
+def conditional_response(request, etag, build, last_modified=None):
+    """
+    命中 If-None-Match 时返回 304；否则优先返回缓存体，未命中时调用 build() 生成响应并缓存。
+    If-Modified-Since 不参与判断：互动计数变化不会刷新 updated_at。
+    """
+    if _matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        key = f'market:response:{etag}'
+        data = cache.get(key)
+        if data is None:
+            response = build()
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, _timeout())
+        else:
+            response = Response(data)
+
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
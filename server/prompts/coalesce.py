@@ -0,0 +1,118 @@
+"""
+互动通知的时间窗聚合。
+
+热门提示词被频繁点赞时，若每次点赞都为作者写一条通知，通知表与收件箱都会被刷屏。
+这里按 (user, prompt, category, window_start) 聚合：同一提示词在同一时间窗
+（settings.NOTIFICATION_COALESCE_WINDOW 秒，按固定边界对齐）内的点赞只对应一行通知，
+后续点赞用一条 INSERT ... ON CONFLICT DO UPDATE 原地改写计数与标题，
+同时把该行重新置为未读、移到列表顶部。每个时间窗每个提示词最多一行。
+
+计数为本时间窗内点赞、且当前仍是点赞的不同用户数（按 Interaction.voted_at 统计，不含作者本人），
+同一用户反复取消、再点赞不会累加。
+
+重新置顶会改写 created_at：通知列表按 (-created_at, -id) 游标分页，被改写的行离开原位置、
+出现在第一页。客户端正在向后翻页时不会重复看到它，也可能在本轮翻页中错过它，
+重新加载第一页（或经实时推送）即可看到更新后的通知。
+
+SQLite 与 PostgreSQL 使用单语句 upsert，其余数据库退化为先 UPDATE、未命中再 INSERT。
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from users.cache import invalidate_unread_counts
+from users.models import Notification
+from users.pubsub import publish_notifications
+
+from .models import Interaction
+
+CATEGORY = 'interaction'
+
+# 通知标题中提示词名称的最大长度，保证标题不超过 Notification.title 的 255 字符
+TITLE_MAX_CHARS = 200
+
+
+def _window_seconds():
+    return getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', 3600)
+
+
+def window_start(moment, seconds=None):
+    """moment 所在时间窗的起点（UTC，按 seconds 对齐）。"""
+    seconds = seconds or _window_seconds()
+    return datetime.fromtimestamp(moment.timestamp() // seconds * seconds, tz=dt_timezone.utc)
+
+
+def _texts(prompt, count):
+    """聚合通知的标题与正文。"""
+    name = prompt.title[:TITLE_MAX_CHARS]
+    return {
+        'title': f'「{name}」收到了 {count} 个赞',
+        'message': f'最近有 {count} 人赞了你的提示词「{name}」。',
+    }
+
+
+def count_likers(prompt, start, seconds=None):
+    """start 起的时间窗内点赞、且当前仍是点赞的不同用户数（不含作者本人）。"""
+    end = start + timedelta(seconds=seconds or _window_seconds())
+    return Interaction.objects.filter(
+        prompt_id=prompt.pk, type='like', voted_at__gte=start, voted_at__lt=end
+    ).exclude(user_id=prompt.owner_id).count()
+
+
+def notify_like(prompt, now=None):
+    """
+    为 prompt 的作者记录一次点赞（点赞的 Interaction 需已写入），返回聚合后的通知。
+    需在事务中调用；通知推送与未读数失效在事务提交后生效。
+    """
+    now = now or timezone.now()
+    start = window_start(now)
+    key = {
+        'user_id': prompt.owner_id,
+        'prompt_id': prompt.pk,
+        'category': CATEGORY,
+        'window_start': start,
+    }
+    # 至少计入触发本次通知的点赞
+    count = max(count_likers(prompt, start), 1)
+    values = {**_texts(prompt, count), 'count': count, 'is_read': False, 'created_at': now}
+    if connection.features.supports_update_conflicts_with_target:
+        notification = _upsert(key, values, f'/market/prompts/{prompt.uuid}/')
+    else:
+        notification = _update_or_create(key, values, f'/market/prompts/{prompt.uuid}/')
+    invalidate_unread_counts([prompt.owner_id])
+    publish_notifications([notification])
+    return notification
+
+
+def _upsert(key, values, link):
+    meta = Notification._meta
+    qn = connection.ops.quote_name
+    row = {**key, **values, 'link': link}
+    columns, params = [], []
+    for name, value in row.items():
+        field = meta.get_field(name.removesuffix('_id'))
+        columns.append(qn(field.column))
+        params.append(field.get_db_prep_value(value, connection))
+    conflict = ', '.join(qn(meta.get_field(name.removesuffix('_id')).column) for name in key)
+    assignments = ', '.join(f'{qn(name)} = EXCLUDED.{qn(name)}' for name in values)
+    sql = (
+        f'INSERT INTO {qn(meta.db_table)} AS n ({", ".join(columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({conflict}) DO UPDATE SET {assignments} '
+        f'RETURNING *'
+    )
+    return list(Notification.objects.raw(sql, params))[0]
+
+
+def _update_or_create(key, values, link):
+    queryset = Notification.objects.filter(**key)
+    if not queryset.update(**values):
+        try:
+            with transaction.atomic():
+                return Notification.objects.create(**key, **values, link=link)
+        except IntegrityError:
+            # 并发请求已抢先插入本时间窗的行
+            queryset.update(**values)
+    return queryset.get()
@@ -0,0 +1,94 @@
+"""
+评论树组装。
+
+先用一次查询取出提示词下全部评论的 (id, parent_id) 骨架，在内存中按深度、
+每层子节点数与节点总数裁剪出可见部分，再用一次查询取回可见评论的内容。
+查询数与评论总数无关；组装过程为迭代实现，深层嵌套不会耗尽调用栈。
+"""
+from collections import deque
+
+from .models import Comment
+
+# 单次响应最多展开的评论数，防止 depth × children 组合过大
+MAX_VISIBLE_NODES = 1000
+
+
+def _page(ids, after, size):
+    """返回 after 之后的至多 size 个 id，以及是否还有剩余。"""
+    start = 0
+    if after is not None:
+        try:
+            start = ids.index(after) + 1
+        except ValueError:
+            start = 0
+    chunk = ids[start:start + size]
+    return chunk, start + size < len(ids)
+
+
+def _more(parent_id, after):
+    return {"parent": parent_id, "after": after}
+
+
+def build_comment_tree(prompt, parent_id=None, after=None, limit=20, depth=3, children=10):
+    """
+    返回 (results, next)。results 为 parent_id 下的一页评论（parent_id 为空时即顶层评论），
+    每个节点带 reply_count、replies 以及用于“加载更多回复”的 more_replies 游标；
+    next 为本层下一页的游标，两类游标均以 parent / after 参数回传。
+    """
+    skeleton = (
+        Comment.objects
+        .filter(prompt=prompt)
+        .order_by('created_at', 'id')
+        .values_list('id', 'parent_id')
+    )
+    child_map = {}
+    for comment_id, comment_parent in skeleton:
+        child_map.setdefault(comment_parent, []).append(comment_id)
+
+    roots, has_next = _page(child_map.get(parent_id, []), after, limit)
+    nodes = {}
+    results = []
+    queue = deque()
+    for comment_id in roots:
+        node = {"id": comment_id}
+        nodes[comment_id] = node
+        results.append(node)
+        queue.append((comment_id, 1))
+
+    while queue:
+        comment_id, level = queue.popleft()
+        node = nodes[comment_id]
+        kids = child_map.get(comment_id, [])
+        node["reply_count"] = len(kids)
+        node["replies"] = []
+        node["more_replies"] = None
+        if not kids:
+            continue
+
+        shown, has_more = _page(kids, None, children)
+        if level >= depth or len(nodes) + len(shown) > MAX_VISIBLE_NODES:
+            node["more_replies"] = _more(comment_id, None)
+            continue
+        for kid in shown:
+            child = {"id": kid}
+            nodes[kid] = child
+            node["replies"].append(child)
+            queue.append((kid, level + 1))
+        if has_more:
+            node["more_replies"] = _more(comment_id, shown[-1])
+
+    rows = (
+        Comment.objects
+        .filter(id__in=list(nodes))
+        .values('id', 'parent_id', 'content', 'created_at', 'user__username')
+    )
+    for row in rows:
+        nodes[row['id']].update({
+            "user_name": row['user__username'],
+            "content": row['content'],
+            "parent": row['parent_id'],
+            "created_at": row['created_at'],
+        })
+
+    next_cursor = _more(parent_id, roots[-1]) if has_next and roots else None
+    return results, next_cursor
@@ -0,0 +1,111 @@
+"""
+按行的文本差量编码，供 PromptVersion 的差量存储（versioning.py）与版本对比接口使用。
+
+差量是一个 JSON 数组，由两种操作组成：
+- [i, j]：复制基准文本的第 i 到 j 行（左闭右开，行含换行符）；
+- "文本"：插入一段字面文本。
+按顺序拼接即可由基准文本还原目标文本。本模块不依赖 Django，数据迁移也直接使用。
+
+line_diff / word_diff 生成版本对比接口返回的行级 / 词级对比。
+"""
+import difflib
+import json
+import re
+
+# 词级对比的切分：连续的英文字母 / 数字、连续空白各为一个词，其余字符（含汉字、标点）逐字切分
+_TOKEN = re.compile(r'[A-Za-z0-9_]+|\s+|.', re.S)
+
+
+def _lines(text):
+    return text.splitlines(keepends=True)
+
+
+def encode_delta(base, target):
+    """计算从 base 还原 target 所需的差量（JSON 字符串）。"""
+    base_lines, target_lines = _lines(base), _lines(target)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(target_lines[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+
+
+def apply_delta(base, delta):
+    """用 encode_delta 生成的差量从 base 还原目标文本。"""
+    base_lines = _lines(base)
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0]:op[1]])
+    return ''.join(parts)
+
+
+def line_diff(old, new):
+    """
+    old 到 new 的紧凑行级对比：[" ", 行数] 表示未变的连续行，["-", 文本] 为删除的行，
+    ["+", 文本] 为新增的行。返回 (ops, 统计)。
+    """
+    old_lines, new_lines = _lines(old), _lines(new)
+    ops = []
+    stats = {'insertions': 0, 'deletions': 0}
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([' ', i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(['-', ''.join(old_lines[i1:i2])])
+            stats['deletions'] += i2 - i1
+        if j2 > j1:
+            ops.append(['+', ''.join(new_lines[j1:j2])])
+            stats['insertions'] += j2 - j1
+    return ops, stats
+
+
+def _push(ops, op, value):
+    """追加一个对比操作，与前一个同类操作合并。"""
+    if ops and ops[-1][0] == op:
+        ops[-1][1] += value
+    else:
+        ops.append([op, value])
+
+
+def word_diff(old, new):
+    """
+    old 到 new 的词级对比：先按行对齐，再在改动的行块内按词比较。
+    [" ", 字符数] 表示 old 中未变的一段，["-", 文本] / ["+", 文本] 为删除 / 新增的文字。
+    返回 (ops, 统计)，统计按字符计。
+    """
+    old_lines, new_lines = _lines(old), _lines(new)
+    ops = []
+    stats = {'insertions': 0, 'deletions': 0}
+
+    def changed(removed, added):
+        if removed:
+            _push(ops, '-', removed)
+            stats['deletions'] += len(removed)
+        if added:
+            _push(ops, '+', added)
+            stats['insertions'] += len(added)
+
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        removed, added = ''.join(old_lines[i1:i2]), ''.join(new_lines[j1:j2])
+        if tag == 'equal':
+            _push(ops, ' ', len(removed))
+        elif tag == 'replace':
+            old_tokens, new_tokens = _TOKEN.findall(removed), _TOKEN.findall(added)
+            words = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+            for word_tag, a1, a2, b1, b2 in words.get_opcodes():
+                if word_tag == 'equal':
+                    _push(ops, ' ', sum(map(len, old_tokens[a1:a2])))
+                else:
+                    changed(''.join(old_tokens[a1:a2]), ''.join(new_tokens[b1:b2]))
+        else:
+            changed(removed, added)
+    return ops, stats
@@ -0,0 +1,47 @@
+"""
+提示词发布新版本后的通知扇出。
+
+按 (prompt, id) 索引分批遍历订阅者，每批用一条 bulk_create 写入通知，
+查询数约为 订阅者数 / FANOUT_BATCH_SIZE，内存占用与订阅者总数无关。
+由 signals 在事务提交后提交到 prompt_studio_be.tasks 的后台队列执行，不阻塞作者的请求。
+写入的通知经 users.pubsub 推送给在线的订阅者。
+"""
+from users.cache import invalidate_unread_counts
+from users.pubsub import publish_notifications
+from users.models import Notification
+
+from .models import MarketPrompt, PromptSubscription
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def notify_subscribers(prompt_id, version, batch_size=FANOUT_BATCH_SIZE):
+    """向 prompt_id 的订阅者（作者本人除外）发送 version 的更新通知，返回通知数。"""
+    prompt = MarketPrompt.objects.filter(pk=prompt_id).values('uuid', 'title', 'owner_id').first()
+    if prompt is None:
+        return 0
+
+    subscribers = (
+        PromptSubscription.objects
+        .filter(prompt_id=prompt_id)
+        .exclude(user_id=prompt['owner_id'])
+        .order_by('id')
+        .values_list('id', 'user_id')
+    )
+    title = f'「{prompt["title"]}」发布了新版本'
+    message = f'你导入的提示词「{prompt["title"]}」已更新到 v{version}。'
+    link = f'/market/prompts/{prompt["uuid"]}/'
+
+    sent, last_id = 0, 0
+    while True:
+        batch = list(subscribers.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return sent
+        notifications = Notification.objects.bulk_create([
+            Notification(user_id=user_id, category='update', title=title, message=message, link=link)
+            for _, user_id in batch
+        ], batch_size=batch_size)
+        invalidate_unread_counts(user_id for _, user_id in batch)
+        publish_notifications(notifications)
+        sent += len(batch)
+        last_id = batch[-1][0]
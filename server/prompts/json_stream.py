@@ -0,0 +1,251 @@
+"""
+流式拆分 JSON 对象的顶层键值。
+
+JsonObjectSplitter 逐块接收 JSON 文本（bytes），按顶层键产出事件，每个值的原始字节分段给出，
+不构建 Python 对象，内存占用只与块大小和嵌套深度有关。用于整份备份的流式上传：每个顶层值直接写入 blob。
+值按 JSON 语法逐词校验（括号配对与嵌套顺序、键值与逗号分隔、字符串转义与控制字符、
+数字与 true / false / null 字面量、UTF-8 编码），非法输入在读到出错位置时即抛出 JsonStreamError。
+"""
+import codecs
+import json
+import re
+
+_STRING_SPECIAL = re.compile(rb'["\\\x00-\x1f]')
+# 值内部的一个词：结构字符、字符串起始引号，或一段数字 / 字面量
+_SCALAR_RUN = re.compile(rb'[^ \t\r\n\[\]{},:"]+')
+_SKIP_WHITESPACE = re.compile(rb'[ \t\r\n]*')
+_NUMBER = re.compile(rb'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?')
+_LITERALS = (b'true', b'false', b'null')
+_WHITESPACE = b' \t\r\n'
+_ESCAPES = b'"\\/bfnrtu'
+_HEX_DIGITS = b'0123456789abcdefABCDEF'
+# 单个数字 / 字面量的最大长度与最大嵌套深度，防止畸形输入无限占用内存
+MAX_SCALAR_BYTES = 1024
+MAX_DEPTH = 512
+
+# 事件类型
+KEY = 'key'        # (KEY, 键名)：一个新值开始
+DATA = 'data'      # (DATA, bytes)：当前值的一段原始字节
+END = 'end'        # (END, None)：当前值结束
+
+# 值内部期待的下一个词
+_VALUE = 'value'                    # 一个值
+_VALUE_OR_CLOSE = 'value_or_close'  # '[' 之后：值或 ']'
+_KEY_OR_CLOSE = 'key_or_close'      # '{' 之后：键或 '}'
+_KEY = 'key'                        # 对象中 ',' 之后：键
+_COLON = 'colon'
+_COMMA_OR_CLOSE = 'comma_or_close'  # 容器中的值之后
+_TOP_END = 'top_end'                # 顶层值已完整，只能是 ',' 或 '}'
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+class JsonObjectSplitter:
+    def __init__(self):
+        self.state = 'start'
+        self.key = bytearray()
+        # 顶层值内部的校验状态
+        self.stack = []
+        self.expect = _VALUE
+        self.scalar = bytearray()
+        self.in_string = False
+        self.string_is_key = False
+        self.escape = False
+        self.hex_digits = 0
+        self.utf8 = None
+
+    @property
+    def empty(self):
+        """尚未读到任何非空白字符。"""
+        return self.state == 'start'
+
+    def feed(self, data):
+        """处理一块输入，返回本块产生的事件列表。"""
+        events = []
+        i, n = 0, len(data)
+        while i < n:
+            state = self.state
+            if state == 'value':
+                i = self._scan_value(data, i, events)
+                continue
+            if state == 'key_string':
+                i = self._scan_key(data, i)
+                continue
+
+            c = data[i]
+            if c in _WHITESPACE:
+                i += 1
+                continue
+            if state == 'start' and c == ord('{'):
+                self.state = 'key_or_end'
+            elif state in ('key_or_end', 'key') and c == ord('"'):
+                self.key.clear()
+                self.state = 'key_string'
+            elif state == 'key_or_end' and c == ord('}'):
+                self.state = 'done'
+            elif state == 'colon' and c == ord(':'):
+                self.state = 'value_start'
+            elif state == 'value_start':
+                events.append((KEY, self._decode_key()))
+                self.state = 'value'
+                self.expect = _VALUE
+                self.utf8 = codecs.getincrementaldecoder('utf-8')()
+                continue
+            else:
+                raise JsonStreamError(f'无效的 JSON：位置附近出现意外字符 {chr(c)!r}')
+            i += 1
+        return events
+
+    def close(self):
+        if self.state != 'done':
+            raise JsonStreamError('JSON 不完整或顶层不是对象')
+
+    def _decode_key(self):
+        try:
+            return json.loads(b'"' + bytes(self.key) + b'"')
+        except ValueError:
+            raise JsonStreamError('无效的键名')
+
+    def _skip_string(self, data, i, n):
+        """在字符串内部前进并校验转义；返回 (新位置, 字符串是否结束)。"""
+        while i < n:
+            if self.hex_digits:
+                if data[i] not in _HEX_DIGITS:
+                    raise JsonStreamError('无效的 JSON：\\u 转义后必须是 4 位十六进制数')
+                self.hex_digits -= 1
+                i += 1
+                continue
+            if self.escape:
+                if data[i] not in _ESCAPES:
+                    raise JsonStreamError(f'无效的 JSON：无效的转义 \\{chr(data[i])}')
+                self.escape = False
+                if data[i] == ord('u'):
+                    self.hex_digits = 4
+                i += 1
+                continue
+            match = _STRING_SPECIAL.search(data, i)
+            if match is None:
+                return n, False
+            i = match.start()
+            c = data[i]
+            if c == ord('"'):
+                return i + 1, True
+            if c != ord('\\'):
+                raise JsonStreamError('无效的 JSON：字符串中包含未转义的控制字符')
+            self.escape = True
+            i += 1
+        return i, False
+
+    def _scan_key(self, data, i):
+        n = len(data)
+        start = i
+        i, closed = self._skip_string(data, i, n)
+        if closed:
+            self.key += data[start:i - 1]
+            self.state = 'colon'
+        else:
+            self.key += data[start:i]
+        return i
+
+    def _scan_value(self, data, i, events):
+        n = len(data)
+        start = i
+        while i < n:
+            if self.in_string:
+                i, closed = self._skip_string(data, i, n)
+                if closed:
+                    self.in_string = False
+                    if self.string_is_key:
+                        self.expect = _COLON
+                    else:
+                        self._value_done()
+                continue
+
+            # 数字与字面量可能跨块，先累积，遇到分隔符时再整体校验
+            match = _SCALAR_RUN.match(data, i)
+            if match is not None:
+                if not self.scalar and self.expect not in (_VALUE, _VALUE_OR_CLOSE):
+                    raise JsonStreamError(f'无效的 JSON：意外的 {match.group()[:20]!r}')
+                self.scalar += match.group()
+                if len(self.scalar) > MAX_SCALAR_BYTES:
+                    raise JsonStreamError('无效的 JSON：数字或字面量过长')
+                i = match.end()
+                continue
+            if self.scalar:
+                self._end_scalar()
+
+            c = data[i]
+            if c in _WHITESPACE:
+                i = _SKIP_WHITESPACE.match(data, i).end()
+                continue
+            if c == ord('"'):
+                if self.expect in (_VALUE, _VALUE_OR_CLOSE):
+                    self.string_is_key = False
+                elif self.expect in (_KEY, _KEY_OR_CLOSE):
+                    self.string_is_key = True
+                else:
+                    raise self._unexpected(c)
+                self.in_string = True
+            elif c in b'[{':
+                if self.expect not in (_VALUE, _VALUE_OR_CLOSE):
+                    raise self._unexpected(c)
+                if len(self.stack) >= MAX_DEPTH:
+                    raise JsonStreamError('无效的 JSON：嵌套过深')
+                self.stack.append(c)
+                self.expect = _KEY_OR_CLOSE if c == ord('{') else _VALUE_OR_CLOSE
+            elif c in b']}':
+                if not self.stack:
+                    if c != ord('}') or self.expect != _TOP_END:
+                        raise self._unexpected(c)
+                    self._end_value(data[start:i], events, 'done')
+                    return i + 1
+                opener = ord('{') if c == ord('}') else ord('[')
+                allowed = (_COMMA_OR_CLOSE, _KEY_OR_CLOSE if c == ord('}') else _VALUE_OR_CLOSE)
+                if self.stack[-1] != opener or self.expect not in allowed:
+                    raise self._unexpected(c)
+                self.stack.pop()
+                self._value_done()
+            elif c == ord(','):
+                if not self.stack and self.expect == _TOP_END:
+                    self._end_value(data[start:i], events, 'key')
+                    return i + 1
+                if self.expect != _COMMA_OR_CLOSE:
+                    raise self._unexpected(c)
+                self.expect = _KEY if self.stack[-1] == ord('{') else _VALUE
+            elif c == ord(':'):
+                if self.expect != _COLON:
+                    raise self._unexpected(c)
+                self.expect = _VALUE
+            i += 1
+        if i > start:
+            self._emit(data[start:i], events)
+        return i
+
+    @staticmethod
+    def _unexpected(c):
+        return JsonStreamError(f'无效的 JSON：意外的 {chr(c)!r}')
+
+    def _end_scalar(self):
+        token = bytes(self.scalar)
+        self.scalar.clear()
+        if token not in _LITERALS and _NUMBER.fullmatch(token) is None:
+            raise JsonStreamError(f'无效的 JSON：无效的值 {token[:20]!r}')
+        self._value_done()
+
+    def _value_done(self):
+        self.expect = _COMMA_OR_CLOSE if self.stack else _TOP_END
+
+    def _emit(self, segment, events):
+        try:
+            self.utf8.decode(segment)
+        except UnicodeDecodeError:
+            raise JsonStreamError('无效的 JSON：不是合法的 UTF-8 文本')
+        events.append((DATA, segment))
+
+    def _end_value(self, tail, events, next_state):
+        if tail:
+            self._emit(tail, events)
+        events.append((END, None))
+        self.state = next_state
@@ -0,0 +1,65 @@
+import json
+import resource
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from prompts.backup_store import BackupStore, iter_gunzip, iter_gzip
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def generate_backup(size, item_size=4096):
+    """逐块生成约 size 字节的备份 JSON：templates 列表 + banks 对象。"""
+    yield b'{"templates":['
+    filler = 'x' * item_size
+    written, index = 0, 0
+    while written < size:
+        item = json.dumps({"id": index, "name": f"模板 {index}", "content": filler}, ensure_ascii=False)
+        chunk = (b',' if index else b'') + item.encode('utf-8')
+        written += len(chunk)
+        index += 1
+        yield chunk
+    yield b'],"banks":{"colors":["red","green"]}}'
+
+
+class Command(BaseCommand):
+    """
+    测量整份备份流式上传（gzip 请求体 → 拆分 → 压缩 blob）与流式下载（拼装 → gzip）的耗时与峰值内存。
+    数据写入临时目录，结束后删除。
+    """
+    help = '整份备份流式上传/下载基准测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=500, help='备份 JSON 大小（MB）')
+
+    def handle(self, *args, **options):
+        size = options['size_mb'] * 1024 * 1024
+        base_dir = tempfile.mkdtemp()
+        baseline = _peak_rss_mb()
+        try:
+            with override_settings(BASE_DIR=base_dir):
+                store = BackupStore('bench')
+
+                started = time.perf_counter()
+                # 模拟客户端以 gzip 上传：请求体先压缩再逐块解压
+                manifest = store.save_json_stream(iter_gunzip(iter_gzip(generate_backup(size))))
+                upload = time.perf_counter() - started
+
+                started = time.perf_counter()
+                sent = sum(len(chunk) for chunk in iter_gzip(store.iter_json(manifest)))
+                download = time.perf_counter() - started
+
+            stored = sum(entry["size"] for entry in manifest["files"].values())
+            self.stdout.write(
+                f'上传 {stored / 1024 / 1024:.0f} MB 用时 {upload:.2f}s；'
+                f'下载（gzip 后 {sent / 1024 / 1024:.1f} MB）用时 {download:.2f}s；'
+                f'进程峰值 RSS {_peak_rss_mb():.1f} MB（开始前 {baseline:.1f} MB）'
+            )
+        finally:
+            shutil.rmtree(base_dir, ignore_errors=True)
@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from prompt_studio_be import tasks
+from prompts.models import MarketPrompt, PromptVersion, PromptSubscription
+from users.models import Notification
+
+
+class Command(BaseCommand):
+    """
+    在临时测试库中为一条提示词生成大量订阅者，测量作者发布新版本的请求耗时与后台扇出耗时。
+    不会触碰正式数据库。
+    """
+    help = '新版本通知扇出基准测试（使用临时测试数据库）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=100_000, help='订阅者数量')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(TASKS_EAGER=False, ALLOWED_HOSTS=['*']):
+                prompt = self._populate(options['subscribers'], options['batch_size'])
+                client = APIClient()
+                client.force_authenticate(prompt.owner)
+
+                started = time.perf_counter()
+                response = client.put(f'/api/market/prompts/{prompt.uuid}/', {
+                    'title': prompt.title, 'content': 'v2'
+                }, format='json')
+                request_ms = (time.perf_counter() - started) * 1000
+                tasks.wait_until_idle()
+                total = time.perf_counter() - started
+
+            sent = Notification.objects.filter(category='update').count()
+            self.stdout.write(
+                f'HTTP {response.status_code}，发布请求耗时 {request_ms:.1f}ms；'
+                f'后台扇出 {sent} 条通知，总耗时 {total:.2f}s'
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _populate(self, total, batch_size):
+        User = get_user_model()
+        owner = User.objects.create_user(username='author', password='bench')
+        prompt = MarketPrompt.objects.create(title='bench prompt', owner=owner)
+        PromptVersion.objects.create(prompt=prompt, version=1, content='v1')
+        started = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            size = min(batch_size, total - offset)
+            users = User.objects.bulk_create([
+                User(username=f'sub{offset + i}') for i in range(size)
+            ])
+            PromptSubscription.objects.bulk_create([
+                PromptSubscription(user=user, prompt=prompt) for user in users
+            ])
+        self.stdout.write(f'已生成 {total} 个订阅者（{time.perf_counter() - started:.1f}s）')
+        return prompt
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.http.multipartparser import MultiPartParser
+from django.test import override_settings
+
+from prompts.uploads import HashingFileUploadHandler, publish_staged_file
+
+BOUNDARY = 'benchboundary'
+
+
+class MultipartStream:
+    """按需生成 multipart 请求体的只读流，避免基准本身占用与文件等大的内存。"""
+
+    def __init__(self, size, block):
+        self.head = (
+            f'--{BOUNDARY}\r\n'
+            'Content-Disposition: form-data; name="file"; filename="bench.bin"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode()
+        self.tail = f'\r\n--{BOUNDARY}--\r\n'.encode()
+        self.size = size
+        self.block = block
+        self.length = len(self.head) + size + len(self.tail)
+        self.chunks = self._generate()
+        self.buffer = b''
+
+    def _generate(self):
+        yield self.head
+        sent = 0
+        while sent < self.size:
+            chunk = self.block[:self.size - sent]
+            sent += len(chunk)
+            yield chunk
+        yield self.tail
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, b'')
+            if not chunk:
+                break
+            self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class Command(BaseCommand):
+    """
+    测量 MediaUploadView 所用上传路径（multipart 解析 + 单次哈希写盘 + 原子发布）的吞吐与峰值内存。
+    不经过网络，数据写入临时 MEDIA_ROOT，结束后删除。
+    """
+    help = '多媒体上传吞吐基准测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=1024, help='上传文件大小（MB）')
+
+    def handle(self, *args, **options):
+        size = options['size_mb'] * 1024 * 1024
+        block = os.urandom(HashingFileUploadHandler.chunk_size)
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                stream = MultipartStream(size, block)
+                meta = {
+                    'CONTENT_TYPE': f'multipart/form-data; boundary={BOUNDARY}',
+                    'CONTENT_LENGTH': str(stream.length),
+                }
+                started = time.perf_counter()
+                _, files = MultiPartParser(meta, stream, [HashingFileUploadHandler()], 'utf-8').parse()
+                uploaded = files['file']
+                publish_staged_file(
+                    uploaded.temporary_file_path(), os.path.join(media_root, uploaded.sha256)
+                )
+                uploaded.discard()
+                elapsed = time.perf_counter() - started
+
+            expected = hashlib.sha256()
+            for offset in range(0, size, len(block)):
+                expected.update(block[:size - offset])
+            if expected.hexdigest() != uploaded.sha256:
+                self.stderr.write(self.style.ERROR('哈希与预期不一致'))
+
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            self.stdout.write(
+                f'{options["size_mb"]} MB 用时 {elapsed:.2f}s，'
+                f'吞吐 {options["size_mb"] / elapsed:.1f} MB/s，进程峰值 RSS {peak_mb:.1f} MB'
+            )
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
@@ -0,0 +1,120 @@
+import itertools
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from prompts.models import MarketPrompt, PromptVersion, PromptTag, Tag
+from prompts.search import get_search_backend
+
+COMMON_WORDS = (
+    'summarize translate rewrite outline explain review refactor debug classify extract '
+    'marketing email poem story essay report tweet slogan script interview resume '
+    'python javascript rust sql regex docker kubernetes pandas django react '
+    '翻译 总结 润色 大纲 解释 代码 审查 营销 文案 诗歌 故事 论文 报告 标题 面试 简历'
+).split()
+SYNTHETIC_WORDS = 20_000
+
+
+class Command(BaseCommand):
+    """
+    在临时测试库中生成指定数量的提示词，对比全文检索与原 icontains 查询的延迟。
+    不会触碰正式数据库。默认 10 万条，约 1.5 分钟；验证百万级延迟时使用 --prompts 1000000，
+    生成与建索引需要约 20 分钟、1.5 GB 以上的空间，建议配合 --db-file 使用磁盘文件。
+    """
+    help = '全文检索延迟基准测试（使用临时测试数据库）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prompts', type=int, default=100_000, help='生成的提示词数量')
+        parser.add_argument('--queries', type=int, default=200, help='执行的检索次数')
+        parser.add_argument('--limit', type=int, default=20, help='每次检索返回条数')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--db-file', help='SQLite 测试库改用此磁盘文件（默认在内存中），百万级数据量时避免占满内存'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # 常用词在前，词频按 Zipf 分布衰减，接近真实语料的选择性
+        self.vocabulary = COMMON_WORDS + [
+            ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(4, 9)))
+            for _ in range(SYNTHETIC_WORDS)
+        ]
+        self.cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(self.vocabulary))))
+        if options['db_file'] and connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = options['db_file']
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._populate(rng, options['prompts'], options['batch_size'])
+            queries = [
+                ' '.join(rng.sample(self.vocabulary, rng.choice((1, 1, 2))))
+                for _ in range(options['queries'])
+            ]
+            backend = get_search_backend()
+
+            fts = self._measure(lambda q: backend.search(q, options['limit']), queries)
+            self._report(f'{type(backend).__name__}.search', fts)
+
+            def icontains(q):
+                qs = MarketPrompt.objects.filter(visibility='public')
+                qs = qs.filter(title__icontains=q) | qs.filter(description__icontains=q)
+                return list(qs.values_list('pk', flat=True)[:options['limit']])
+
+            # 基线查询需要全表扫描，只取少量样本
+            baseline = self._measure(icontains, queries[:max(len(queries) // 10, 1)])
+            self._report('icontains baseline', baseline)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _populate(self, rng, total, batch_size):
+        owner = get_user_model().objects.create_user(username='bench', password='bench')
+        tags = Tag.objects.bulk_create([Tag(name=name) for name in COMMON_WORDS])
+        started = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            size = min(batch_size, total - offset)
+            prompts = [
+                MarketPrompt(
+                    uuid=uuid.uuid4(),
+                    title=' '.join(self._words(rng, 4)),
+                    description=' '.join(self._words(rng, 12)),
+                    owner=owner,
+                )
+                for _ in range(size)
+            ]
+            with transaction.atomic():
+                MarketPrompt.objects.bulk_create(prompts)
+                PromptVersion.objects.bulk_create([
+                    PromptVersion(prompt=p, version=1, content=' '.join(self._words(rng, 40)))
+                    for p in prompts
+                ])
+                PromptTag.objects.bulk_create([
+                    PromptTag(prompt=p, tag=tag) for p in prompts for tag in rng.sample(tags, 3)
+                ])
+        with transaction.atomic():
+            get_search_backend().rebuild()
+        self.stdout.write(f'生成并索引 {total} 条提示词，用时 {time.perf_counter() - started:.1f}s')
+
+    def _words(self, rng, k):
+        return rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=k)
+
+    @staticmethod
+    def _measure(fn, queries):
+        samples = []
+        for query in queries:
+            started = time.perf_counter()
+            fn(query)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def _report(self, label, samples):
+        samples = sorted(samples)
+        p99 = samples[min(int(len(samples) * 0.99), len(samples) - 1)]
+        self.stdout.write(
+            f'{label}: n={len(samples)} '
+            f'p50={statistics.median(samples):.2f}ms p99={p99:.2f}ms max={samples[-1]:.2f}ms'
+        )
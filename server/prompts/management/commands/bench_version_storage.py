@@ -0,0 +1,87 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import Length
+
+from prompts import versioning
+from prompts.models import MarketPrompt, PromptVersion
+
+
+class Command(BaseCommand):
+    """
+    在临时测试库中为若干提示词发布大量小改动版本，对比全文存储与差量存储的体积，
+    并测量读取全部版本、单个历史版本（冷 / 热缓存）的耗时。不会触碰正式数据库。
+    """
+    help = '提示词版本差量存储基准测试（使用临时测试数据库）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prompts', type=int, default=20, help='提示词数量')
+        parser.add_argument('--versions', type=int, default=300, help='每条提示词的版本数')
+        parser.add_argument('--lines', type=int, default=80, help='提示词内容行数')
+        parser.add_argument('--samples', type=int, default=200, help='单版本读取的采样次数')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            prompts, full_chars = self._publish(options)
+            stored = PromptVersion.objects.aggregate(
+                content=Sum(Length('content')), delta=Sum(Length('delta'))
+            )
+            packed_chars = stored['content'] + stored['delta']
+            self.stdout.write(
+                f'全文存储 {full_chars / 1e6:.2f}M 字符，差量存储 {packed_chars / 1e6:.2f}M 字符'
+                f'（{full_chars / packed_chars:.1f} 倍压缩）'
+            )
+            self._bench_reads(prompts, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _publish(self, options):
+        owner = get_user_model().objects.create_user(username='author', password='bench')
+        rng = random.Random(0)
+        prompts, full_chars = [], 0
+        started = time.perf_counter()
+        for n in range(options['prompts']):
+            prompt = MarketPrompt.objects.create(title=f'bench {n}', owner=owner)
+            lines = [f'第 {i} 条规则：回答时保持简洁、准确，并给出必要的示例。\n' for i in range(options['lines'])]
+            for version in range(1, options['versions'] + 1):
+                lines[rng.randrange(len(lines))] = f'第 {version} 版调整：{rng.random():.6f}\n'
+                content = ''.join(lines)
+                full_chars += len(content)
+                versioning.create_version(prompt, version, content)
+            prompt.latest_version = options['versions']
+            prompt.save()
+            prompts.append(prompt)
+        total = options['prompts'] * options['versions']
+        self.stdout.write(f'发布 {total} 个版本，每个平均 {(time.perf_counter() - started) / total * 1000:.2f}ms')
+        return prompts, full_chars
+
+    def _bench_reads(self, prompts, options):
+        versioning.cache.clear()
+        timings = []
+        for prompt in prompts:
+            started = time.perf_counter()
+            versioning.materialize(prompt.pk, prompt.versions.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(f'读取并还原全部 {options["versions"]} 个版本：中位数 {statistics.median(timings):.1f}ms')
+
+        rng = random.Random(1)
+        picks = [(rng.choice(prompts).pk, rng.randint(1, options['versions'])) for _ in range(options['samples'])]
+        for label in ('冷缓存', '热缓存'):
+            if label == '冷缓存':
+                versioning.cache.clear()
+            timings = []
+            for prompt_id, version in picks:
+                started = time.perf_counter()
+                versioning.get_contents(prompt_id, [version])
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f'单个历史版本（{label}）：中位数 {statistics.median(timings):.2f}ms，'
+                f'p95 {timings[int(len(timings) * 0.95)]:.2f}ms'
+            )
@@ -0,0 +1,39 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from prompts.backup_store import BackupStore
+
+
+class Command(BaseCommand):
+    """
+    对所有用户的云端备份执行保留策略并回收未被引用的 blob。
+    备份提交时会自动执行；修改 BACKUP_RETENTION 后或定期维护时可手动运行。
+    """
+    help = '按 BACKUP_RETENTION 清理备份快照并回收未引用的 blob'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-seconds', type=int, default=None,
+            help='不回收该时长内写入的 blob（默认 BACKUP_GC_GRACE_SECONDS）'
+        )
+
+    def handle(self, *args, **options):
+        backups_dir = os.path.join(settings.BASE_DIR, 'backups')
+        if not os.path.isdir(backups_dir):
+            self.stdout.write('没有备份目录，无需清理')
+            return
+
+        snapshots = blobs = freed = 0
+        for user_id in sorted(os.listdir(backups_dir)):
+            store = BackupStore(user_id)
+            if not os.path.isdir(store.root):
+                continue
+            snapshots += store.prune()
+            removed, size = store.collect_garbage(options['grace_seconds'])
+            blobs += removed
+            freed += size
+        self.stdout.write(self.style.SUCCESS(
+            f'已删除 {snapshots} 个过期快照、{blobs} 个未引用的 blob，释放 {freed} 字节'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from prompts.uploads import sweep_staging
+
+
+class Command(BaseCommand):
+    """
+    清理媒体上传暂存目录中中断上传遗留的文件。上传接口会定期自动执行，进程崩溃后可手动运行。
+    """
+    help = '删除 MEDIA_ROOT/.staging 中超过 MEDIA_STAGING_MAX_AGE 未修改的暂存文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=None,
+            help='只删除该时长前修改的文件（秒，默认 MEDIA_STAGING_MAX_AGE）'
+        )
+
+    def handle(self, *args, **options):
+        removed = sweep_staging(max_age=options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f'已删除 {removed} 个遗留的暂存文件'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from prompts.models import MarketPrompt, Interaction
+
+
+def _count_of(interaction_type):
+    subquery = (
+        Interaction.objects
+        .filter(prompt=OuterRef('pk'), type=interaction_type)
+        .order_by()
+        .values('prompt')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(subquery), 0)
+
+
+class Command(BaseCommand):
+    """
+    根据 Interaction 表重算 MarketPrompt 上的点赞/点踩冗余计数，用于修复计数漂移。
+    """
+    help = '根据 Interaction 重建 MarketPrompt.like_count / dislike_count'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = MarketPrompt.objects.exclude(
+                like_count=_count_of('like'),
+                dislike_count=_count_of('dislike'),
+            ).count()
+            updated = MarketPrompt.objects.update(
+                like_count=_count_of('like'),
+                dislike_count=_count_of('dislike'),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'已重算 {updated} 条提示词的互动计数，其中 {drifted} 条存在漂移'
+        ))
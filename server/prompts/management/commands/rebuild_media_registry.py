@@ -0,0 +1,48 @@
+import os
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from prompts.models import MediaObject
+
+MEDIA_FILENAME = re.compile(r'^([0-9a-f]{64})(\.[^.]*)?$')
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """
+    扫描 MEDIA_ROOT 下按 <sha256><ext> 命名的文件，补登记到 MediaObject 表，
+    用于登记表上线前已存在的媒体文件。文件名即内容哈希，不重新计算。
+    """
+    help = '根据 MEDIA_ROOT 中的文件重建媒体库登记表'
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(settings.MEDIA_ROOT):
+            self.stdout.write('MEDIA_ROOT 不存在，无需登记')
+            return
+
+        batch = []
+        total = 0
+        with os.scandir(settings.MEDIA_ROOT) as entries:
+            for entry in entries:
+                match = MEDIA_FILENAME.match(entry.name)
+                if not match or not entry.is_file():
+                    continue
+                batch.append(MediaObject(
+                    sha256=match.group(1), size=entry.stat().st_size, filename=entry.name
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    total += self._save(batch)
+                    batch = []
+        total += self._save(batch)
+        self.stdout.write(self.style.SUCCESS(f'已登记 {total} 个媒体文件'))
+
+    def _save(self, batch):
+        MediaObject.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['sha256'],
+            update_fields=['size', 'filename'],
+        )
+        return len(batch)
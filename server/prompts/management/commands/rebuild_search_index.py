@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from prompts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    清空并重建提示词全文索引，用于索引损坏或批量导入（绕过 signals）之后。
+    """
+    help = '重建提示词市场全文检索索引'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'已使用 {type(backend).__name__} 重建索引'))
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 09:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    MarketPrompt = apps.get_model('prompts', 'MarketPrompt')
+    Interaction = apps.get_model('prompts', 'Interaction')
+
+    def count_of(interaction_type):
+        subquery = (
+            Interaction.objects
+            .filter(prompt=OuterRef('pk'), type=interaction_type)
+            .order_by()
+            .values('prompt')
+            .annotate(n=Count('pk'))
+            .values('n')
+        )
+        return Coalesce(Subquery(subquery), 0)
+
+    MarketPrompt.objects.update(
+        like_count=count_of('like'),
+        dislike_count=count_of('dislike'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marketprompt',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='点踩数'),
+        ),
+        migrations.AddField(
+            model_name='marketprompt',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='点赞数'),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
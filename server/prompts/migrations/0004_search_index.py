@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-18 10:00
+
+from django.db import migrations
+
+SQLITE_FORWARD = (
+    """
+    CREATE TABLE prompts_search_doc (
+        rowid INTEGER PRIMARY KEY,
+        prompt_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE prompts_search_fts USING fts5(
+        title, description, tags, content, tokenize = 'trigram'
+    )
+    """,
+    "INSERT INTO prompts_search_doc (prompt_id) SELECT uuid FROM prompts_marketprompt",
+    """
+    INSERT INTO prompts_search_fts (rowid, title, description, tags, content)
+    SELECT d.rowid, p.title, p.description, p.tags, COALESCE((
+        SELECT v.content FROM prompts_promptversion v
+        WHERE v.prompt_id = p.uuid ORDER BY v.version DESC LIMIT 1
+    ), '')
+    FROM prompts_search_doc d JOIN prompts_marketprompt p ON p.uuid = d.prompt_id
+    """,
+)
+
+SQLITE_REVERSE = (
+    "DROP TABLE IF EXISTS prompts_search_fts",
+    "DROP TABLE IF EXISTS prompts_search_doc",
+)
+
+POSTGRES_FORWARD = (
+    """
+    CREATE TABLE prompts_search_index (
+        prompt_id uuid PRIMARY KEY REFERENCES prompts_marketprompt (uuid) ON DELETE CASCADE,
+        title text NOT NULL DEFAULT '',
+        description text NOT NULL DEFAULT '',
+        tags text NOT NULL DEFAULT '',
+        content text NOT NULL DEFAULT '',
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', title), 'A') ||
+            setweight(to_tsvector('simple', tags), 'B') ||
+            setweight(to_tsvector('simple', description), 'C') ||
+            setweight(to_tsvector('simple', content), 'D')
+        ) STORED
+    )
+    """,
+    "CREATE INDEX prompts_search_index_document_gin ON prompts_search_index USING GIN (document)",
+    """
+    INSERT INTO prompts_search_index (prompt_id, title, description, tags, content)
+    SELECT p.uuid, p.title, p.description, p.tags, COALESCE((
+        SELECT v.content FROM prompts_promptversion v
+        WHERE v.prompt_id = p.uuid ORDER BY v.version DESC LIMIT 1
+    ), '')
+    FROM prompts_marketprompt p
+    """,
+)
+
+POSTGRES_REVERSE = (
+    "DROP TABLE IF EXISTS prompts_search_index",
+)
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, ())
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0003_marketprompt_interaction_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
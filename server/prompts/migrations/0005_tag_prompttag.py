@@ -0,0 +1,93 @@
+# Generated by Django 6.0 on 2026-10-18 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TAG_NAME_MAX_LENGTH = 50
+
+
+def split_legacy_tags(apps, schema_editor):
+    MarketPrompt = apps.get_model('prompts', 'MarketPrompt')
+    Tag = apps.get_model('prompts', 'Tag')
+    PromptTag = apps.get_model('prompts', 'PromptTag')
+
+    pairs = []
+    for prompt_id, legacy in MarketPrompt.objects.exclude(legacy_tags='').values_list('uuid', 'legacy_tags'):
+        names = []
+        for item in legacy.split(','):
+            name = item.strip()[:TAG_NAME_MAX_LENGTH]
+            if name and name not in names:
+                names.append(name)
+        pairs.extend((prompt_id, name) for name in names)
+
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in {name for _, name in pairs}], ignore_conflicts=True
+    )
+    tag_ids = dict(Tag.objects.values_list('name', 'id'))
+    PromptTag.objects.bulk_create(
+        [PromptTag(prompt_id=prompt_id, tag_id=tag_ids[name]) for prompt_id, name in pairs],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def join_tags(apps, schema_editor):
+    MarketPrompt = apps.get_model('prompts', 'MarketPrompt')
+    PromptTag = apps.get_model('prompts', 'PromptTag')
+
+    joined = {}
+    for prompt_id, name in PromptTag.objects.order_by('id').values_list('prompt_id', 'tag__name'):
+        joined.setdefault(prompt_id, []).append(name)
+    for prompt_id, names in joined.items():
+        MarketPrompt.objects.filter(pk=prompt_id).update(legacy_tags=','.join(names)[:255])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='marketprompt',
+            old_name='tags',
+            new_name='legacy_tags',
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='名称')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PromptTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prompt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prompt_tags', to='prompts.marketprompt')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prompt_tags', to='prompts.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='marketprompt',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='prompts', through='prompts.PromptTag', to='prompts.tag', verbose_name='标签'),
+        ),
+        migrations.AddIndex(
+            model_name='prompttag',
+            index=models.Index(fields=['tag', 'prompt'], name='prompts_tag_prompt_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='prompttag',
+            unique_together={('prompt', 'tag')},
+        ),
+        migrations.RunPython(split_legacy_tags, join_tags),
+        migrations.RemoveField(
+            model_name='marketprompt',
+            name='legacy_tags',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0005_tag_prompttag'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['prompt', 'created_at', 'id'], name='prompts_cmt_prompt_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['parent', 'created_at'], name='prompts_cmt_parent_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['prompt', 'type'], name='prompts_inter_prompt_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketprompt',
+            index=models.Index(fields=['visibility', '-updated_at', '-uuid'], name='prompts_mp_vis_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marketprompt',
+            index=models.Index(fields=['owner', 'title'], name='prompts_mp_owner_title_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0006_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('size', models.PositiveBigIntegerField(verbose_name='字节数')),
+                ('filename', models.CharField(max_length=100, verbose_name='文件名')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0007_mediaobject'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('imported_version', models.PositiveIntegerField(default=1, verbose_name='导入时的版本')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('prompt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='prompts.marketprompt')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prompt_subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['prompt', 'id'], name='prompts_sub_prompt_id_idx')],
+                'unique_together': {('user', 'prompt')},
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+from prompts.delta import apply_delta, encode_delta
+
+BATCH_SIZE = 500
+
+
+def _prompt_ids(PromptVersion):
+    return PromptVersion.objects.order_by().values_list('prompt_id', flat=True).distinct().iterator()
+
+
+def pack_versions(apps, schema_editor):
+    """把已有的历史版本改写为相对下一版本的差量，最新版本与关键帧保留全文。"""
+    PromptVersion = apps.get_model('prompts', 'PromptVersion')
+    interval = getattr(settings, 'PROMPT_VERSION_KEYFRAME_INTERVAL', 20)
+
+    packed = []
+    for prompt_id in list(_prompt_ids(PromptVersion)):
+        above = None
+        for row in PromptVersion.objects.filter(prompt_id=prompt_id).order_by('-version'):
+            text = row.content
+            if above is not None and above[0] == row.version + 1 and row.version % interval:
+                delta = encode_delta(above[1], text)
+                if len(delta) < len(text):
+                    row.storage, row.delta, row.content = 'delta', delta, ''
+                    packed.append(row)
+            above = (row.version, text)
+        if len(packed) >= BATCH_SIZE:
+            PromptVersion.objects.bulk_update(packed, ['storage', 'delta', 'content'])
+            packed = []
+    PromptVersion.objects.bulk_update(packed, ['storage', 'delta', 'content'], batch_size=BATCH_SIZE)
+
+
+def unpack_versions(apps, schema_editor):
+    PromptVersion = apps.get_model('prompts', 'PromptVersion')
+
+    unpacked = []
+    for prompt_id in list(_prompt_ids(PromptVersion)):
+        above = None
+        for row in PromptVersion.objects.filter(prompt_id=prompt_id).order_by('-version'):
+            if row.storage == 'delta':
+                row.storage, row.content, row.delta = 'full', apply_delta(above, row.delta), ''
+                unpacked.append(row)
+            above = row.content
+        if len(unpacked) >= BATCH_SIZE:
+            PromptVersion.objects.bulk_update(unpacked, ['storage', 'delta', 'content'])
+            unpacked = []
+    PromptVersion.objects.bulk_update(unpacked, ['storage', 'delta', 'content'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0008_promptsubscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promptversion',
+            name='delta',
+            field=models.TextField(blank=True, default='', verbose_name='差量'),
+        ),
+        migrations.AddField(
+            model_name='promptversion',
+            name='storage',
+            field=models.CharField(choices=[('full', '全文'), ('delta', '差量')], default='full', max_length=5, verbose_name='存储方式'),
+        ),
+        migrations.RunPython(pack_versions, unpack_versions),
+    ]
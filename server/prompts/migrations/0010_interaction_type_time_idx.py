@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0009_promptversion_delta_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='interaction',
+            name='prompts_inter_prompt_type_idx',
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['prompt', 'type', 'created_at'], name='prompts_inter_type_time_idx'),
+        ),
+    ]
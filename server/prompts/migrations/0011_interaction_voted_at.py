@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_voted_at(apps, schema_editor):
+    # 已有互动的表态时间取 created_at（此前切换类型时会改写 created_at，它即最近一次表态的时间）
+    Interaction = apps.get_model('prompts', 'Interaction')
+    Interaction.objects.update(voted_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0010_interaction_type_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interaction',
+            name='voted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_voted_at, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='interaction',
+            name='prompts_inter_type_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['prompt', 'type', 'voted_at'], name='prompts_inter_type_vote_idx'),
+        ),
+    ]
@@ -1,6 +1,36 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+
+def parse_tag_names(value):
+    """
+    将逗号分隔的字符串或字符串列表规范化为去重、去空白后的标签名列表（保持原顺序）。
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    names = []
+    for item in value or []:
+        name = str(item).strip()[:Tag.NAME_MAX_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+class Tag(models.Model):
+    """
+    规范化的标签，名称唯一。
+    """
+    NAME_MAX_LENGTH = 50
+
+    name = models.CharField(max_length=NAME_MAX_LENGTH, unique=True, verbose_name="名称")
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
 
 class MarketPrompt(models.Model):
     """
@@ -28,21 +58,66 @@ class MarketPrompt(models.Model):
         verbose_name="可见性"
     )
     latest_version = models.PositiveIntegerField(default=1, verbose_name="最新版本")
-    tags = models.CharField(max_length=255, blank=True, verbose_name="标签") # 逗号分隔的标签
+    tags = models.ManyToManyField(
+        Tag,
+        through='PromptTag',
+        related_name='prompts',
+        blank=True,
+        verbose_name="标签"
+    )
+    # 冗余计数，由 InteractionView 在事务内维护，可用 rebuild_interaction_counts 命令重算
+    like_count = models.PositiveIntegerField(default=0, verbose_name="点赞数")
+    dislike_count = models.PositiveIntegerField(default=0, verbose_name="点踩数")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            # 市场列表：visibility 过滤 + (-updated_at, -uuid) 游标分页
+            models.Index(fields=['visibility', '-updated_at', '-uuid'], name='prompts_mp_vis_updated_idx'),
+            # 发布时按所有者 + 标题对齐已有提示词
+            models.Index(fields=['owner', 'title'], name='prompts_mp_owner_title_idx'),
+        ]
 
     def __str__(self):
         return f'{self.title} by {self.owner.username}'
 
+    def set_tag_names(self, names):
+        """按名称设置标签，缺失的标签会被创建。"""
+        names = parse_tag_names(names)
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        self.tags.set(Tag.objects.filter(name__in=names))
+
+class PromptTag(models.Model):
+    """
+    提示词与标签的关联表。(prompt, tag) 唯一约束服务于按提示词取标签，
+    (tag, prompt) 索引服务于按标签筛选提示词与分面计数。
+    """
+    prompt = models.ForeignKey(MarketPrompt, on_delete=models.CASCADE, related_name='prompt_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='prompt_tags')
+
+    class Meta:
+        unique_together = ('prompt', 'tag')
+        indexes = [
+            models.Index(fields=['tag', 'prompt'], name='prompts_tag_prompt_idx'),
+        ]
+
 class PromptVersion(models.Model):
     """
     提示词的具体版本。
+
+    历史版本可能以差量存储（storage='delta'，content 为空），读取内容请经由 versioning.py 还原；
+    最新版本与关键帧始终为全文。
     """
+    STORAGE_FULL = 'full'
+    STORAGE_DELTA = 'delta'
+    STORAGE_CHOICES = (
+        (STORAGE_FULL, '全文'),
+        (STORAGE_DELTA, '差量'),
+    )
+
     prompt = models.ForeignKey(
         MarketPrompt,
         on_delete=models.CASCADE,
@@ -51,6 +126,9 @@ class PromptVersion(models.Model):
     )
     version = models.PositiveIntegerField(verbose_name="版本号")
     content = models.TextField(verbose_name="内容")
+    storage = models.CharField(max_length=5, choices=STORAGE_CHOICES, default=STORAGE_FULL, verbose_name="存储方式")
+    # 相对下一版本的差量（见 delta.py），仅 storage='delta' 时有值
+    delta = models.TextField(blank=True, default='', verbose_name="差量")
     changelog = models.TextField(blank=True, verbose_name="更新日志")
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -61,6 +139,22 @@ class PromptVersion(models.Model):
     def __str__(self):
         return f'{self.prompt.title} v{self.version}'
 
+class PromptSubscription(models.Model):
+    """
+    用户导入（安装）市场提示词后的订阅关系，提示词发布新版本时据此发送更新通知。
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='prompt_subscriptions')
+    prompt = models.ForeignKey(MarketPrompt, on_delete=models.CASCADE, related_name='subscriptions')
+    imported_version = models.PositiveIntegerField(default=1, verbose_name="导入时的版本")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'prompt')
+        indexes = [
+            # 通知扇出按 (prompt, id) 分批遍历订阅者
+            models.Index(fields=['prompt', 'id'], name='prompts_sub_prompt_id_idx'),
+        ]
+
 class Interaction(models.Model):
     """
     点赞和踩。
@@ -73,9 +167,15 @@ class Interaction(models.Model):
     prompt = models.ForeignKey(MarketPrompt, on_delete=models.CASCADE, related_name='interactions')
     type = models.CharField(max_length=10, choices=TYPE_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
+    # 当前类型的表态时间，切换点赞/点踩时更新；聚合点赞通知按它统计时间窗内的点赞人数
+    voted_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ('user', 'prompt')
+        indexes = [
+            # rebuild_interaction_counts 按 (prompt, type) 计数；点赞通知按时间窗统计点赞人数
+            models.Index(fields=['prompt', 'type', 'voted_at'], name='prompts_inter_type_vote_idx'),
+        ]
 
 class Comment(models.Model):
     """
@@ -94,4 +194,22 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['created_at']
\ No newline at end of file
+        ordering = ['created_at']
+        indexes = [
+            # 评论树骨架与按提示词过滤的评论列表均按 (created_at, id) 排序
+            models.Index(fields=['prompt', 'created_at', 'id'], name='prompts_cmt_prompt_created_idx'),
+            # 某条评论下的回复按时间排序
+            models.Index(fields=['parent', 'created_at'], name='prompts_cmt_parent_created_idx'),
+        ]
+class MediaObject(models.Model):
+    """
+    媒体库登记表：每个内容哈希一条记录，供上传前的批量去重查询使用。
+    文件本身以 <sha256><ext> 存放在 MEDIA_ROOT 下。
+    """
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    size = models.PositiveBigIntegerField(verbose_name="字节数")
+    filename = models.CharField(max_length=100, verbose_name="文件名")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.filename
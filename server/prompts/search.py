@@ -0,0 +1,416 @@
+"""
+提示词市场全文检索。
+
+SQLite 使用 FTS5 虚拟表（trigram 分词，可对中文做子串检索），PostgreSQL 使用
+tsvector 生成列 + GIN 索引，其余数据库退化为 icontains 查询。索引内容为标题、
+描述、标签与最新版本内容，由 signals 在 MarketPrompt / PromptVersion 保存后调用 schedule_index，
+在事务提交后刷新；一次更新中多次保存同一提示词只刷新一次索引。
+
+SQLite 的 bm25 逐行读取命中位置，计算 IDF 时还会扫描每个词的全部命中，常用词的延迟随数据量线性增长。
+任一词的命中数超过 settings.SEARCH_RANK_CANDIDATES 时不再按相关度排序，改为按收录先后返回
+最新的命中（rank 为 0），FTS5 按 rowid 倒序遍历倒排表、取够即停。
+
+返回的高亮文本已做 HTML 转义，除包裹命中词的 <mark></mark> 外不含任何标签，可直接按 HTML 渲染。
+数据库高亮函数先用私有区字符标记命中位置，转义后再替换为 <mark>；原文中若恰好含有这两个字符，
+最多多出成对或不成对的 <mark>，不会引入其他标签。
+"""
+import html
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+# 数据库高亮函数使用的命中标记，转义后替换为 HIGHLIGHT_OPEN / HIGHLIGHT_CLOSE
+MARK_OPEN = '\ue000'
+MARK_CLOSE = '\ue001'
+SNIPPET_ELLIPSIS = '…'
+# 摘要窗口大小：PostgreSQL 按词计；FTS5 trigram 的 token 是逐字符滑动的三元组，与 Python 回退路径一样按字符计
+SNIPPET_TOKENS = 16
+SNIPPET_CHARS = 48
+MAX_TERMS = 8
+
+
+def _rank_candidates():
+    return getattr(settings, 'SEARCH_RANK_CANDIDATES', 200)
+
+
+def _terms(query):
+    return [t for t in (query or '').split() if t][:MAX_TERMS]
+
+
+def _render_marks(text):
+    """转义带命中标记的文本，并把标记替换为 <mark></mark>。"""
+    if not text:
+        return ''
+    return html.escape(text).replace(MARK_OPEN, HIGHLIGHT_OPEN).replace(MARK_CLOSE, HIGHLIGHT_CLOSE)
+
+
+def _highlight_text(text, terms):
+    if not text or not terms:
+        return html.escape(text or '')
+    pattern = re.compile('|'.join(re.escape(t) for t in terms), re.IGNORECASE)
+    return _render_marks(pattern.sub(lambda m: f'{MARK_OPEN}{m.group(0)}{MARK_CLOSE}', text))
+
+
+def _snippet_text(text, terms):
+    """截取首个命中词附近的片段并高亮，用于无法使用数据库高亮函数的查询。"""
+    if not text:
+        return ''
+    lowered = text.lower()
+    positions = [p for p in (lowered.find(t.lower()) for t in terms) if p >= 0]
+    start = max(min(positions) - SNIPPET_CHARS // 4, 0) if positions else 0
+    end = start + SNIPPET_CHARS
+    fragment = text[start:end]
+    prefix = SNIPPET_ELLIPSIS if start > 0 else ''
+    suffix = SNIPPET_ELLIPSIS if end < len(text) else ''
+    return f'{prefix}{_highlight_text(fragment, terms)}{suffix}'
+
+
+class SqliteFtsBackend:
+    """
+    FTS5 索引。trigram 分词器只能用 MATCH 检索不少于 3 个字符的词，
+    更短的词（如两个汉字）改用同一张虚拟表上的 LIKE 过滤。
+    """
+    MIN_MATCH_CHARS = 3
+    # 列权重依次对应 title, description, tags, content
+    BM25_WEIGHTS = '10.0, 2.0, 5.0, 1.0'
+
+    REBUILD_SQL = (
+        "DELETE FROM prompts_search_fts",
+        "DELETE FROM prompts_search_doc",
+        "INSERT INTO prompts_search_doc (prompt_id) SELECT uuid FROM prompts_marketprompt",
+        """
+        INSERT INTO prompts_search_fts (rowid, title, description, tags, content)
+        SELECT d.rowid, p.title, p.description, COALESCE((
+            SELECT group_concat(t.name, ',') FROM prompts_prompttag pt
+            JOIN prompts_tag t ON t.id = pt.tag_id WHERE pt.prompt_id = p.uuid
+        ), ''), COALESCE((
+            SELECT v.content FROM prompts_promptversion v
+            WHERE v.prompt_id = p.uuid ORDER BY v.version DESC LIMIT 1
+        ), '')
+        FROM prompts_search_doc d JOIN prompts_marketprompt p ON p.uuid = d.prompt_id
+        """,
+    )
+
+    def index(self, prompt_id, title, description, tags, content):
+        key = prompt_id.hex
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO prompts_search_doc (prompt_id) VALUES (%s) "
+                "ON CONFLICT (prompt_id) DO NOTHING", [key]
+            )
+            cursor.execute("SELECT rowid FROM prompts_search_doc WHERE prompt_id = %s", [key])
+            rowid = cursor.fetchone()[0]
+            cursor.execute("DELETE FROM prompts_search_fts WHERE rowid = %s", [rowid])
+            cursor.execute(
+                "INSERT INTO prompts_search_fts (rowid, title, description, tags, content) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [rowid, title, description, tags, content]
+            )
+
+    def remove(self, prompt_id):
+        key = prompt_id.hex
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM prompts_search_fts WHERE rowid IN "
+                "(SELECT rowid FROM prompts_search_doc WHERE prompt_id = %s)", [key]
+            )
+            cursor.execute("DELETE FROM prompts_search_doc WHERE prompt_id = %s", [key])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            for sql in self.REBUILD_SQL:
+                cursor.execute(sql)
+
+    @staticmethod
+    def _phrase(term):
+        return '"%s"' % term.replace('"', '""')
+
+    def _where(self, terms):
+        long_terms = [t for t in terms if len(t) >= self.MIN_MATCH_CHARS]
+        short_terms = [t for t in terms if len(t) < self.MIN_MATCH_CHARS]
+        clauses, params = [], []
+        if long_terms:
+            clauses.append("prompts_search_fts MATCH %s")
+            params.append(' '.join(self._phrase(t) for t in long_terms))
+        for term in short_terms:
+            like = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            columns = ('title', 'description', 'tags', 'content')
+            clauses.append('(' + ' OR '.join(
+                f"prompts_search_fts.{col} LIKE %s ESCAPE '\\'" for col in columns
+            ) + ')')
+            params.extend([like] * len(columns))
+        return ' AND '.join(clauses), params, long_terms
+
+    def _too_common(self, long_terms):
+        """是否有词的命中数超过 SEARCH_RANK_CANDIDATES；每个词最多读取该数目加一行，一条查询完成。"""
+        cap = _rank_candidates()
+        counts = ', '.join(
+            "(SELECT count(*) FROM (SELECT rowid FROM prompts_search_fts "
+            "WHERE prompts_search_fts MATCH %s LIMIT %s))" for _ in long_terms
+        )
+        params = []
+        for term in long_terms:
+            params += [self._phrase(term), cap + 1]
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {counts}", params)
+            return any(count > cap for count in cursor.fetchone())
+
+    def filter(self, queryset, query):
+        terms = _terms(query)
+        if not terms:
+            return queryset
+        where, params, _ = self._where(terms)
+        sql = (
+            "SELECT d.prompt_id FROM prompts_search_fts "
+            "JOIN prompts_search_doc d ON d.rowid = prompts_search_fts.rowid "
+            f"WHERE {where}"
+        )
+        return queryset.filter(pk__in=RawSQL(sql, params))
+
+    def search(self, query, limit):
+        terms = _terms(query)
+        if not terms:
+            return []
+        where, params, long_terms = self._where(terms)
+        if long_terms:
+            if self._too_common(long_terms):
+                # 常用词：按收录先后（rowid）取最新的命中，不计算 bm25
+                rank, order = '0.0', 'prompts_search_fts.rowid DESC'
+            else:
+                rank, order = f'-bm25(prompts_search_fts, {self.BM25_WEIGHTS})', 'rank DESC'
+            sql = (
+                f"SELECT d.prompt_id, {rank} AS rank, "
+                "highlight(prompts_search_fts, 0, %s, %s), "
+                "snippet(prompts_search_fts, -1, %s, %s, %s, %s) "
+                "FROM prompts_search_fts "
+                "JOIN prompts_search_doc d ON d.rowid = prompts_search_fts.rowid "
+                "JOIN prompts_marketprompt p ON p.uuid = d.prompt_id "
+                f"WHERE {where} AND p.visibility = 'public' "
+                f"ORDER BY {order} LIMIT %s"
+            )
+            head = [MARK_OPEN, MARK_CLOSE, MARK_OPEN, MARK_CLOSE, SNIPPET_ELLIPSIS, SNIPPET_CHARS]
+            with connection.cursor() as cursor:
+                cursor.execute(sql, head + params + [limit])
+                rows = cursor.fetchall()
+            return [
+                {'prompt_id': pid, 'rank': rank,
+                 'title_highlight': _render_marks(title), 'snippet': _render_marks(snippet)}
+                for pid, rank, title, snippet in rows
+            ]
+
+        # 只有短词时无法使用 FTS5 的排序与高亮函数，按更新时间返回并在 Python 中高亮
+        sql = (
+            "SELECT d.prompt_id, prompts_search_fts.title, "
+            "prompts_search_fts.description || ' ' || prompts_search_fts.content "
+            "FROM prompts_search_fts "
+            "JOIN prompts_search_doc d ON d.rowid = prompts_search_fts.rowid "
+            "JOIN prompts_marketprompt p ON p.uuid = d.prompt_id "
+            f"WHERE {where} AND p.visibility = 'public' "
+            "ORDER BY p.updated_at DESC LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            rows = cursor.fetchall()
+        return [
+            {
+                'prompt_id': pid,
+                'rank': 0.0,
+                'title_highlight': _highlight_text(title, terms),
+                'snippet': _snippet_text(body, terms),
+            }
+            for pid, title, body in rows
+        ]
+
+
+class PostgresSearchBackend:
+    """
+    tsvector 索引。中文没有内置分词配置，统一使用 'simple'，并对每个词做前缀匹配，
+    以便输入过程中的实时检索。
+    """
+    TS_CONFIG = 'simple'
+    HEADLINE_TITLE = f'StartSel="{MARK_OPEN}", StopSel="{MARK_CLOSE}", HighlightAll=true'
+    HEADLINE_BODY = (
+        f'StartSel="{MARK_OPEN}", StopSel="{MARK_CLOSE}", '
+        f'MaxFragments=1, MaxWords={SNIPPET_TOKENS}, MinWords=5, FragmentDelimiter={SNIPPET_ELLIPSIS}'
+    )
+
+    REBUILD_SQL = (
+        "DELETE FROM prompts_search_index",
+        """
+        INSERT INTO prompts_search_index (prompt_id, title, description, tags, content)
+        SELECT p.uuid, p.title, p.description, COALESCE((
+            SELECT string_agg(t.name, ',') FROM prompts_prompttag pt
+            JOIN prompts_tag t ON t.id = pt.tag_id WHERE pt.prompt_id = p.uuid
+        ), ''), COALESCE((
+            SELECT v.content FROM prompts_promptversion v
+            WHERE v.prompt_id = p.uuid ORDER BY v.version DESC LIMIT 1
+        ), '')
+        FROM prompts_marketprompt p
+        """,
+    )
+
+    def index(self, prompt_id, title, description, tags, content):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO prompts_search_index (prompt_id, title, description, tags, content) "
+                "VALUES (%s, %s, %s, %s, %s) "
+                "ON CONFLICT (prompt_id) DO UPDATE SET title = EXCLUDED.title, "
+                "description = EXCLUDED.description, tags = EXCLUDED.tags, content = EXCLUDED.content",
+                [prompt_id, title, description, tags, content]
+            )
+
+    def remove(self, prompt_id):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM prompts_search_index WHERE prompt_id = %s", [prompt_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            for sql in self.REBUILD_SQL:
+                cursor.execute(sql)
+
+    @staticmethod
+    def _tsquery(terms):
+        lexemes = []
+        for term in terms:
+            cleaned = re.sub(r"[&|!():*'\\<>\s]", '', term)
+            if cleaned:
+                lexemes.append(f"'{cleaned}':*")
+        return ' & '.join(lexemes)
+
+    def filter(self, queryset, query):
+        tsquery = self._tsquery(_terms(query))
+        if not tsquery:
+            return queryset
+        sql = (
+            "SELECT prompt_id FROM prompts_search_index "
+            f"WHERE document @@ to_tsquery('{self.TS_CONFIG}', %s)"
+        )
+        return queryset.filter(pk__in=RawSQL(sql, [tsquery]))
+
+    def search(self, query, limit):
+        tsquery = self._tsquery(_terms(query))
+        if not tsquery:
+            return []
+        # 先在子查询中按 ts_rank 取前 N 条，再只对这 N 条计算 ts_headline
+        sql = (
+            "SELECT hit.prompt_id, hit.rank, "
+            f"ts_headline('{self.TS_CONFIG}', hit.title, hit.query, %s), "
+            f"ts_headline('{self.TS_CONFIG}', concat_ws(' ', hit.description, hit.content), hit.query, %s) "
+            "FROM ("
+            "  SELECT s.prompt_id, s.title, s.description, s.content, q.query, "
+            "         ts_rank(s.document, q.query) AS rank "
+            "  FROM prompts_search_index s "
+            "  JOIN prompts_marketprompt p ON p.uuid = s.prompt_id "
+            f"  CROSS JOIN to_tsquery('{self.TS_CONFIG}', %s) AS q(query) "
+            "  WHERE s.document @@ q.query AND p.visibility = 'public' "
+            "  ORDER BY rank DESC LIMIT %s"
+            ") hit ORDER BY hit.rank DESC"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.HEADLINE_TITLE, self.HEADLINE_BODY, tsquery, limit])
+            rows = cursor.fetchall()
+        return [
+            {'prompt_id': pid, 'rank': rank,
+             'title_highlight': _render_marks(title), 'snippet': _render_marks(snippet)}
+            for pid, rank, title, snippet in rows
+        ]
+
+
+class FallbackSearchBackend:
+    """没有全文索引的数据库：退化为 icontains 扫描，仅保证功能可用。"""
+
+    def index(self, *args, **kwargs):
+        pass
+
+    def remove(self, prompt_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def filter(self, queryset, query):
+        from .models import PromptTag
+
+        for term in _terms(query):
+            tagged = PromptTag.objects.filter(tag__name__icontains=term).values('prompt')
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term) | Q(pk__in=tagged)
+            )
+        return queryset
+
+    def search(self, query, limit):
+        from .models import MarketPrompt
+
+        terms = _terms(query)
+        if not terms:
+            return []
+        rows = self.filter(MarketPrompt.objects.filter(visibility='public'), query)
+        return [
+            {
+                'prompt_id': prompt.pk,
+                'rank': 0.0,
+                'title_highlight': _highlight_text(prompt.title, terms),
+                'snippet': _snippet_text(prompt.description, terms),
+            }
+            for prompt in rows.only('uuid', 'title', 'description')[:limit]
+        ]
+
+
+_BACKENDS = {
+    'sqlite': SqliteFtsBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    return _BACKENDS.get(connection.vendor, FallbackSearchBackend)()
+
+
+def index_prompt(prompt):
+    """用提示词当前的元数据与最高版本内容刷新索引。"""
+    content = prompt.versions.order_by('-version').values_list('content', flat=True).first()
+    tags = ','.join(prompt.tags.values_list('name', flat=True))
+    get_search_backend().index(
+        prompt.pk, prompt.title, prompt.description, tags, content or ''
+    )
+
+
+class _Reindex:
+    """事务提交后刷新单个提示词索引的回调，按 prompt_id 在同一事务内去重。"""
+
+    def __init__(self, prompt_id):
+        self.prompt_id = prompt_id
+        self.done = False
+
+    def __call__(self):
+        from .models import MarketPrompt
+
+        self.done = True
+
+        # 提交前已被删除时跳过
+        prompt = MarketPrompt.objects.filter(pk=self.prompt_id).first()
+        if prompt is not None:
+            with transaction.atomic():
+                index_prompt(prompt)
+
+
+def schedule_index(prompt_id):
+    """
+    在当前事务提交后刷新提示词的索引，不在事务中时立即刷新。
+    同一事务中已登记过的提示词不再重复登记；登记所在的保存点回滚时，Django 会一并移除该回调，
+    之后的保存会重新登记。
+    """
+    pending = connection.run_on_commit if connection.in_atomic_block else ()
+    for _, func, *_ in pending:
+        if isinstance(func, _Reindex) and func.prompt_id == prompt_id and not func.done:
+            return
+    transaction.on_commit(_Reindex(prompt_id))
+
+
+def remove_prompt(prompt_id):
+    get_search_backend().remove(prompt_id)
@@ -1,18 +1,33 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import MarketPrompt, PromptVersion, Interaction, Comment
+from .models import MarketPrompt, PromptVersion, Interaction, Comment, parse_tag_names
+from . import versioning
+
+class TagNamesField(serializers.Field):
+    """
+    以逗号分隔字符串读写标签，兼容客户端原有格式；写入时也接受字符串列表。
+    读取依赖视图中的 prefetch_related('tags')。
+    """
+    def to_representation(self, value):
+        return ','.join(tag.name for tag in value.all())
+
+    def to_internal_value(self, data):
+        if not isinstance(data, (str, list)):
+            raise serializers.ValidationError("标签必须是逗号分隔的字符串或字符串列表")
+        return parse_tag_names(data)
 
 class PromptVersionSerializer(serializers.ModelSerializer):
+    """差量存储的版本需先经 versioning.materialize 还原 content。"""
     class Meta:
         model = PromptVersion
         fields = ('version', 'content', 'changelog', 'created_at')
 
 class MarketPromptSerializer(serializers.ModelSerializer):
     owner_name = serializers.ReadOnlyField(source='owner.username')
-    versions = PromptVersionSerializer(many=True, read_only=True)
+    versions = serializers.SerializerMethodField()
     content = serializers.CharField(write_only=True)
     latest_content = serializers.SerializerMethodField()
-    like_count = serializers.SerializerMethodField()
-    dislike_count = serializers.SerializerMethodField()
+    tags = TagNamesField(required=False)
 
     class Meta:
         model = MarketPrompt
@@ -22,18 +37,20 @@ class MarketPromptSerializer(serializers.ModelSerializer):
             'versions', 'content', 'latest_content', 'like_count', 'dislike_count',
             'created_at', 'updated_at'
         )
-        read_only_fields = ('uuid', 'owner_name', 'latest_version', 'created_at', 'updated_at')
+        read_only_fields = (
+            'uuid', 'owner_name', 'latest_version', 'like_count', 'dislike_count',
+            'created_at', 'updated_at'
+        )
+
+    def get_versions(self, obj):
+        versions = versioning.materialize(obj.pk, obj.versions.all())
+        return PromptVersionSerializer(versions, many=True).data
 
     def get_latest_content(self, obj):
         latest = obj.versions.first()
         return latest.content if latest else ""
 
-    def get_like_count(self, obj):
-        return obj.interactions.filter(type='like').count()
-
-    def get_dislike_count(self, obj):
-        return obj.interactions.filter(type='dislike').count()
-
+    @transaction.atomic
     def create(self, validated_data):
         content = validated_data.pop('content')
         owner = validated_data.get('owner')
@@ -45,49 +62,60 @@ class MarketPromptSerializer(serializers.ModelSerializer):
             if existing_prompt:
                 return self.update(existing_prompt, {'content': content, **validated_data})
 
+        tag_names = validated_data.pop('tags', None)
         prompt = MarketPrompt.objects.create(**validated_data)
-        PromptVersion.objects.create(
-            prompt=prompt,
-            version=1,
-            content=content
-        )
+        if tag_names:
+            prompt.set_tag_names(tag_names)
+        versioning.create_version(prompt, 1, content)
         return prompt
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         content = validated_data.pop('content', None)
         instance.title = validated_data.get('title', instance.title)
         instance.description = validated_data.get('description', instance.description)
         instance.visibility = validated_data.get('visibility', instance.visibility)
-        instance.tags = validated_data.get('tags', instance.tags)
+        if 'tags' in validated_data:
+            instance.set_tag_names(validated_data['tags'])
         instance.save()
 
         if content:
             # 创建新版本
             new_version_num = instance.latest_version + 1
-            PromptVersion.objects.create(
-                prompt=instance,
-                version=new_version_num,
-                content=content
-            )
+            versioning.create_version(instance, new_version_num, content)
             instance.latest_version = new_version_num
             instance.save()
         
         return instance
 
+class MarketPromptListSerializer(serializers.ModelSerializer):
+    """
+    市场列表使用的精简表示：不嵌套版本历史，内容仅保留截断后的摘要。
+    依赖视图中 select_related('owner')、prefetch_related('tags') 与 content_snippet 注解，
+    逐行不再产生额外查询。
+    """
+    owner_name = serializers.ReadOnlyField(source='owner.username')
+    content_snippet = serializers.CharField(read_only=True, default='')
+    tags = TagNamesField(read_only=True)
+
+    class Meta:
+        model = MarketPrompt
+        fields = (
+            'uuid', 'title', 'description', 'owner_name', 'tags',
+            'latest_version', 'content_snippet', 'like_count', 'dislike_count',
+            'updated_at'
+        )
+        read_only_fields = fields
+
 class CommentSerializer(serializers.ModelSerializer):
     user_name = serializers.ReadOnlyField(source='user.username')
-    replies = serializers.SerializerMethodField()
+    reply_count = serializers.IntegerField(read_only=True, default=0)
 
     class Meta:
         model = Comment
-        fields = ('id', 'prompt', 'user_name', 'content', 'parent', 'replies', 'created_at')
+        fields = ('id', 'prompt', 'user_name', 'content', 'parent', 'reply_count', 'created_at')
         read_only_fields = ('id', 'user_name', 'created_at')
 
-    def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True).data
-        return []
-
 class InteractionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Interaction
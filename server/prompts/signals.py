@@ -0,0 +1,33 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from prompt_studio_be import tasks
+from . import search
+from .fanout import notify_subscribers
+from .cache import invalidate_market_lists
+from .models import MarketPrompt, PromptVersion
+
+
+@receiver(post_save, sender=MarketPrompt)
+def index_market_prompt(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.schedule_index(instance.pk)
+        invalidate_market_lists()
+
+
+@receiver(post_save, sender=PromptVersion)
+def index_prompt_version(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        search.schedule_index(instance.prompt_id)
+        invalidate_market_lists()
+        if created and instance.version > 1:
+            transaction.on_commit(partial(tasks.enqueue, notify_subscribers, instance.prompt_id, instance.version))
+
+
+@receiver(post_delete, sender=MarketPrompt)
+def remove_market_prompt(sender, instance, **kwargs):
+    search.remove_prompt(instance.pk)
+    invalidate_market_lists()
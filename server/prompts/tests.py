@@ -0,0 +1,951 @@
+"""
+提示词市场（prompts 应用）的测试：接口查询数预算、全文检索、标签、版本存储、响应缓存、
+互动通知聚合、订阅通知扇出、评论树、媒体与备份接口、迁移与原子写入。
+
+*QueryBudgetTests 是查询数预算测试：每个用例在不同数据量下请求同一接口，并断言查询数恒定；
+一旦某处引入按行查询（N+1），对应用例就会失败。调整预算时请确认新增的查询与数据量无关。
+接口用例共用 MarketTestCase 提供的登录用户与 make_prompts 数据，QueryBudgetTestCase 在其上只增加 assertBudget。
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from prompt_studio_be.atomic_file import atomic_write_json
+from users.models import Notification, User
+from .backup_store import BackupStore
+from . import versioning
+from .coalesce import notify_like
+from .comment_tree import build_comment_tree
+from .fanout import notify_subscribers
+from .search import FallbackSearchBackend
+from .uploads import staging_dir, sweep_staging
+from .models import MarketPrompt, PromptVersion, PromptSubscription, Interaction, Comment
+
+DATA_SIZES = (1, 10)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], TASKS_EAGER=True)
+class MarketTestCase(TestCase):
+    """以提示词作者身份登录的 API 客户端，以及批量创建市场数据的 make_prompts。"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='owner', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.created = 0
+
+    def make_prompts(self, count):
+        """创建 count 条公开提示词，每条带多个版本、标签、评论与互动；执行提交回调以写入检索索引。"""
+        prompts = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                self.created += 1
+                voter = User.objects.create_user(username=f'voter{self.created}', password='pass')
+                prompt = MarketPrompt.objects.create(
+                    title=f'prompt {self.created}', description='market prompt', owner=self.user
+                )
+                prompt.set_tag_names(['common', f'tag{self.created}'])
+                for version in (1, 2, 3):
+                    PromptVersion.objects.create(prompt=prompt, version=version, content=f'content v{version}')
+                Interaction.objects.create(user=voter, prompt=prompt, type='like')
+                prompt.latest_version = 3
+                prompt.like_count = 1
+                prompt.save()
+                root = Comment.objects.create(user=voter, prompt=prompt, content='root')
+                Comment.objects.create(user=self.user, prompt=prompt, content='reply', parent=root)
+                prompts.append(prompt)
+        return prompts
+
+
+class QueryBudgetTestCase(MarketTestCase):
+    def assertBudget(self, budget, method, url, data=None):
+        """对每个数据量分别请求一次（不命中响应缓存），查询数都应等于 budget。"""
+        for size in DATA_SIZES:
+            self.make_prompts(size)
+            cache.clear()
+            with self.subTest(size=size), self.assertNumQueries(budget):
+                response = getattr(self.client, method)(url, data, format='json')
+            self.assertLess(response.status_code, 400, response.content)
+
+
+class MarketPromptQueryBudgetTests(QueryBudgetTestCase):
+    def test_list(self):
+        self.assertBudget(2, 'get', '/api/market/prompts/')
+
+    def test_list_search(self):
+        self.assertBudget(2, 'get', '/api/market/prompts/?search=prompt')
+
+    def test_list_tag_filter(self):
+        self.assertBudget(2, 'get', '/api/market/prompts/?tags=common,tag1&tag_mode=or')
+
+    def test_search(self):
+        # 含一条判断是否为常用词的计数查询
+        self.assertBudget(4, 'get', '/api/market/prompts/search/?q=market')
+
+    def test_tag_facets(self):
+        self.assertBudget(1, 'get', '/api/market/prompts/tag_facets/')
+
+    def test_retrieve(self):
+        prompt = self.make_prompts(1)[0]
+        self.assertBudget(4, 'get', f'/api/market/prompts/{prompt.uuid}/')
+
+    def test_versions(self):
+        prompt = self.make_prompts(1)[0]
+        self.assertBudget(2, 'get', f'/api/market/prompts/{prompt.uuid}/versions/')
+
+    def test_comment_tree(self):
+        prompt = self.make_prompts(1)[0]
+        for _ in range(10):
+            Comment.objects.create(user=self.user, prompt=prompt, content='more')
+        self.assertBudget(3, 'get', f'/api/market/prompts/{prompt.uuid}/comments/')
+
+    def test_latest_versions(self):
+        prompts = self.make_prompts(3)
+        other = User.objects.create_user(username='other', password='pass')
+        private = MarketPrompt.objects.create(title='secret', owner=other, visibility='private')
+        unknown = '00000000-0000-4000-8000-000000000000'
+        body = {str(prompt.uuid): 2 for prompt in prompts}
+        body.update({str(private.uuid): 1, unknown: 1, str(prompts[0].uuid): 3})
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/market/prompts/latest/', {'prompts': body}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(sorted(response.data['missing']), sorted([str(private.uuid), unknown]))
+        self.assertEqual(
+            [response.data['results'][str(p.uuid)]['has_update'] for p in prompts], [False, True, True]
+        )
+
+        response = APIClient().post('/api/market/prompts/latest/', {'prompts': [str(prompts[1].uuid)]}, format='json')
+        self.assertEqual(response.data['results'][str(prompts[1].uuid)]['latest_version'], 3)
+        self.assertNotIn('has_update', response.data['results'][str(prompts[1].uuid)])
+        self.assertEqual(self.client.post('/api/market/prompts/latest/', {'prompts': ['x']}, format='json').status_code, 400)
+
+    def test_create(self):
+        # 含提交后刷新一次检索索引（读取提示词、标签、最新内容，写入索引）
+        with self.assertNumQueries(22), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/market/prompts/', {
+                'title': 'new', 'content': 'hello', 'tags': 'a,b,c,d,e'
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_update_publishes_version(self):
+        prompt = self.make_prompts(1)[0]
+        # 含读取上一版本全文以改写为差量的 1 次查询（差量更短时再加 1 次更新）；
+        # 元数据与版本多次保存，提交后只刷新一次检索索引，另有订阅扇出的 2 次查询
+        with self.assertNumQueries(27), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f'/api/market/prompts/{prompt.uuid}/', {
+                'title': prompt.title, 'content': 'v4', 'tags': 'x,y,z'
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+class MarketSearchTests(MarketTestCase):
+    def publish(self, title, description='', content='body', **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/market/prompts/', {
+                'title': title, 'description': description, 'content': content, **extra
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data['uuid']
+
+    def search(self, query):
+        return self.client.get('/api/market/prompts/search/', {'q': query}).data['results']
+
+    def test_ranking_and_visibility(self):
+        self.publish('misc', content='kubernetes appears only in the body')
+        self.publish('kubernetes deploy')
+        self.publish('other', description='a kubernetes helper')
+        self.publish('kubernetes secret', visibility='private')
+        results = self.search('kubernetes')
+        self.assertEqual([r['title'] for r in results], ['kubernetes deploy', 'other', 'misc'])
+        self.assertEqual([r['rank'] for r in results], sorted([r['rank'] for r in results], reverse=True))
+
+    def test_common_terms_return_newest_hits(self):
+        self.publish('kubernetes deploy')
+        self.publish('misc', content='kubernetes appears only in the body')
+        self.publish('rare', content='kubernetes zyxwv')
+        with override_settings(SEARCH_RANK_CANDIDATES=2):
+            results = self.search('kubernetes')
+            self.assertEqual([r['title'] for r in results], ['rare', 'misc', 'kubernetes deploy'])
+            self.assertEqual({r['rank'] for r in results}, {0.0})
+            self.assertIn('<mark>kubernetes</mark>', results[0]['content_snippet'])
+            # 所有词都不常见时仍按相关度排序
+            self.assertEqual([r['title'] for r in self.search('zyxwv')], ['rare'])
+            self.assertGreater(self.search('zyxwv')[0]['rank'], 0)
+
+    def test_highlight_and_snippet(self):
+        self.publish('Rewrite emails', content='Please rewrite this email politely. ' * 10)
+        hit = self.search('rewrite')[0]
+        self.assertEqual(hit['title_highlight'], '<mark>Rewrite</mark> emails')
+        self.assertIn('<mark>rewrite</mark> this email', hit['content_snippet'])
+        self.assertLess(len(hit['content_snippet']), 200)
+
+    def test_highlight_escapes_markup(self):
+        self.publish('<img src=x onerror=alert(1)> helper 助手', description='<b>desc</b> helper 助手')
+        escaped = '&lt;img src=x onerror=alert(1)&gt; <mark>helper</mark> 助手'
+        hit = self.search('helper')[0]
+        self.assertEqual(hit['title_highlight'], escaped)
+        self.assertNotIn('<b>', hit['content_snippet'])
+        # 不足 3 个字符的词走 Python 高亮路径
+        hit = self.search('助手')[0]
+        self.assertEqual(hit['title_highlight'], '&lt;img src=x onerror=alert(1)&gt; helper <mark>助手</mark>')
+        self.assertIn('&lt;/b&gt; helper <mark>助手</mark>', hit['content_snippet'])
+        # 没有全文索引的数据库
+        hit = FallbackSearchBackend().search('helper', 10)[0]
+        self.assertEqual(hit['title_highlight'], escaped)
+        self.assertIn('&lt;b&gt;', hit['snippet'])
+
+    def test_index_follows_updates_and_deletes(self):
+        uuid = self.publish('translate poems')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/api/market/prompts/{uuid}/', {
+                'title': 'summarize reports', 'content': 'v2', 'tags': 'weekly'
+            }, format='json')
+        self.assertEqual(self.search('translate'), [])
+        self.assertEqual([r['uuid'] for r in self.search('weekly')], [uuid])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/market/prompts/{uuid}/')
+        self.assertEqual(self.search('summarize'), [])
+
+    def test_rebuild_search_index(self):
+        uuid = self.publish('regex cookbook')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM prompts_search_fts')
+        self.assertEqual(self.search('regex'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual([r['uuid'] for r in self.search('regex')], [uuid])
+
+    def test_icontains_fallback(self):
+        self.publish('Docker tips', tags='devops')
+        self.publish('Python tips', description='docker compose')
+        self.publish('Hidden docker', visibility='private')
+        backend = FallbackSearchBackend()
+        titles = backend.filter(MarketPrompt.objects.all(), 'DOCKER tips').values_list('title', flat=True)
+        self.assertEqual(sorted(titles), ['Docker tips', 'Python tips'])
+        self.assertEqual(list(backend.filter(MarketPrompt.objects.all(), 'devops').values_list('title', flat=True)),
+                         ['Docker tips'])
+        hits = backend.search('docker', 10)
+        self.assertEqual(len(hits), 2)
+        self.assertIn('<mark>docker</mark>', ''.join(hit['snippet'] for hit in hits))
+
+
+class MarketTagTests(MarketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.prompts = {}
+        for title, tags in (('a', 'python,sql'), ('b', 'python'), ('c', 'sql, pythonic'), ('d', 'rust')):
+            prompt = MarketPrompt.objects.create(title=title, owner=self.user)
+            prompt.set_tag_names(tags)
+            self.prompts[title] = prompt
+        hidden = MarketPrompt.objects.create(title='hidden', owner=self.user, visibility='private')
+        hidden.set_tag_names('python,sql')
+
+    def titles(self, **params):
+        response = self.client.get('/api/market/prompts/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(item['title'] for item in response.data['results'])
+
+    def test_and_or_exact_match(self):
+        self.assertEqual(self.titles(tags='python'), ['a', 'b'])
+        self.assertEqual(self.titles(tags='python, sql'), ['a'])
+        self.assertEqual(self.titles(tags='python,sql', tag_mode='and'), ['a'])
+        self.assertEqual(self.titles(tags='python,sql', tag_mode='or'), ['a', 'b', 'c'])
+        self.assertEqual(self.titles(tags='pyth'), [])
+        self.assertEqual(self.titles(tags='python,missing'), [])
+
+    def test_invalid_tag_mode(self):
+        response = self.client.get('/api/market/prompts/', {'tags': 'python', 'tag_mode': 'xor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/market/prompts/tag_facets/', {'tags': 'python', 'tag_mode': ''}).status_code, 400
+        )
+
+    def test_tag_facets(self):
+        facets = self.client.get('/api/market/prompts/tag_facets/').data['results']
+        self.assertEqual(facets, [
+            {'name': 'python', 'count': 2}, {'name': 'sql', 'count': 2},
+            {'name': 'pythonic', 'count': 1}, {'name': 'rust', 'count': 1},
+        ])
+        facets = self.client.get('/api/market/prompts/tag_facets/', {'tags': 'sql'}).data['results']
+        self.assertEqual(facets, [
+            {'name': 'sql', 'count': 2}, {'name': 'python', 'count': 1}, {'name': 'pythonic', 'count': 1},
+        ])
+        facets = self.client.get('/api/market/prompts/tag_facets/', {'limit': 1}).data['results']
+        self.assertEqual(facets, [{'name': 'python', 'count': 2}])
+
+
+class TagMigrationTests(TransactionTestCase):
+    """0005 把逗号分隔的 tags 列拆分为 Tag / PromptTag，回滚时再拼接回去。"""
+    before = [('prompts', '0004_search_index')]
+    after = [('prompts', '0005_tag_prompttag')]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self, targets):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(targets)
+        return self.executor.loader.project_state(targets).apps
+
+    def test_split_and_join(self):
+        apps = self.executor.loader.project_state(self.before).apps
+        owner = apps.get_model('users', 'User').objects.create(username='legacy')
+        MarketPrompt = apps.get_model('prompts', 'MarketPrompt')
+        MarketPrompt.objects.create(title='a', owner_id=owner.pk, tags='python, sql,,python ,' + 'x' * 60)
+        MarketPrompt.objects.create(title='b', owner_id=owner.pk, tags='sql')
+        MarketPrompt.objects.create(title='c', owner_id=owner.pk, tags='')
+
+        apps = self.migrate(self.after)
+        PromptTag = apps.get_model('prompts', 'PromptTag')
+        pairs = sorted(PromptTag.objects.values_list('prompt__title', 'tag__name'))
+        self.assertEqual(pairs, [('a', 'python'), ('a', 'sql'), ('a', 'x' * 50), ('b', 'sql')])
+        self.assertEqual(apps.get_model('prompts', 'Tag').objects.count(), 3)
+
+        apps = self.migrate(self.before)
+        legacy = dict(apps.get_model('prompts', 'MarketPrompt').objects.values_list('title', 'tags'))
+        self.assertEqual(legacy, {'a': 'python,sql,' + 'x' * 50, 'b': 'sql', 'c': ''})
+
+
+class VersionStorageTests(MarketTestCase):
+    VERSIONS = 45
+
+    def publish_versions(self):
+        prompt = MarketPrompt.objects.create(title='long', owner=self.user)
+        lines = [f'第 {i} 行：请用简洁的中文回答用户的问题。\n' for i in range(30)]
+        texts = {}
+        for version in range(1, self.VERSIONS + 1):
+            lines[version % len(lines)] = f'第 {version} 版修改的行\n'
+            texts[version] = ''.join(lines)
+            versioning.create_version(prompt, version, texts[version])
+        prompt.latest_version = self.VERSIONS
+        prompt.save()
+        versioning.cache.clear()
+        return prompt, texts
+
+    def test_keyframes_and_reconstruction(self):
+        prompt, texts = self.publish_versions()
+        full = set(PromptVersion.objects.filter(prompt=prompt, storage='full').values_list('version', flat=True))
+        self.assertEqual(full, {20, 40, self.VERSIONS})
+        self.assertEqual(PromptVersion.objects.filter(prompt=prompt, storage='delta', content='').count(), 42)
+
+        # 全部版本一次读出即可还原，不再补查
+        versions = list(prompt.versions.all())
+        with self.assertNumQueries(0):
+            versioning.materialize(prompt.pk, versions)
+        self.assertEqual({v.version: v.content for v in versions}, texts)
+
+        versioning.cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(versioning.get_contents(prompt.pk, [3])[3], texts[3])
+        with self.assertNumQueries(0):
+            self.assertEqual(versioning.get_contents(prompt.pk, [3]), {3: texts[3]})
+
+        response = self.client.get(f'/api/market/prompts/{prompt.uuid}/versions/')
+        self.assertEqual({item['version']: item['content'] for item in response.data}, texts)
+
+    def test_diff(self):
+        prompt, texts = self.publish_versions()
+        url = f'/api/market/prompts/{prompt.uuid}/diff/'
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'from': 2, 'to': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['insertions'], response.data['deletions']), (3, 3))
+        self.assertIn(['+', '第 3 版修改的行\n第 4 版修改的行\n第 5 版修改的行\n'], response.data['ops'])
+
+        response = self.client.get(url, {'from': 2, 'to': 3, 'mode': 'word'})
+        self.assertEqual(response.data['ops'], [
+            [' ', 46], ['+', '版修改的'], [' ', 1], ['-', '：请用简洁的中文回答用户的问题。'], [' ', 593]
+        ])
+
+        self.assertEqual(self.client.get(url, {'from': 44}).data['to'], self.VERSIONS)
+        self.assertEqual(self.client.get(url, {'from': 99}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'from': 'x'}).status_code, 400)
+
+
+class MarketCacheTests(MarketTestCase):
+    def test_detail_conditional_get(self):
+        prompt = self.make_prompts(1)[0]
+        url = f'/api/market/prompts/{prompt.uuid}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response['ETag'], etag)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_etag_changes_with_counters_and_versions(self):
+        prompt = self.make_prompts(1)[0]
+        url = f'/api/market/prompts/{prompt.uuid}/'
+        first = self.client.get(url)['ETag']
+        self.client.post('/api/market/interact/', {'prompt': str(prompt.uuid), 'type': 'like'}, format='json')
+        second = self.client.get(url)
+        self.assertNotEqual(second['ETag'], first)
+        self.assertEqual(second.data['like_count'], 2)
+        self.client.put(url, {'title': prompt.title, 'content': 'v4'}, format='json')
+        third = self.client.get(url)
+        self.assertNotIn(third['ETag'], (first, second['ETag']))
+        self.assertEqual(third.data['latest_version'], 4)
+
+    def test_list_invalidated_after_commit(self):
+        prompt = self.make_prompts(1)[0]
+        url = '/api/market/prompts/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/market/interact/', {'prompt': str(prompt.uuid), 'type': 'like'}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['like_count'], 2)
+
+
+class InteractionQueryBudgetTests(QueryBudgetTestCase):
+    def test_like_flip_cancel(self):
+        prompt = self.make_prompts(1)[0]
+        url = '/api/market/interact/'
+        with self.assertNumQueries(8):
+            self.client.post(url, {'prompt': str(prompt.uuid), 'type': 'like'}, format='json')
+        with self.assertNumQueries(6):
+            self.client.post(url, {'prompt': str(prompt.uuid), 'type': 'dislike'}, format='json')
+        with self.assertNumQueries(6):
+            self.client.post(url, {'prompt': str(prompt.uuid), 'type': None}, format='json')
+        prompt.refresh_from_db()
+        self.assertEqual((prompt.like_count, prompt.dislike_count), (1, 0))
+
+    def test_rebuild_interaction_counts(self):
+        prompts = self.make_prompts(2)
+        Interaction.objects.create(user=self.user, prompt=prompts[1], type='dislike')
+        MarketPrompt.objects.filter(pk=prompts[0].pk).update(like_count=7, dislike_count=3)
+        MarketPrompt.objects.filter(pk=prompts[1].pk).update(like_count=0, dislike_count=0)
+        out = io.StringIO()
+        call_command('rebuild_interaction_counts', stdout=out)
+        self.assertIn('其中 2 条存在漂移', out.getvalue())
+        for prompt in prompts:
+            prompt.refresh_from_db()
+        self.assertEqual([(p.like_count, p.dislike_count) for p in prompts], [(1, 0), (1, 1)])
+
+
+class InteractionNotificationTests(MarketTestCase):
+    def like_from(self, prompt, voters):
+        for voter in voters:
+            self.client.force_authenticate(voter)
+            self.client.post('/api/market/interact/', {'prompt': str(prompt.uuid), 'type': 'like'}, format='json')
+        self.client.force_authenticate(self.user)
+
+    def test_likes_coalesce_into_one_notification(self):
+        prompt = self.make_prompts(1)[0]
+        voters = User.objects.bulk_create([User(username=f'fan{i}') for i in range(12)])
+        self.like_from(prompt, voters[:1])
+        # 点赞本身 8 次查询，统计点赞人数与聚合 upsert 多 2 次
+        self.client.force_authenticate(voters[1])
+        with self.assertNumQueries(10):
+            self.client.post('/api/market/interact/', {'prompt': str(prompt.uuid), 'type': 'like'}, format='json')
+        self.like_from(prompt, voters[2:])
+
+        # make_prompts 中已有一个本时间窗内的赞
+        notification = Notification.objects.get(user=self.user)
+        self.assertEqual((notification.category, notification.count), ('interaction', 13))
+        self.assertEqual(notification.title, f'「{prompt.title}」收到了 13 个赞')
+        self.assertIn('最近有 13 人', notification.message)
+        self.assertEqual(self.client.get('/api/auth/notifications/').data['results'][0]['count'], 13)
+
+    def test_toggling_counts_distinct_likers(self):
+        prompt = self.make_prompts(1)[0]
+        Interaction.objects.filter(prompt=prompt).delete()
+        fan, other = User.objects.bulk_create([User(username='fan'), User(username='other')])
+        self.client.force_authenticate(fan)
+        for interaction_type in ('like', None, 'like', 'dislike', 'like', None, 'like'):
+            self.client.post('/api/market/interact/', {'prompt': str(prompt.uuid), 'type': interaction_type},
+                             format='json')
+        self.like_from(prompt, [other])
+        notification = Notification.objects.get(user=self.user)
+        self.assertEqual(notification.count, 2)
+        self.assertEqual(notification.title, f'「{prompt.title}」收到了 2 个赞')
+
+    def test_switching_type_keeps_created_at(self):
+        prompt = self.make_prompts(1)[0]
+        fan = User.objects.create(username='fan')
+        earlier = timezone.now() - timedelta(days=1)
+        self.client.force_authenticate(fan)
+        self.client.post('/api/market/interact/', {'prompt': str(prompt.uuid), 'type': 'dislike'}, format='json')
+        Interaction.objects.filter(user=fan).update(created_at=earlier, voted_at=earlier)
+        self.client.post('/api/market/interact/', {'prompt': str(prompt.uuid), 'type': 'like'}, format='json')
+        interaction = Interaction.objects.get(user=fan)
+        self.assertEqual((interaction.type, interaction.created_at), ('like', earlier))
+        self.assertGreater(interaction.voted_at, earlier)
+
+    def test_new_window_and_fallback_path(self):
+        prompt = self.make_prompts(1)[0]
+        fans = User.objects.bulk_create([User(username=f'fan{i}') for i in range(3)])
+        now = timezone.now()
+        notify_like(prompt, now=now)
+        Notification.objects.update(is_read=True)
+        Interaction.objects.create(user=fans[0], prompt=prompt, type='like')
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            notification = notify_like(prompt, now=now)
+            self.assertEqual((notification.count, notification.is_read), (2, False))
+            later = now + timedelta(seconds=3600)
+            for fan in fans[1:]:
+                Interaction.objects.create(user=fan, prompt=prompt, type='like')
+                Interaction.objects.filter(user=fan).update(voted_at=later)
+                notify_like(prompt, now=later)
+        self.assertEqual(
+            list(Notification.objects.order_by('window_start').values_list('count', flat=True)), [2, 2]
+        )
+
+    def test_coalesced_notification_moves_to_first_page(self):
+        """聚合通知被再次点赞时移到列表顶部：翻页中不重复出现，重新加载第一页可见。"""
+        prompt = self.make_prompts(1)[0]
+        fans = User.objects.bulk_create([User(username=f'fan{i}') for i in range(2)])
+        self.like_from(prompt, fans[:1])
+        Notification.objects.bulk_create([
+            Notification(user=self.user, category='comment', title=f'n{i}', message='') for i in range(4)
+        ])
+        url = '/api/auth/notifications/'
+        with override_settings(API_PAGE_SIZE=2):
+            first = self.client.get(url).data
+            self.assertNotIn('interaction', [n['category'] for n in first['results']])
+            self.like_from(prompt, fans[1:])
+            seen = [n['id'] for n in first['results']]
+            next_url = first['next']
+            while next_url:
+                page = self.client.get(next_url).data
+                seen += [n['id'] for n in page['results']]
+                next_url = page['next']
+            self.assertEqual(len(seen), len(set(seen)))
+            self.assertEqual(self.client.get(url).data['results'][0]['count'], 3)
+
+
+class SubscriptionFanoutTests(MarketTestCase):
+    def test_subscribe_and_unsubscribe(self):
+        prompt = self.make_prompts(1)[0]
+        url = f'/api/market/prompts/{prompt.uuid}/subscribe/'
+        self.assertEqual(self.client.post(url).data['version'], 3)
+        self.assertTrue(PromptSubscription.objects.filter(user=self.user, prompt=prompt).exists())
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(PromptSubscription.objects.exists())
+
+    def test_new_version_notifies_subscribers_after_commit(self):
+        prompt = self.make_prompts(1)[0]
+        subscribers = User.objects.bulk_create([User(username=f'sub{i}') for i in range(30)])
+        PromptSubscription.objects.bulk_create(
+            [PromptSubscription(user=user, prompt=prompt) for user in subscribers + [self.user]]
+        )
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.put(f'/api/market/prompts/{prompt.uuid}/', {
+                'title': prompt.title, 'content': 'v4'
+            }, format='json')
+        # 扇出在提交后执行，请求本身不写通知
+        self.assertFalse(Notification.objects.exists())
+        for callback in callbacks:
+            callback()
+        notifications = Notification.objects.filter(category='update')
+        self.assertEqual(notifications.count(), 30)
+        self.assertFalse(notifications.filter(user=self.user).exists())
+        self.assertIn('v4', notifications.first().message)
+
+    def test_fanout_batches(self):
+        prompt = self.make_prompts(1)[0]
+        subscribers = User.objects.bulk_create([User(username=f'sub{i}') for i in range(25)])
+        PromptSubscription.objects.bulk_create([PromptSubscription(user=u, prompt=prompt) for u in subscribers])
+        # 1 次读取提示词 + 每批 1 次读取订阅者与 1 次写入 + 最后 1 次空批读取
+        with self.assertNumQueries(1 + 3 * 2 + 1):
+            self.assertEqual(notify_subscribers(prompt.pk, 4, batch_size=10), 25)
+
+class CommentQueryBudgetTests(QueryBudgetTestCase):
+    def test_list(self):
+        self.assertBudget(1, 'get', '/api/market/comments/')
+
+    def test_create(self):
+        prompt = self.make_prompts(1)[0]
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/market/comments/', {
+                'prompt': str(prompt.uuid), 'content': 'hi'
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+
+class CommentTreeTests(MarketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.prompt = MarketPrompt.objects.create(title='thread', owner=self.user)
+
+    def comment(self, parent=None):
+        return Comment.objects.create(user=self.user, prompt=self.prompt, content='c', parent_id=parent).pk
+
+    def test_depth_limit(self):
+        chain = [self.comment()]
+        for _ in range(4):
+            chain.append(self.comment(chain[-1]))
+        results, next_cursor = build_comment_tree(self.prompt, depth=2)
+        self.assertIsNone(next_cursor)
+        root = results[0]
+        self.assertEqual((root['id'], root['reply_count'], root['more_replies']), (chain[0], 1, None))
+        child = root['replies'][0]
+        self.assertEqual((child['id'], child['replies']), (chain[1], []))
+        self.assertEqual(child['more_replies'], {'parent': chain[1], 'after': None})
+        # 按游标继续展开
+        results, _ = build_comment_tree(self.prompt, parent_id=chain[1], depth=10)
+        self.assertEqual(results[0]['id'], chain[2])
+        self.assertEqual(results[0]['replies'][0]['replies'][0]['id'], chain[4])
+
+    def test_children_per_level_and_more_replies(self):
+        root = self.comment()
+        kids = [self.comment(root) for _ in range(5)]
+        results, _ = build_comment_tree(self.prompt, children=2)
+        node = results[0]
+        self.assertEqual([kid['id'] for kid in node['replies']], kids[:2])
+        self.assertEqual(node['reply_count'], 5)
+        self.assertEqual(node['more_replies'], {'parent': root, 'after': kids[1]})
+
+        more, next_cursor = build_comment_tree(self.prompt, parent_id=root, after=kids[1], limit=2)
+        self.assertEqual([kid['id'] for kid in more], kids[2:4])
+        self.assertEqual(next_cursor, {'parent': root, 'after': kids[3]})
+        more, next_cursor = build_comment_tree(self.prompt, parent_id=root, after=kids[3], limit=2)
+        self.assertEqual(([kid['id'] for kid in more], next_cursor), ([kids[4]], None))
+
+    def test_top_level_pagination(self):
+        roots = [self.comment() for _ in range(3)]
+        results, next_cursor = build_comment_tree(self.prompt, limit=2)
+        self.assertEqual([node['id'] for node in results], roots[:2])
+        self.assertEqual(next_cursor, {'parent': None, 'after': roots[1]})
+        results, next_cursor = build_comment_tree(self.prompt, after=roots[1], limit=2)
+        self.assertEqual(([node['id'] for node in results], next_cursor), ([roots[2]], None))
+
+    def test_global_cap(self):
+        first, second = self.comment(), self.comment()
+        self.comment(first)
+        for _ in range(3):
+            self.comment(second)
+        with mock.patch('prompts.comment_tree.MAX_VISIBLE_NODES', 4):
+            results, _ = build_comment_tree(self.prompt)
+        # 第一个根节点的 1 条回复放得下，第二个根节点的 3 条回复会超出上限，整层折叠为游标
+        self.assertEqual(len(results[0]['replies']), 1)
+        self.assertEqual(results[1]['replies'], [])
+        self.assertEqual(results[1]['more_replies'], {'parent': second, 'after': None})
+        self.assertEqual(results[1]['reply_count'], 3)
+
+    def test_endpoint(self):
+        root = self.comment()
+        kids = [self.comment(root) for _ in range(2)]
+        url = f'/api/market/prompts/{self.prompt.uuid}/comments/'
+        data = self.client.get(url, {'children': 1}).data
+        node = data['results'][0]
+        self.assertEqual((node['user_name'], node['content'], node['parent']), ('owner', 'c', None))
+        self.assertEqual(node['more_replies'], {'parent': root, 'after': kids[0]})
+        data = self.client.get(url, node['more_replies']).data
+        self.assertEqual([item['id'] for item in data['results']], kids[1:])
+        self.assertEqual(self.client.get(url, {'depth': 'x'}).status_code, 400)
+
+    def test_flat_list_prompt_filter(self):
+        self.comment()
+        other = MarketPrompt.objects.create(title='other', owner=self.user)
+        Comment.objects.create(user=self.user, prompt=other, content='elsewhere')
+        response = self.client.get('/api/market/comments/', {'prompt': str(self.prompt.uuid)})
+        self.assertEqual([item['content'] for item in response.data['results']], ['c'])
+        response = self.client.get('/api/market/comments/', {'prompt': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FileEndpointTests(MarketTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def test_media_upload(self):
+        with override_settings(MEDIA_ROOT=self.tmpdir), self.assertNumQueries(1):
+            response = self.client.post('/api/market/media/upload/', {
+                'file': SimpleUploadedFile('a.png', b'png-bytes')
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_media_upload_dedup(self):
+        with override_settings(MEDIA_ROOT=self.tmpdir):
+            hashes = [
+                self.client.post('/api/market/media/upload/', {
+                    'file': SimpleUploadedFile('a.png', b'same-bytes')
+                }, format='multipart').data['hash']
+                for _ in range(2)
+            ]
+        self.assertEqual(hashes[0], hashes[1])
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['.staging', f'{hashes[0]}.png'])
+        self.assertEqual(os.listdir(os.path.join(self.tmpdir, '.staging')), [])
+
+    def test_media_upload_failures_leave_no_staged_files(self):
+        staging = os.path.join(self.tmpdir, '.staging')
+        url = '/api/market/media/upload/'
+        with override_settings(MEDIA_ROOT=self.tmpdir):
+            response = self.client.post(url, {'other': SimpleUploadedFile('a.png', b'x')}, format='multipart')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(os.listdir(staging), [])
+
+            with mock.patch('prompts.views.register_media', side_effect=RuntimeError('db down')):
+                with self.assertRaises(RuntimeError):
+                    self.client.post(url, {'file': SimpleUploadedFile('a.png', b'y')}, format='multipart')
+            self.assertEqual(os.listdir(staging), [])
+
+            # 解析中途失败的文件不会进入 request.FILES
+            with mock.patch('prompts.uploads.HashingFileUploadHandler.file_complete', side_effect=OSError('reset')):
+                with self.assertRaises(OSError):
+                    self.client.post(url, {'file': SimpleUploadedFile('a.png', b'z')}, format='multipart')
+            self.assertEqual(os.listdir(staging), [])
+
+    def test_gc_media_staging(self):
+        with override_settings(MEDIA_ROOT=self.tmpdir):
+            staging = staging_dir()
+            for name in ('stale.upload', 'fresh.upload'):
+                with open(os.path.join(staging, name), 'wb') as f:
+                    f.write(b'partial')
+            old = time.time() - 2 * 24 * 3600
+            os.utime(os.path.join(staging, 'stale.upload'), (old, old))
+            out = io.StringIO()
+            call_command('gc_media_staging', stdout=out)
+            self.assertIn('已删除 1 个', out.getvalue())
+            self.assertEqual(os.listdir(staging), ['fresh.upload'])
+            self.assertEqual(sweep_staging(max_age=0), 1)
+
+    def test_media_check(self):
+        with override_settings(MEDIA_ROOT=self.tmpdir):
+            stored = self.client.post('/api/market/media/upload/', {
+                'file': SimpleUploadedFile('a.png', b'stored-bytes')
+            }, format='multipart').data['hash']
+            missing = 'f' * 64
+            for count in (2, 600):
+                files = [{'hash': stored, 'size': 12}, {'hash': missing, 'size': 1}]
+                files += [f'{i:064x}' for i in range(count - 2)]
+                with self.subTest(count=count), self.assertNumQueries(-(-count // 500)):
+                    response = self.client.post('/api/market/media/check/', {'files': files}, format='json')
+                self.assertEqual(list(response.data['existing']), [stored])
+                self.assertTrue(response.data['existing'][stored].endswith(f'{stored}.png'))
+                self.assertEqual(len(response.data['missing']), count - 1)
+
+            response = self.client.post('/api/market/media/check/', {
+                'files': [{'hash': stored, 'size': 13}]
+            }, format='json')
+            self.assertEqual(response.data['missing'], [stored])
+            response = self.client.post('/api/market/media/check/', {'files': ['xyz']}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_backup_roundtrip(self):
+        with override_settings(BASE_DIR=self.tmpdir), self.assertNumQueries(0):
+            self.client.post('/api/market/backup/', {'templates': []}, format='json')
+            response = self.client.get('/api/market/backup/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), {'templates': []})
+
+    def test_backup_incremental_sync(self):
+        def manifest(files):
+            return {path: {'hash': hashlib.sha256(data).hexdigest(), 'size': len(data)}
+                    for path, data in files.items()}
+
+        files = {'a.txt': b'alpha', 'b.txt': b'beta'}
+        with override_settings(BASE_DIR=self.tmpdir), self.assertNumQueries(0):
+            url = '/api/market/backup/manifest/'
+            missing = self.client.post(url, {'files': manifest(files)}, format='json').data['missing']
+            self.assertEqual(len(missing), 2)
+            self.assertEqual(self.client.put(url, {'files': manifest(files)}, format='json').status_code, 409)
+            self.client.post('/api/market/backup/objects/', {
+                hashlib.sha256(data).hexdigest(): SimpleUploadedFile(path, data) for path, data in files.items()
+            }, format='multipart')
+            self.assertEqual(self.client.put(url, {'files': manifest(files)}, format='json').status_code, 200)
+
+            files['b.txt'] = b'beta 2'
+            missing = self.client.post(url, {'files': manifest(files)}, format='json').data['missing']
+            self.assertEqual(missing, [hashlib.sha256(b'beta 2').hexdigest()])
+            response = self.client.post('/api/market/backup/objects/', {
+                missing[0]: SimpleUploadedFile('b.txt', b'tampered')
+            }, format='multipart')
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.get('/api/market/backup/files/', {'path': 'a.txt'})
+            self.assertEqual(b''.join(response.streaming_content), b'alpha')
+
+    def test_backup_snapshots_restore_and_gc(self):
+        url = '/api/market/backup/'
+        with override_settings(BASE_DIR=self.tmpdir, BACKUP_RETENTION={'last': 2}), self.assertNumQueries(0):
+            for version in (1, 2, 3):
+                self.client.post(url, {'templates': [version], 'banks': {}}, format='json')
+            snapshots = self.client.get(f'{url}snapshots/').data
+            self.assertEqual(len(snapshots), 2)
+            oldest = snapshots[-1]['id']
+            response = self.client.get(url, {'snapshot': oldest})
+            self.assertEqual(json.loads(b''.join(response.streaming_content))['templates'], [2])
+
+            response = self.client.post(f'{url}snapshots/{oldest}/')
+            self.assertEqual(response.status_code, 200, response.content)
+            response = self.client.get(url)
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), {'templates': [2], 'banks': {}})
+
+            store = BackupStore(self.user.id)
+            removed, _ = store.collect_garbage(grace_seconds=-1)
+            self.assertEqual(removed, 1)
+            self.assertEqual(sum(len(names) for _, _, names in os.walk(store.objects_dir)), 3)
+
+    def test_backup_streams_gzip(self):
+        data = {'templates': [{'name': '模板', 'content': 'x' * 10000}], 'banks': {'a': ['1', '2']}}
+        body = gzip.compress(json.dumps(data).encode('utf-8'))
+        with override_settings(BASE_DIR=self.tmpdir), self.assertNumQueries(0):
+            response = self.client.generic(
+                'POST', '/api/market/backup/', body,
+                content_type='application/json', HTTP_CONTENT_ENCODING='gzip'
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+            response = self.client.get('/api/market/backup/', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(json.loads(gzip.decompress(b''.join(response.streaming_content))), data)
+
+            for bad in (b'[1, 2]', b'{"a": 1', b''):
+                response = self.client.generic('POST', '/api/market/backup/', bad, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_backup_rejects_invalid_values(self):
+        url = '/api/market/backup/'
+        with override_settings(BASE_DIR=self.tmpdir):
+            self.client.post(url, {'templates': [1]}, format='json')
+            for bad in (b'{"a": tru}', b'{"a": 1 2}', b'{"a": [1,,2]}', b'{"a": [1,]}', b'{"a": {"x" 1}}',
+                        b'{"a": 01}', b'{"a": "\\q"}', b'{"a": "\\u12g4"}', b'{"a": [}', b'{"a": "\xff"}',
+                        b'{"ok": {"x": [true, null]}, "a": nul}'):
+                with self.subTest(bad=bad):
+                    response = self.client.generic('POST', url, bad, content_type='application/json')
+                    self.assertEqual(response.status_code, 400)
+            self.assertEqual(len(self.client.get(f'{url}snapshots/').data), 1)
+            response = self.client.get(url)
+            self.assertEqual(json.loads(b''.join(response.streaming_content)), {'templates': [1]})
+
+    def test_backup_reused_blob_survives_gc_until_commit(self):
+        url = '/api/market/backup/'
+        with override_settings(BASE_DIR=self.tmpdir, BACKUP_RETENTION={'last': 1}):
+            self.client.post(url, {'a': 1}, format='json')
+            self.client.post(url, {'b': 2}, format='json')
+            store = BackupStore(self.user.id)
+            # {'a': 1} 的 blob 已不被引用且早于宽限期，再次上传同一内容时复用它并刷新修改时间
+            path = store.object_path(hashlib.sha256(b'1').hexdigest())
+            old = time.time() - 2 * 3600
+            os.utime(path, (old, old))
+            response = self.client.post(url, {'a': 1}, format='json')
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertGreater(os.stat(path).st_mtime, old)
+
+            # 上传超过宽限期、复用的 blob 在提交前已被回收：返回 409 而不是“没有数据”
+            commit = BackupStore.commit
+
+            def collect_then_commit(store, files):
+                store.collect_garbage(grace_seconds=-1)
+                return commit(store, files)
+
+            self.client.post(url, {'c': 3}, format='json')
+            self.assertTrue(os.path.exists(path))
+            with mock.patch.object(BackupStore, 'commit', autospec=True, side_effect=collect_then_commit):
+                response = self.client.post(url, {'a': 1}, format='json')
+            self.assertEqual(response.status_code, 409, response.content)
+            self.assertEqual(response.data['missing'], [hashlib.sha256(b'1').hexdigest()])
+
+    def test_backup_rejects_gzip_bomb(self):
+        url = '/api/market/backup/'
+        body = gzip.compress(b'{"a": "' + b'0' * (4 * 1024 * 1024) + b'"}')
+        self.assertLess(len(body), 64 * 1024)
+        with override_settings(BASE_DIR=self.tmpdir, BACKUP_MAX_BYTES=1024 * 1024):
+            response = self.client.generic('POST', url, body, content_type='application/json',
+                                           HTTP_CONTENT_ENCODING='gzip')
+            self.assertEqual(response.status_code, 413)
+            response = self.client.generic('POST', url, gzip.decompress(body), content_type='application/json')
+            self.assertEqual(response.status_code, 413)
+            store = BackupStore(self.user.id)
+            self.assertIsNone(store.read_manifest())
+            # 中断的值不留下暂存文件
+            self.assertEqual([name for _, _, names in os.walk(store.root) for name in names], [])
+
+
+class AtomicWriteStressTests(SimpleTestCase):
+    """并发写入与读取同一文件，读者只能看到某次完整的写入。"""
+    WRITERS = 8
+    ROUNDS = 25
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def hammer(self, write, read):
+        errors = []
+        done = threading.Event()
+
+        def writer(n):
+            try:
+                for i in range(self.ROUNDS):
+                    write(n, i)
+            except Exception as e:
+                errors.append(e)
+
+        def reader():
+            while not done.is_set():
+                try:
+                    read()
+                except Exception as e:
+                    errors.append(e)
+
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(self.WRITERS)]
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_atomic_write_json(self):
+        path = os.path.join(self.tmpdir, 'config.json')
+        atomic_write_json(path, {'writer': -1, 'payload': []})
+
+        def read():
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.assertEqual(len(data['payload']), 1000 if data['writer'] >= 0 else 0)
+
+        self.hammer(lambda n, i: atomic_write_json(path, {'writer': n, 'payload': [i] * 1000}), read)
+        # 除跨进程锁文件外不留下临时文件
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ['.config.json.lock', 'config.json'])
+
+    def test_concurrent_backups(self):
+        with override_settings(BASE_DIR=self.tmpdir, BACKUP_RETENTION={'last': 3}):
+            store = BackupStore('stress')
+
+            def write(n, i):
+                body = json.dumps({'writer': n, 'templates': [i] * 500}).encode('utf-8')
+                store.save_json_stream([body[:100], body[100:]])
+
+            def read():
+                # 截断的 manifest.json 会在解析时抛出异常
+                store.read_manifest()
+
+            self.hammer(write, read)
+            manifest = store.read_manifest()
+            self.assertEqual(manifest['id'], store.snapshot_ids()[0])
+            self.assertEqual(len(store.snapshot_ids()), 3)
+            data = json.loads(b''.join(store.iter_json(manifest)))
+            self.assertEqual(len(data['templates']), 500)
@@ -0,0 +1,180 @@
+"""
+多媒体上传：边接收边计算 SHA-256 并写入暂存文件，完成后以原子操作发布为内容寻址文件。
+
+暂存目录位于 MEDIA_ROOT 下，保证与目标文件处于同一文件系统，链接/重命名为原子操作；
+并发上传同一内容时，只有一个请求会创建目标文件，其余请求丢弃各自的暂存文件。
+请求结束时（含解析失败、客户端中断）由 HashingFileUploadHandler.discard_staged 删除本次请求的暂存文件；
+进程崩溃遗留的暂存文件由 sweep_staging 按修改时间清理（上传时定期执行，也可运行 gc_media_staging）。
+发布后的文件登记在 MediaObject 表中，客户端可先批量查询哈希，只上传缺失的文件。
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+from .models import MediaObject
+
+STAGING_DIRNAME = '.staging'
+# 每条 IN 查询携带的哈希数，低于各数据库的参数上限
+LOOKUP_BATCH_SIZE = 500
+# 上传时顺带清理暂存目录的最短间隔（秒，按进程计）
+STAGING_SWEEP_INTERVAL = 3600
+
+_last_sweep = 0.0
+
+
+def staging_dir(root=None):
+    path = os.path.join(root or settings.MEDIA_ROOT, STAGING_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class HashedUploadedFile(UploadedFile):
+    """写入暂存文件的上传文件，file_complete 之后 sha256 为内容哈希。"""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None, staging_root=None):
+        file = tempfile.NamedTemporaryFile(suffix='.upload', dir=staging_dir(staging_root), delete=False)
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.hasher = hashlib.sha256()
+        self.sha256 = None
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def discard(self):
+        """关闭并删除暂存文件（已被发布或请求失败时调用）。"""
+        self.file.close()
+        try:
+            os.unlink(self.file.name)
+        except FileNotFoundError:
+            pass
+
+
+class HashingFileUploadHandler(FileUploadHandler):
+    """
+    替代 Django 默认的内存/临时文件上传处理器：单次遍历完成写盘与哈希，
+    任何大小的文件都不会整体驻留内存。staging_root 为暂存目录所在的根目录（默认 MEDIA_ROOT），
+    应与最终发布位置处于同一文件系统。
+    """
+    chunk_size = 1024 * 1024
+
+    def __init__(self, request=None, staging_root=None):
+        super().__init__(request)
+        self.staging_root = staging_root
+        # 本次请求创建的全部暂存文件，包括解析中途失败、未进入 request.FILES 的文件
+        self.staged = []
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = HashedUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra,
+            staging_root=self.staging_root,
+        )
+        self.staged.append(self.file)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file.write(raw_data)
+        self.file.hasher.update(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        # 发布前落盘，避免崩溃后内容寻址文件指向不完整的数据
+        os.fsync(self.file.fileno())
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.file.hasher.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.discard()
+
+    def discard_staged(self):
+        """删除本次请求的全部暂存文件；已发布的文件已不在暂存目录中，不受影响。"""
+        for staged in self.staged:
+            staged.discard()
+        self.staged.clear()
+
+
+def publish_staged_file(staged_path, target_path):
+    """
+    将暂存文件原子地发布到 target_path。目标已存在时（内容必然相同）保留原文件。
+    返回是否新建了目标文件。
+    """
+    try:
+        os.link(staged_path, target_path)
+        created = True
+    except FileExistsError:
+        created = False
+    except OSError:
+        # 不支持硬链接的文件系统：rename 同样是原子的，覆盖的也是相同内容
+        os.replace(staged_path, target_path)
+        return True
+    os.unlink(staged_path)
+    return created
+
+
+def sweep_staging(root=None, max_age=None):
+    """
+    删除暂存目录中修改时间早于 max_age 秒前的文件（默认 MEDIA_STAGING_MAX_AGE），返回删除的文件数。
+    进行中的上传会持续写入暂存文件，不会被误删。
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'MEDIA_STAGING_MAX_AGE', 24 * 3600)
+    cutoff = time.time() - max_age
+    removed = 0
+    with os.scandir(staging_dir(root)) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def maybe_sweep_staging(root=None):
+    """距上次清理超过 STAGING_SWEEP_INTERVAL 秒时清理暂存目录。"""
+    global _last_sweep
+    now = time.monotonic()
+    if _last_sweep and now - _last_sweep < STAGING_SWEEP_INTERVAL:
+        return
+    _last_sweep = now
+    sweep_staging(root)
+
+
+def register_media(sha256, size, filename):
+    """登记（或更新）媒体库记录，指向最近一次发布的文件名，单条 upsert 语句。"""
+    MediaObject.objects.bulk_create(
+        [MediaObject(sha256=sha256, size=size, filename=filename)],
+        update_conflicts=True,
+        unique_fields=['sha256'],
+        update_fields=['size', 'filename'],
+    )
+
+
+def find_stored_media(items):
+    """
+    items 为 (sha256, size) 序列，返回 {sha256: MediaObject}，仅包含已登记、大小一致
+    且文件仍在磁盘上的条目。size 为 None 时不校验大小。
+    """
+    expected = dict(items)
+    hashes = list(expected)
+    found = {}
+    rows = (
+        media
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE)
+        for media in MediaObject.objects.filter(sha256__in=hashes[start:start + LOOKUP_BATCH_SIZE])
+    )
+    for media in rows:
+        size = expected[media.sha256]
+        if size is not None and size != media.size:
+            continue
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, media.filename)):
+            found[media.sha256] = media
+    return found
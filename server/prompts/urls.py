@@ -1,7 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MarketPromptViewSet, CommentViewSet, InteractionView, MediaUploadView
-from .views_backup import CloudBackupView
+from .views import MarketPromptViewSet, CommentViewSet, InteractionView, MediaUploadView, MediaCheckView
+from .views_backup import (
+    CloudBackupView, BackupManifestView, BackupObjectUploadView, BackupObjectView, BackupFileView,
+    BackupSnapshotListView, BackupSnapshotView,
+)
 
 router = DefaultRouter()
 router.register(r'prompts', MarketPromptViewSet)
@@ -11,5 +14,12 @@ urlpatterns = [
     path('', include(router.urls)),
     path('interact/', InteractionView.as_view(), name='interact'),
     path('media/upload/', MediaUploadView.as_view(), name='media-upload'),
+    path('media/check/', MediaCheckView.as_view(), name='media-check'),
     path('backup/', CloudBackupView.as_view(), name='cloud-backup'),
+    path('backup/manifest/', BackupManifestView.as_view(), name='backup-manifest'),
+    path('backup/objects/', BackupObjectUploadView.as_view(), name='backup-object-upload'),
+    path('backup/objects/<str:file_hash>/', BackupObjectView.as_view(), name='backup-object'),
+    path('backup/files/', BackupFileView.as_view(), name='backup-file'),
+    path('backup/snapshots/', BackupSnapshotListView.as_view(), name='backup-snapshots'),
+    path('backup/snapshots/<str:snapshot_id>/', BackupSnapshotView.as_view(), name='backup-snapshot'),
 ]
@@ -0,0 +1,149 @@
+"""
+PromptVersion 的差量存储。
+
+采用反向差量：最新版本总是保存全文，发布新版本时把上一个版本改写为相对新版本的差量
+（见 delta.py）。版本号为 settings.PROMPT_VERSION_KEYFRAME_INTERVAL 整数倍的版本始终保留全文
+作为关键帧，还原任意版本最多沿版本链向上应用 间隔 - 1 个差量，且只需一次查询。
+列表摘要、全文检索等只读取最新版本的地方仍可直接使用 content 列。
+
+还原出的历史版本内容不可变，按 (prompt_id, version) 放入进程内 LRU 缓存。
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery
+
+from .delta import apply_delta, encode_delta
+from .models import PromptVersion
+
+# 进程内缓存的已还原版本数
+CACHE_SIZE = 1024
+
+
+def keyframe_interval():
+    return getattr(settings, 'PROMPT_VERSION_KEYFRAME_INTERVAL', 20)
+
+
+def is_keyframe(version):
+    return version % keyframe_interval() == 0
+
+
+class VersionCache:
+    """线程安全的 LRU：(prompt_id, version) -> 还原后的内容。"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+cache = VersionCache()
+
+
+def create_version(prompt, version, content, changelog=''):
+    """
+    以全文保存新版本，并把上一个版本（非关键帧时）改写为相对新版本的差量。
+    差量不比全文短时保留全文。
+    """
+    previous = version - 1
+    if previous < 1 or is_keyframe(previous):
+        return PromptVersion.objects.create(prompt=prompt, version=version, content=content, changelog=changelog)
+
+    # 已在外层事务中时不再建立保存点，任何失败都会回滚整个发布
+    with transaction.atomic(savepoint=False):
+        created = PromptVersion.objects.create(prompt=prompt, version=version, content=content, changelog=changelog)
+        text = PromptVersion.objects.filter(
+            prompt=prompt, version=previous, storage=PromptVersion.STORAGE_FULL
+        ).values_list('content', flat=True).first()
+        if text is not None:
+            delta = encode_delta(content, text)
+            if len(delta) < len(text):
+                PromptVersion.objects.filter(prompt=prompt, version=previous).update(
+                    storage=PromptVersion.STORAGE_DELTA, delta=delta, content=''
+                )
+                cache.put((prompt.pk, previous), text)
+    return created
+
+
+def _resolve(prompt_id, rows, remember=()):
+    """
+    按版本号从高到低还原 rows（PromptVersion 实例），返回 {version: content}。
+    差量行需要紧邻的上一版本已还原（或命中缓存），否则不出现在结果中。
+    只有 remember 中的版本写入缓存，避免一次还原整条版本链把缓存挤满。
+    """
+    texts = {}
+    above = None
+    for row in sorted(rows, key=lambda r: r.version, reverse=True):
+        if row.storage == PromptVersion.STORAGE_FULL:
+            text = row.content
+        else:
+            text = cache.get((prompt_id, row.version))
+            if text is None and above is not None and above[0] == row.version + 1:
+                text = apply_delta(above[1], row.delta)
+                if row.version in remember:
+                    cache.put((prompt_id, row.version), text)
+        if text is not None:
+            texts[row.version] = text
+        above = (row.version, text) if text is not None else None
+    return texts
+
+
+def _chain(prompt_id, low, high):
+    """读取 [low, 不小于 high 的第一个全文版本] 区间内的版本行，一次查询。"""
+    anchor = PromptVersion.objects.filter(
+        prompt_id=prompt_id, version__gte=high, storage=PromptVersion.STORAGE_FULL
+    ).order_by('version').values('version')[:1]
+    return PromptVersion.objects.filter(
+        prompt_id=prompt_id, version__gte=low, version__lte=Subquery(anchor)
+    ).only('version', 'storage', 'content', 'delta')
+
+
+def materialize(prompt_id, versions):
+    """
+    就地把 versions（同一提示词的 PromptVersion 实例）中差量行的 content 还原为全文。
+    传入的版本覆盖完整版本链（如全部版本）时不产生查询，否则补一次查询。结果不写入缓存。
+    """
+    versions = list(versions)
+    texts = _resolve(prompt_id, versions)
+    pending = [v.version for v in versions if v.version not in texts]
+    if pending:
+        texts.update(_resolve(prompt_id, _chain(prompt_id, min(pending), max(pending))))
+    for v in versions:
+        if v.storage == PromptVersion.STORAGE_DELTA:
+            v.content = texts[v.version]
+    return versions
+
+
+def get_contents(prompt_id, numbers):
+    """读取若干版本的全文，返回 {version: content}；不存在的版本不出现在结果中。"""
+    numbers = set(numbers)
+    texts = {}
+    for number in numbers:
+        text = cache.get((prompt_id, number))
+        if text is not None:
+            texts[number] = text
+    missing = numbers - texts.keys()
+    if missing:
+        resolved = _resolve(prompt_id, _chain(prompt_id, min(missing), max(missing)), remember=missing)
+        texts.update((number, resolved[number]) for number in missing if number in resolved)
+    return texts
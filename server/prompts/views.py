@@ -1,51 +1,117 @@
-import hashlib
 import os
+import re
+import uuid as uuid_module
 from django.conf import settings
-from rest_framework import viewsets, status, generics
+from django.core.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Substr
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import viewsets, status, generics, exceptions
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from .models import MarketPrompt, PromptVersion, Interaction, Comment
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from prompt_studio_be.pagination import MarketPromptCursorPagination, CommentCursorPagination
+from .models import (
+    MarketPrompt, PromptVersion, PromptTag, PromptSubscription, Interaction, Comment, parse_tag_names
+)
+from .search import get_search_backend
+from .comment_tree import build_comment_tree
+from .coalesce import notify_like
+from .delta import line_diff, word_diff
+from . import versioning
+from .uploads import (
+    HashingFileUploadHandler, publish_staged_file, register_media, find_stored_media, maybe_sweep_staging
+)
+from . import cache as market_cache
 from .serializers import (
-    MarketPromptSerializer, PromptVersionSerializer, 
+    MarketPromptSerializer, MarketPromptListSerializer, PromptVersionSerializer,
     CommentSerializer, InteractionSerializer
 )
 
+# 市场列表中最新版本内容摘要的最大长度（字符）
+LIST_CONTENT_SNIPPET_LENGTH = 200
+# 单次媒体去重查询最多携带的哈希数
+MEDIA_CHECK_MAX_ITEMS = 5000
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# 单次批量检查更新最多携带的提示词数
+LATEST_CHECK_MAX_ITEMS = 500
+
 class MediaUploadView(generics.CreateAPIView):
     """
     处理多媒体文件上传，按内容哈希去重。
+    上传流在接收时即完成哈希与写盘，随后原子地发布为 <sha256><ext>。
     """
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, *args, **kwargs):
-        file_obj = request.FILES.get('file')
-        if not file_obj:
-            return Response({"error": "没有文件被上传"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # 计算哈希
-        sha256_hash = hashlib.sha256()
-        for chunk in file_obj.chunks():
-            sha256_hash.update(chunk)
-        file_hash = sha256_hash.hexdigest()
-
-        # 确定扩展名
-        _, ext = os.path.splitext(file_obj.name)
-        filename = f"{file_hash}{ext}"
-        file_path = os.path.join(settings.MEDIA_ROOT, filename)
-
-        # 如果文件不存在，则保存
-        if not os.path.exists(file_path):
-            with open(file_path, 'wb+') as destination:
-                for chunk in file_obj.chunks():
-                    destination.write(chunk)
+        # 必须在首次访问 request.FILES 之前替换上传处理器
+        handler = HashingFileUploadHandler(request._request)
+        request.upload_handlers = [handler]
+        try:
+            file_obj = request.FILES.get('file')
+            if not file_obj:
+                return Response({"error": "没有文件被上传"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # 确定扩展名
+            _, ext = os.path.splitext(file_obj.name)
+            filename = f"{file_obj.sha256}{ext}"
+            file_path = os.path.join(settings.MEDIA_ROOT, filename)
+            publish_staged_file(file_obj.temporary_file_path(), file_path)
+            register_media(file_obj.sha256, file_obj.size, filename)
+        finally:
+            # 解析失败、缺少 file 字段或发布出错时同样删除本次请求的暂存文件
+            handler.discard_staged()
+        maybe_sweep_staging()
 
         file_url = request.build_absolute_uri(settings.MEDIA_URL + filename)
         return Response({
             "url": file_url,
-            "hash": file_hash
+            "hash": file_obj.sha256
         }, status=status.HTTP_201_CREATED)
 
+class MediaCheckView(generics.GenericAPIView):
+    """
+    上传前的批量去重查询：提交 {"files": [{"hash": ..., "size": ...}, ...]}（也可直接提交哈希字符串），
+    返回已在媒体库中的文件地址与需要上传的哈希列表。
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        files = request.data.get('files') if isinstance(request.data, dict) else None
+        if not isinstance(files, list):
+            return Response({"error": "files 必须是列表"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(files) > MEDIA_CHECK_MAX_ITEMS:
+            return Response(
+                {"error": f"单次最多查询 {MEDIA_CHECK_MAX_ITEMS} 个文件"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        items = {}
+        for item in files:
+            if isinstance(item, str):
+                item = {"hash": item}
+            if not isinstance(item, dict):
+                return Response({"error": "无效的条目", "item": item}, status=status.HTTP_400_BAD_REQUEST)
+            file_hash = str(item.get('hash', '')).lower()
+            size = item.get('size')
+            valid_size = size is None or (type(size) is int and size >= 0)
+            if not SHA256_PATTERN.match(file_hash) or not valid_size:
+                return Response({"error": "无效的哈希或大小", "item": item}, status=status.HTTP_400_BAD_REQUEST)
+            items[file_hash] = size
+
+        found = find_stored_media(items.items())
+        return Response({
+            "existing": {
+                file_hash: request.build_absolute_uri(settings.MEDIA_URL + media.filename)
+                for file_hash, media in found.items()
+            },
+            "missing": [file_hash for file_hash in items if file_hash not in found],
+        })
+
 class MarketPromptViewSet(viewsets.ModelViewSet):
     """
     市场提示词 CRUD。
@@ -53,44 +119,334 @@ class MarketPromptViewSet(viewsets.ModelViewSet):
     queryset = MarketPrompt.objects.all()
     serializer_class = MarketPromptSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    pagination_class = MarketPromptCursorPagination
     lookup_field = 'uuid'
 
     def get_queryset(self):
-        queryset = MarketPrompt.objects.all()
+        queryset = MarketPrompt.objects.select_related('owner')
         visibility = self.request.query_params.get('visibility', 'public')
         search = self.request.query_params.get('search')
+        tag_names = parse_tag_names(self.request.query_params.get('tags', ''))
         
-        if self.action == 'list':
+        if self.action in ('list', 'tag_facets'):
             queryset = queryset.filter(visibility='public')
+        if self.action == 'list':
+            queryset = queryset.annotate(
+                content_snippet=self._latest_snippet()
+            ).prefetch_related('tags')
+        elif self.action == 'retrieve':
+            queryset = queryset.prefetch_related('versions', 'tags')
         
         if search:
-            queryset = queryset.filter(title__icontains=search) | queryset.filter(tags__icontains=search)
+            queryset = get_search_backend().filter(queryset, search)
+        if tag_names:
+            tag_mode = self.request.query_params.get('tag_mode', 'and')
+            if tag_mode not in ('and', 'or'):
+                raise exceptions.ValidationError({"error": "tag_mode 只能是 and 或 or"})
+            queryset = self._filter_by_tags(queryset, tag_names, tag_mode)
             
         return queryset
 
+    @staticmethod
+    def _filter_by_tags(queryset, names, mode):
+        """
+        按标签精确筛选：mode=and 要求包含全部标签，mode=or 包含任一即可。
+        查询走 PromptTag 的 (tag, prompt) 索引，不扫描提示词表。
+        """
+        matched = PromptTag.objects.filter(tag__name__in=names)
+        if mode == 'or':
+            return queryset.filter(pk__in=matched.values('prompt'))
+        matched = matched.values('prompt').annotate(n=Count('tag')).filter(n=len(names))
+        return queryset.filter(pk__in=matched.values('prompt'))
+
+    @staticmethod
+    def _limit_param(request):
+        try:
+            limit = int(request.query_params.get('limit', settings.API_PAGE_SIZE))
+        except ValueError:
+            limit = settings.API_PAGE_SIZE
+        return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+    def list(self, request, *args, **kwargs):
+        return market_cache.conditional_response(
+            request,
+            market_cache.list_etag(request),
+            lambda: super(MarketPromptViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            meta = MarketPrompt.objects.filter(uuid=kwargs[self.lookup_field]).values_list(
+                'latest_version', 'updated_at', 'like_count', 'dislike_count'
+            ).first()
+        except ValidationError:
+            meta = None
+        if meta is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        latest_version, updated_at, like_count, dislike_count = meta
+        etag = market_cache.prompt_etag(
+            kwargs[self.lookup_field], latest_version, updated_at, like_count, dislike_count
+        )
+        return market_cache.conditional_response(
+            request, etag,
+            lambda: super(MarketPromptViewSet, self).retrieve(request, *args, **kwargs),
+            last_modified=updated_at,
+        )
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return MarketPromptListSerializer
+        return super().get_serializer_class()
+
+    @staticmethod
+    def _latest_snippet():
+        """在数据库端截取最新版本内容，避免把完整内容读入内存。"""
+        latest = PromptVersion.objects.filter(
+            prompt=OuterRef('pk'), version=OuterRef('latest_version')
+        ).annotate(
+            snippet=Substr('content', 1, LIST_CONTENT_SNIPPET_LENGTH)
+        ).values('snippet')[:1]
+        return Subquery(latest)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        按相关度排序的全文检索，附带标题高亮与内容摘要。
+        SQLite 上检索词过于常见时改为按收录先后返回最新的命中（rank 为 0），见 search.py。
+        """
+        query = request.query_params.get('q', '').strip()
+        limit = self._limit_param(request)
+
+        hits = get_search_backend().search(query, limit)
+        prompts = MarketPrompt.objects.select_related('owner').prefetch_related('tags').in_bulk(
+            [hit['prompt_id'] for hit in hits]
+        )
+        results = []
+        for hit in hits:
+            prompt = prompts.get(MarketPrompt._meta.pk.to_python(hit['prompt_id']))
+            if prompt is None:
+                continue
+            prompt.content_snippet = hit['snippet']
+            item = MarketPromptListSerializer(prompt).data
+            item['title_highlight'] = hit['title_highlight']
+            item['rank'] = hit['rank']
+            results.append(item)
+        return Response({"results": results})
+
+    @action(detail=False, methods=['get'])
+    def tag_facets(self, request):
+        """
+        当前结果集（可叠加 search、tags 条件）中各标签的提示词数量，按数量降序。
+        """
+        facets = (
+            PromptTag.objects
+            .filter(prompt__in=self.get_queryset().values('pk'))
+            .values('tag__name')
+            .annotate(count=Count('prompt'))
+            .order_by('-count', 'tag__name')[:self._limit_param(request)]
+        )
+        return Response({"results": [
+            {"name": facet['tag__name'], "count": facet['count']} for facet in facets
+        ]})
+
+    @action(detail=True, methods=['get'])
+    def comments(self, request, uuid=None):
+        """
+        评论树。depth / children 控制展开深度与每层回复数，limit 控制本层条数；
+        传入 parent / after（取自响应中的 next 或 more_replies）可加载更多评论或回复。
+        """
+        prompt = self.get_object()
+        params = request.query_params
+        try:
+            parent = int(params['parent']) if params.get('parent') else None
+            after = int(params['after']) if params.get('after') else None
+            depth = min(max(int(params.get('depth', 3)), 1), 10)
+            children = min(max(int(params.get('children', 10)), 1), 50)
+        except ValueError:
+            return Response({"error": "参数必须是整数"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results, next_cursor = build_comment_tree(
+            prompt, parent_id=parent, after=after,
+            limit=self._limit_param(request), depth=depth, children=children
+        )
+        return Response({"results": results, "next": next_cursor})
+
+    @action(detail=True, methods=['get'])
+    def versions(self, request, uuid=None):
+        """完整版本历史。"""
+        prompt = self.get_object()
+        versions = versioning.materialize(prompt.pk, prompt.versions.all())
+        serializer = PromptVersionSerializer(versions, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def diff(self, request, uuid=None):
+        """
+        两个版本间的对比：?from=<版本号>&to=<版本号>，to 缺省为最新版本；
+        mode=line（默认，未变部分按行数计）或 mode=word（未变部分按字符数计），格式见 delta.py。
+        两个版本由差量存储还原（一次查询，命中缓存时不查询）。
+        """
+        prompt = self.get_object()
+        try:
+            old = int(request.query_params['from'])
+            new = int(request.query_params.get('to', prompt.latest_version))
+        except (KeyError, ValueError):
+            return Response({"error": "from / to 必须是版本号"}, status=status.HTTP_400_BAD_REQUEST)
+        mode = request.query_params.get('mode', 'line')
+        if mode not in ('line', 'word'):
+            return Response({"error": "mode 必须是 line 或 word"}, status=status.HTTP_400_BAD_REQUEST)
+
+        contents = versioning.get_contents(prompt.pk, (old, new))
+        missing = [number for number in (old, new) if number not in contents]
+        if missing:
+            return Response({"error": f"版本不存在: {missing[0]}"}, status=status.HTTP_404_NOT_FOUND)
+        ops, stats = (word_diff if mode == 'word' else line_diff)(contents[old], contents[new])
+        return Response({"from": old, "to": new, "mode": mode, "ops": ops, **stats})
+
+    @action(detail=False, methods=['post'], permission_classes=[AllowAny])
+    def latest(self, request):
+        """
+        批量检查更新：{"prompts": {uuid: 本地版本号}}（或 uuid 列表），一次查询返回每条提示词的
+        最新版本号与更新时间；给出本地版本号时附带 has_update。私有提示词仅对所有者可见。
+        """
+        items = request.data.get('prompts') if isinstance(request.data, dict) else None
+        if isinstance(items, list):
+            items = dict.fromkeys(items)
+        if not isinstance(items, dict) or not items or len(items) > LATEST_CHECK_MAX_ITEMS:
+            return Response(
+                {"error": f"prompts 必须是不超过 {LATEST_CHECK_MAX_ITEMS} 项的 uuid 列表或 {{uuid: 版本号}}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        keys = {}
+        for key in items:
+            try:
+                keys[uuid_module.UUID(str(key))] = key
+            except ValueError:
+                return Response({"error": f"无效的 uuid: {key}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        visible = Q(visibility__in=('public', 'link'))
+        if request.user.is_authenticated:
+            visible |= Q(owner=request.user)
+        rows = MarketPrompt.objects.filter(visible, uuid__in=keys).values_list('uuid', 'latest_version', 'updated_at')
+
+        results = {}
+        for prompt_uuid, latest_version, updated_at in rows:
+            key = keys[prompt_uuid]
+            results[key] = {"latest_version": latest_version, "updated_at": updated_at}
+            local = items[key]
+            if type(local) is int:
+                results[key]["has_update"] = latest_version > local
+        return Response({"results": results, "missing": [key for key in items if key not in results]})
+
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
+    def subscribe(self, request, uuid=None):
+        """导入提示词时订阅其更新（POST），DELETE 取消订阅。"""
+        prompt = self.get_object()
+        if request.method == 'DELETE':
+            PromptSubscription.objects.filter(user=request.user, prompt=prompt).delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        PromptSubscription.objects.update_or_create(
+            user=request.user, prompt=prompt,
+            defaults={'imported_version': prompt.latest_version},
+        )
+        return Response({"status": "subscribed", "version": prompt.latest_version})
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 class CommentViewSet(viewsets.ModelViewSet):
+    """
+    评论的增删改与平铺列表（可按 ?prompt= 过滤）。按树形展示请使用 prompts/<uuid>/comments/。
+    """
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
+    pagination_class = CommentCursorPagination
+
+    def get_queryset(self):
+        queryset = Comment.objects.select_related('user').annotate(reply_count=Count('replies'))
+        prompt = self.request.query_params.get('prompt')
+        if prompt:
+            try:
+                prompt = uuid_module.UUID(prompt)
+            except ValueError:
+                raise exceptions.ValidationError({"error": "prompt 必须是提示词的 UUID"})
+            queryset = queryset.filter(prompt_id=prompt)
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 class InteractionView(generics.CreateAPIView):
+    """
+    点赞/点踩：新建、切换或取消（type 为空）投票，并在同一事务内维护 MarketPrompt 上的冗余计数。
+    新的点赞按时间窗聚合为作者的一条互动通知（见 coalesce.py）。
+    """
     serializer_class = InteractionSerializer
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, *args, **kwargs):
         prompt_uuid = request.data.get('prompt')
-        interaction_type = request.data.get('type')
-        
-        interaction, created = Interaction.objects.update_or_create(
-            user=request.user,
-            prompt_id=prompt_uuid,
-            defaults={'type': interaction_type}
-        )
-        
+        interaction_type = request.data.get('type') or None
+
+        valid_types = dict(Interaction.TYPE_CHOICES)
+        if interaction_type is not None and interaction_type not in valid_types:
+            return Response({"error": "无效的互动类型"}, status=status.HTTP_400_BAD_REQUEST)
+
+        prompt = get_object_or_404(MarketPrompt, uuid=prompt_uuid)
+
+        with transaction.atomic():
+            interaction = Interaction.objects.select_for_update().filter(
+                user=request.user, prompt=prompt
+            ).first()
+            previous_type = interaction.type if interaction else None
+
+            if interaction_type is None:
+                if interaction:
+                    interaction.delete()
+            elif interaction is None:
+                try:
+                    with transaction.atomic():
+                        interaction = Interaction.objects.create(
+                            user=request.user, prompt=prompt, type=interaction_type
+                        )
+                except IntegrityError:
+                    # 并发请求已抢先创建，锁定该行后按切换处理
+                    interaction = Interaction.objects.select_for_update().get(
+                        user=request.user, prompt=prompt
+                    )
+                    previous_type = interaction.type
+                    self._switch(interaction, interaction_type)
+            elif previous_type != interaction_type:
+                self._switch(interaction, interaction_type)
+
+            self._apply_counter_delta(prompt.pk, previous_type, interaction_type)
+            if interaction_type == 'like' and previous_type != 'like' and prompt.owner_id != request.user.id:
+                notify_like(prompt)
+
+        if interaction_type is None:
+            return Response({"prompt": prompt.pk, "type": None}, status=status.HTTP_200_OK)
         return Response(InteractionSerializer(interaction).data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _switch(interaction, interaction_type):
+        """改变已有互动的类型并记录表态时间（voted_at），聚合通知按它统计时间窗内的点赞人数。"""
+        if interaction.type == interaction_type:
+            return
+        interaction.type = interaction_type
+        interaction.voted_at = timezone.now()
+        interaction.save(update_fields=['type', 'voted_at'])
+
+    @staticmethod
+    def _apply_counter_delta(prompt_pk, previous_type, current_type):
+        if previous_type == current_type:
+            return
+        changes = {}
+        if previous_type:
+            changes[f'{previous_type}_count'] = F(f'{previous_type}_count') - 1
+        if current_type:
+            changes[f'{current_type}_count'] = F(f'{current_type}_count') + 1
+        # 使用 update 而非 save，避免刷新 updated_at 影响市场排序
+        MarketPrompt.objects.filter(pk=prompt_pk).update(**changes)
+        market_cache.invalidate_market_lists()
@@ -1,40 +1,215 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 import os
-import json
+import zlib
+
+from .backup_store import (
+    DEFAULT_MAX_BYTES, BackupStore, BlobsMissing, BlobUploadHandler, ManifestError, PayloadTooLarge,
+    SHA256_PATTERN, STREAM_CHUNK_SIZE, iter_gunzip, iter_gzip, iter_limited, parse_manifest_files,
+)
+from .json_stream import JsonStreamError
+
+
+def _accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def _iter_request_body(request):
+    """
+    逐块读取请求体，Content-Encoding 为 gzip 时边读边解压；
+    （解压后的）内容超过 BACKUP_MAX_BYTES 时抛出 PayloadTooLarge。
+    """
+    raw = request._request
+    max_size = getattr(settings, 'BACKUP_MAX_BYTES', DEFAULT_MAX_BYTES)
+    chunks = iter(lambda: raw.read(STREAM_CHUNK_SIZE), b'')
+    if request.META.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+        return iter_gunzip(chunks, max_size)
+    return iter_limited(chunks, max_size)
+
+
+def _iter_file(path):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(STREAM_CHUNK_SIZE), b'')
+
+
+def _blob_response(request, store, file_hash):
+    """返回 blob 内容：客户端接受 gzip 时直接发送磁盘上的压缩文件，否则边读边解压。"""
+    if _accepts_gzip(request):
+        response = FileResponse(open(store.object_path(file_hash), 'rb'), content_type='application/octet-stream')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(store.iter_object(file_hash), content_type='application/octet-stream')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
 
 class CloudBackupView(generics.CreateAPIView):
     """
     云端备份接口：接收用户的完整数据 JSON。
+    请求体可用 Content-Encoding: gzip 压缩，服务端逐块解压并按顶层键拆分为压缩 blob 存储，
+    未变化的部分不会重复写入；拉取时逐块拼装并以流式响应返回。
     """
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, *args, **kwargs):
-        data = request.data
-        if not data:
+        # 不经过 request.data：请求体按块读取，不整体载入内存
+        try:
+            manifest = BackupStore(request.user.id).save_json_stream(_iter_request_body(request))
+        except JsonStreamError as e:
+            return Response({"error": f"备份数据必须是 JSON 对象：{e}"}, status=status.HTTP_400_BAD_REQUEST)
+        except zlib.error:
+            return Response({"error": "无效的 gzip 数据"}, status=status.HTTP_400_BAD_REQUEST)
+        except PayloadTooLarge as e:
+            return Response({"error": f"备份数据过大：{e}"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except BlobsMissing as e:
+            return Response({"error": f"上传期间部分数据已被清理，请重新上传：{e}", "missing": e.missing},
+                            status=status.HTTP_409_CONFLICT)
+        if manifest is None:
             return Response({"error": "没有数据"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # 存储路径：server/backups/<user_id>/backup.json
-        backup_dir = os.path.join(settings.BASE_DIR, 'backups', str(request.user.id))
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        backup_file = os.path.join(backup_dir, 'backup.json')
-        with open(backup_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            
-        return Response({"status": "备份成功", "timestamp": os.path.getmtime(backup_file)})
+
+        # 存储路径：server/backups/<user_id>/
+        return Response({"status": "备份成功", "id": manifest["id"], "timestamp": manifest["timestamp"]})
 
     def get(self, request, *args, **kwargs):
         """
-        拉取备份。
+        拉取备份，?snapshot=<id> 拉取指定的历史快照。客户端接受 gzip 时压缩传输。
         """
-        backup_file = os.path.join(settings.BASE_DIR, 'backups', str(request.user.id), 'backup.json')
-        if not os.path.exists(backup_file):
+        store = BackupStore(request.user.id)
+        snapshot_id = request.query_params.get('snapshot')
+        manifest = store.read_manifest(snapshot_id)
+        if manifest is not None:
+            chunks = store.iter_json(manifest)
+        elif snapshot_id is None and os.path.exists(store.legacy_path):
+            # 旧版整份 backup.json
+            chunks = _iter_file(store.legacy_path)
+        else:
             return Response({"error": "未找到备份"}, status=status.HTTP_404_NOT_FOUND)
-            
-        with open(backup_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        return Response(data)
+
+        if _accepts_gzip(request):
+            response = StreamingHttpResponse(iter_gzip(chunks), content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = StreamingHttpResponse(chunks, content_type='application/json')
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+class BackupManifestView(generics.GenericAPIView):
+    """
+    增量备份清单：
+    GET 返回当前清单；POST 提交 {"files": {path: {"hash", "size"}}}，返回需要上传的哈希；
+    PUT 提交同样的清单作为新的备份，仍有缺失的 blob 时返回 409 与缺失列表。
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def _files(self, request):
+        return parse_manifest_files(request.data.get('files') if isinstance(request.data, dict) else None)
+
+    def get(self, request, *args, **kwargs):
+        manifest = BackupStore(request.user.id).read_manifest()
+        if manifest is None:
+            return Response({"error": "未找到备份"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(manifest)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            files = self._files(request)
+        except ManifestError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"missing": BackupStore(request.user.id).missing(files)})
+
+    def put(self, request, *args, **kwargs):
+        try:
+            files = self._files(request)
+        except ManifestError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        manifest, missing = BackupStore(request.user.id).commit(files)
+        if missing:
+            return Response({"error": "仍有文件未上传", "missing": missing}, status=status.HTTP_409_CONFLICT)
+        return Response({"status": "备份成功", "id": manifest["id"], "timestamp": manifest["timestamp"]})
+
+class BackupObjectUploadView(generics.GenericAPIView):
+    """
+    上传备份 blob：multipart 表单，每个文件字段以其 SHA-256 命名，可在一次请求中上传多个。
+    服务端在接收时计算哈希并压缩写盘，与字段名不符的文件被拒绝。
+    """
+    parser_classes = (MultiPartParser,)
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        store = BackupStore(request.user.id)
+        request.upload_handlers = [BlobUploadHandler(request._request, store)]
+        stored, rejected = [], []
+        try:
+            for field, writers in request.FILES.lists():
+                for writer in writers:
+                    if writer.sha256 == field.lower():
+                        store.publish_blob(writer)
+                        stored.append(writer.sha256)
+                    else:
+                        rejected.append(field)
+        finally:
+            for _, writers in request.FILES.lists():
+                for writer in writers:
+                    writer.discard()
+
+        if rejected:
+            return Response({"error": "内容与哈希不符", "stored": stored, "rejected": rejected},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({"stored": stored}, status=status.HTTP_201_CREATED)
+
+class BackupObjectView(generics.GenericAPIView):
+    """
+    按哈希下载单个备份 blob。
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, file_hash, *args, **kwargs):
+        store = BackupStore(request.user.id)
+        if not SHA256_PATTERN.match(file_hash) or not store.has_object(file_hash):
+            raise Http404
+        return _blob_response(request, store, file_hash)
+
+class BackupFileView(generics.GenericAPIView):
+    """
+    恢复单个文件：按清单中的路径（?path=）返回其内容，?snapshot=<id> 指定历史快照。
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        store = BackupStore(request.user.id)
+        manifest = store.read_manifest(request.query_params.get('snapshot'))
+        entry = manifest["files"].get(request.query_params.get('path', '')) if manifest else None
+        if entry is None or not store.has_object(entry["hash"]):
+            raise Http404
+        return _blob_response(request, store, entry["hash"])
+
+class BackupSnapshotListView(generics.GenericAPIView):
+    """
+    列出备份快照（从新到旧），含文件数与逻辑大小。
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(BackupStore(request.user.id).list_snapshots())
+
+class BackupSnapshotView(generics.GenericAPIView):
+    """
+    GET 返回指定快照的清单；POST 将其恢复为当前备份（生成新快照，不删除之后的历史）。
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, snapshot_id, *args, **kwargs):
+        manifest = BackupStore(request.user.id).read_manifest(snapshot_id)
+        if manifest is None:
+            raise Http404
+        return Response(manifest)
+
+    def post(self, request, snapshot_id, *args, **kwargs):
+        manifest = BackupStore(request.user.id).restore(snapshot_id)
+        if manifest is None:
+            raise Http404
+        return Response({"status": "恢复成功", "id": manifest["id"], "timestamp": manifest["timestamp"]})
@@ -0,0 +1,35 @@
+"""
+通知未读数缓存。
+
+每个用户一个键，值为未读通知数。缓存不做增量维护：通知新增、已读状态变化或删除后
+（事务提交时）直接删除对应的键，下次读取再用 (user, is_read, -created_at) 索引计数一次。
+bulk_create / update / delete 不触发模型信号，所有写入路径都需显式调用 invalidate_unread_counts。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification
+
+
+def _key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _timeout():
+    return getattr(settings, 'NOTIFICATION_COUNT_TIMEOUT', 300)
+
+
+def unread_count(user_id):
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(_key(user_id), count, _timeout())
+    return count
+
+
+def invalidate_unread_counts(user_ids):
+    """在当前事务提交后删除这些用户的未读数缓存。"""
+    keys = [_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
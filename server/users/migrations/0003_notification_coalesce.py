@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prompts', '0008_promptsubscription'),
+        ('users', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='prompt',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='prompts.marketprompt'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='window_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('user', 'prompt', 'category', 'window_start'), name='users_notif_coalesce_uniq'),
+        ),
+    ]
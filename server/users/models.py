@@ -24,6 +24,25 @@ class Notification(models.Model):
     link = models.CharField(max_length=255, blank=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # 聚合通知（见 prompts/coalesce.py）：同一提示词在同一时间窗内的多次事件合并为一行，
+    # count 为合并的事件数；普通通知这两个字段为空，不参与唯一约束
+    prompt = models.ForeignKey(
+        'prompts.MarketPrompt', null=True, blank=True, on_delete=models.CASCADE, related_name='+'
+    )
+    window_start = models.DateTimeField(null=True, blank=True)
+    count = models.PositiveIntegerField(default=1)
 
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # 聚合 upsert 的冲突目标；NULL 互不相等，普通通知不受影响
+            models.UniqueConstraint(
+                fields=['user', 'prompt', 'category', 'window_start'], name='users_notif_coalesce_uniq'
+            ),
+        ]
+        indexes = [
+            # 通知列表：按用户过滤 + (-created_at, -id) 游标分页
+            models.Index(fields=['user', '-created_at', '-id'], name='users_notif_user_created_idx'),
+            # 未读筛选与批量已读
+            models.Index(fields=['user', 'is_read', '-created_at'], name='users_notif_user_unread_idx'),
+        ]
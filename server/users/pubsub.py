@@ -0,0 +1,187 @@
+"""
+通知实时推送的发布/订阅。
+
+每个用户一个频道，消息是序列化后的通知（与 REST 接口字段一致）。通知写入后在事务提交时
+调用 publish_notifications 发布；SSE 连接（views_stream）通过 subscribe 订阅本用户频道，
+空闲连接只挂在 asyncio 队列上等待，不查询数据库。
+
+后端由 settings.NOTIFICATION_BROKER 指定：
+- LocalBroker（默认）：仅进程内投递，适合单进程部署；
+- RedisBroker：发布写入 Redis，每个进程一个后台线程订阅后转交本进程的 LocalBroker，
+  多进程 / 多机部署时通知才能送达连在其他进程上的客户端。
+消息可能丢失（订阅者积压、进程重启、Redis 断线），客户端应依靠 Last-Event-ID 断线续传从数据库补齐。
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# 单个订阅者允许积压的消息数，超过后断开该连接，由客户端带 Last-Event-ID 重连补齐
+SUBSCRIBER_MAX_PENDING = 256
+
+# 订阅者积压溢出时放入队列的标记
+LAGGED = object()
+
+
+class Subscription:
+    """一个连接对某频道的订阅，只能在创建它的事件循环中读取；deliver 可在任意线程调用。"""
+
+    def __init__(self, broker, channel, max_pending=SUBSCRIBER_MAX_PENDING):
+        self.broker = broker
+        self.channel = channel
+        self.max_pending = max_pending
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+
+    def deliver(self, message):
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # 事件循环已关闭，连接随之结束，等待 close 取消订阅
+            pass
+
+    def _put(self, message):
+        if self._queue.qsize() >= self.max_pending:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            message = LAGGED
+        self._queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """等待下一条消息，超时返回 None；积压溢出后返回 LAGGED。"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """进程内的频道表：频道 -> 订阅集合。"""
+
+    def __init__(self, **options):
+        self._channels = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """在当前事件循环中订阅频道，用完后调用 Subscription.close。"""
+        subscription = Subscription(self, str(channel))
+        with self._lock:
+            self._channels[subscription.channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[subscription.channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(str(channel), ()))
+            return sum(len(subscribers) for subscribers in self._channels.values())
+
+    def publish(self, channel, message):
+        self.dispatch(str(channel), message)
+
+    def dispatch(self, channel, message):
+        """投递给本进程内该频道的订阅者。"""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+
+class RedisBroker(LocalBroker):
+    """
+    通过 Redis PUBLISH / PSUBSCRIBE 在进程间转发。
+    每个进程只保持一条订阅连接，进程内的多个 SSE 连接仍由 LocalBroker 分发。
+    """
+    prefix = 'notifications:'
+
+    def __init__(self, url, **options):
+        super().__init__(**options)
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, channel):
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def publish(self, channel, message):
+        self._redis.publish(f'{self.prefix}{channel}', json.dumps(message))
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='notification-broker', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f'{self.prefix}*')
+        try:
+            for item in pubsub.listen():
+                channel = item['channel'].decode()[len(self.prefix):]
+                try:
+                    message = json.loads(item['data'])
+                except ValueError:
+                    logger.warning('忽略无法解析的通知消息: %r', item['data'][:200])
+                    continue
+                self.dispatch(channel, message)
+        except Exception:
+            # 连接断开后线程退出，下一个订阅者到来时重建；期间的消息由客户端续传补齐
+            logger.exception('通知订阅连接中断')
+        finally:
+            pubsub.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = getattr(settings, 'NOTIFICATION_BROKER', {})
+            backend = import_string(config.get('BACKEND', 'users.pubsub.LocalBroker'))
+            _broker = backend(**config.get('OPTIONS', {}))
+        return _broker
+
+
+def publish_notifications(notifications):
+    """在当前事务提交后把新通知推送给各自用户的频道。通知需已有主键。"""
+    from .serializers import NotificationSerializer
+
+    messages = [
+        (notification.user_id, NotificationSerializer(notification).data)
+        for notification in notifications
+    ]
+    if not messages:
+        return
+
+    def publish():
+        broker = get_broker()
+        for user_id, message in messages:
+            try:
+                broker.publish(user_id, message)
+            except Exception:
+                logger.exception('推送通知 %s 失败', message.get('id'))
+
+    transaction.on_commit(publish)
@@ -28,4 +28,5 @@ from .models import Notification
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ('id', 'category', 'title', 'message', 'link', 'is_read', 'created_at')
+        fields = ('id', 'category', 'title', 'message', 'link', 'is_read', 'created_at', 'count')
+        read_only_fields = ('count',)
@@ -0,0 +1,179 @@
+"""
+用户与通知接口的 SQL 查询数预算测试（约定同 prompts/tests.py），以及通知推送接口测试。
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import User, Notification
+from .pubsub import get_broker, publish_notifications
+
+DATA_SIZES = (1, 10)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class NotificationQueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_notifications(self, count):
+        Notification.objects.bulk_create([
+            Notification(user=self.user, category='update', title=f'n{i}', message='m')
+            for i in range(count)
+        ])
+
+    def test_list(self):
+        for size in DATA_SIZES:
+            self.make_notifications(size)
+            with self.subTest(size=size), self.assertNumQueries(1):
+                self.client.get('/api/auth/notifications/')
+
+    def test_mark_all_as_read(self):
+        for size in DATA_SIZES:
+            self.make_notifications(size)
+            with self.subTest(size=size), self.assertNumQueries(1):
+                self.client.post('/api/auth/notifications/mark_all_as_read/')
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+
+    def test_partial_update(self):
+        self.make_notifications(1)
+        notification = Notification.objects.get()
+        with self.assertNumQueries(2):
+            self.client.patch(f'/api/auth/notifications/{notification.id}/', {'is_read': True}, format='json')
+
+    def test_unread_count_cached_and_invalidated(self):
+        url = '/api/auth/notifications/unread_count/'
+        for size in DATA_SIZES:
+            self.make_notifications(size)
+            cache.clear()
+            with self.subTest(size=size), self.assertNumQueries(1):
+                self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data['unread'], 11)
+
+        notification = Notification.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/auth/notifications/{notification.id}/', {'is_read': True}, format='json')
+        self.assertEqual(self.client.get(url).data['unread'], 10)
+
+    def test_bulk_mark_read_and_delete(self):
+        for size in DATA_SIZES:
+            self.make_notifications(size)
+        Notification.objects.bulk_create([Notification(user=self.user, category='comment', title='c', message='m')])
+        ids = list(Notification.objects.filter(category='update').values_list('id', flat=True)[:3])
+
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/notifications/mark_read/', {'ids': ids}, format='json')
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(self.client.get('/api/auth/notifications/unread_count/').data['unread'], 9)
+
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/auth/notifications/bulk_delete/', {
+                'category': 'update', 'before': '2999-01-01'
+            }, format='json')
+        self.assertEqual(response.data['deleted'], 11)
+        self.assertEqual(list(Notification.objects.values_list('category', flat=True)), ['comment'])
+
+        for bad in ({}, {'ids': 'x'}, {'category': 'nope'}, {'before': 'yesterday'}, [1, 2], 'ids'):
+            for action in ('bulk_delete', 'mark_read'):
+                response = self.client.post(f'/api/auth/notifications/{action}/', bad, format='json')
+                self.assertEqual(response.status_code, 400, bad)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AuthQueryBudgetTests(TestCase):
+    def test_register(self):
+        client = APIClient()
+        with self.assertNumQueries(3):
+            response = client.post('/api/auth/register/', {
+                'username': 'new', 'email': 'new@example.com', 'password': 'pass'
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_token(self):
+        User.objects.create_user(username='login', password='pass')
+        with self.assertNumQueries(1):
+            response = APIClient().post('/api/auth/token/', {
+                'username': 'login', 'password': 'pass'
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    NOTIFICATION_STREAM_HEARTBEAT=0.05,
+)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='listener', password='pass')
+        self.url = f'/api/auth/notifications/stream/?token={AccessToken.for_user(self.user)}'
+
+    def create_notification(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(user=self.user, category='update', title=title, message='m')
+            publish_notifications([notification])
+        return notification
+
+    async def disconnect(self, stream):
+        """模拟客户端断开：ASGI 处理器会取消正在读取响应的任务。"""
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+
+    async def next_event(self, stream):
+        """读取下一条通知事件，跳过心跳与 retry 指令。"""
+        while True:
+            chunk = (await asyncio.wait_for(anext(stream), 1)).decode()
+            if chunk.startswith('id: '):
+                head, data = chunk.strip().split('\n')
+                return int(head[4:]), json.loads(data[6:])
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/api/auth/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refused_under_wsgi(self):
+        # 同步测试客户端走 WSGI 处理器
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 501)
+
+    async def test_resume_then_live(self):
+        first = await sync_to_async(self.create_notification)('first')
+        second = await sync_to_async(self.create_notification)('second')
+        response = await self.async_client.get(self.url, headers={'Last-Event-ID': str(first.id)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        event_id, data = await self.next_event(stream)
+        self.assertEqual((event_id, data['title']), (second.id, 'second'))
+
+        third = await sync_to_async(self.create_notification)('third')
+        event_id, data = await self.next_event(stream)
+        self.assertEqual((event_id, data['title']), (third.id, 'third'))
+        self.assertEqual(get_broker().subscriber_count(self.user.id), 1)
+
+        await self.disconnect(stream)
+        self.assertEqual(get_broker().subscriber_count(self.user.id), 0)
+
+    async def test_idle_connection_does_not_query(self):
+        response = await self.async_client.get(self.url)
+        stream = aiter(response.streaming_content)
+        queries = CaptureQueriesContext(connection)
+        await sync_to_async(queries.__enter__)()
+        chunks = [await asyncio.wait_for(anext(stream), 1) for _ in range(4)]
+        await sync_to_async(queries.__exit__)(None, None, None)
+        await self.disconnect(stream)
+
+        self.assertEqual(chunks[1:], [b': ping\n\n'] * 3)
+        self.assertEqual(len(queries), 0)
@@ -5,11 +5,14 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from .views import RegisterView, NotificationViewSet
+from .views_stream import NotificationStreamView
 
 router = DefaultRouter()
 router.register(r'notifications', NotificationViewSet, basename='notifications')
 
 urlpatterns = [
+    # 需在路由表之前，否则会被通知详情路由当作 pk 匹配
+    path('notifications/stream/', NotificationStreamView.as_view(), name='notification_stream'),
     path('', include(router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -1,13 +1,38 @@
+from datetime import datetime, time
+
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from prompt_studio_be.pagination import NotificationCursorPagination
 from .serializers import UserSerializer, NotificationSerializer
 from .models import Notification
+from .cache import unread_count, invalidate_unread_counts
+from .pubsub import publish_notifications
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 User = get_user_model()
 
+# 批量操作单次最多携带的通知 id 数
+BULK_MAX_IDS = 1000
+
+
+def _parse_moment(value):
+    """解析 ISO 日期或时间；只给日期时取当天零点（当前时区）。无法解析时返回 None。"""
+    try:
+        moment = parse_datetime(value) or parse_date(value)
+    except (TypeError, ValueError):
+        return None
+    if moment is None:
+        return None
+    if not hasattr(moment, 'hour'):
+        moment = datetime.combine(moment, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
@@ -30,11 +55,84 @@ class RegisterView(generics.CreateAPIView):
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
 
+    def perform_create(self, serializer):
+        notification = serializer.save(user=self.request.user)
+        invalidate_unread_counts([self.request.user.id])
+        publish_notifications([notification])
+
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_unread_counts([self.request.user.id])
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_unread_counts([self.request.user.id])
+
+    def _bulk_queryset(self, request):
+        """
+        按 ids（至多 BULK_MAX_IDS 个）、category、before / after（ISO 日期或时间）筛选当前用户的通知，
+        至少需要一个条件。返回 (queryset, 错误信息)。
+        """
+        queryset = self.get_queryset()
+        data = request.data
+        if not isinstance(data, dict):
+            return None, "请求体必须是 JSON 对象"
+        if not any(data.get(field) for field in ('ids', 'category', 'before', 'after')):
+            return None, "需要 ids、category、before 或 after 中的至少一个条件"
+
+        ids = data.get('ids')
+        if ids:
+            if not isinstance(ids, list) or len(ids) > BULK_MAX_IDS or not all(type(i) is int for i in ids):
+                return None, f"ids 必须是不超过 {BULK_MAX_IDS} 个整数的列表"
+            queryset = queryset.filter(id__in=ids)
+
+        category = data.get('category')
+        if category:
+            if category not in dict(Notification.CATEGORY_CHOICES):
+                return None, "无效的通知类型"
+            queryset = queryset.filter(category=category)
+
+        for field, lookup in (('before', 'created_at__lt'), ('after', 'created_at__gte')):
+            value = data.get(field)
+            if value:
+                moment = _parse_moment(value)
+                if moment is None:
+                    return None, f"无效的日期: {field}"
+                queryset = queryset.filter(**{lookup: moment})
+        return queryset, None
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """未读数（角标轮询用），命中缓存时不查询数据库。"""
+        return Response({"unread": unread_count(request.user.id)})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """按 ids / category / 日期范围批量标记已读。"""
+        queryset, error = self._bulk_queryset(request)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        updated = queryset.filter(is_read=False).update(is_read=True)
+        invalidate_unread_counts([request.user.id])
+        return Response({"updated": updated})
+
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """按 ids / category / 日期范围批量删除。"""
+        queryset, error = self._bulk_queryset(request)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        deleted, _ = queryset.delete()
+        invalidate_unread_counts([request.user.id])
+        return Response({"deleted": deleted})
+
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        invalidate_unread_counts([request.user.id])
         return Response({"status": "ok"})
\ No newline at end of file
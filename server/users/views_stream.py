@@ -0,0 +1,127 @@
+"""
+通知的 SSE 推送接口：GET /api/auth/notifications/stream/
+
+只能运行在 ASGI 下（如 uvicorn prompt_studio_be.asgi:application，docker-compose 即如此启动）。
+WSGI 处理器（manage.py runserver、gunicorn 等）会先把异步流式响应整个读完再发送，推送永远不会送达，
+因此 WSGI 下本接口直接返回 501，客户端应退回轮询 GET /api/auth/notifications/unread_count/ 与通知列表。
+鉴权与其他接口相同使用 JWT，浏览器 EventSource 无法设置请求头，可改用 ?token=<access token>。
+
+事件 id 即通知 id。带 Last-Event-ID 头（或 ?last_event_id=）重连时，先从数据库补发该 id 之后的通知，
+再转入实时推送；之后只在 pubsub 队列上等待，空闲连接除定期心跳外没有任何开销，不轮询数据库。
+聚合通知（prompts/coalesce.py）原地更新时以原 id 再次推送，客户端按 id 覆盖；续传只补发新行，
+断线期间被更新的旧行需由客户端刷新列表获得。
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .models import Notification
+from .pubsub import LAGGED, get_broker
+from .serializers import NotificationSerializer
+
+# 补发时每次从数据库读取的通知数
+REPLAY_BATCH_SIZE = 100
+
+# 建议客户端断线后的重连间隔（毫秒）
+RECONNECT_DELAY_MS = 3000
+
+
+def _heartbeat_interval():
+    return getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+
+
+def _event(data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+def _authenticate(request):
+    """返回 (user, 错误信息)。优先使用 Authorization 头，其次 ?token=。"""
+    auth = JWTAuthentication()
+    raw_token = None
+    header = auth.get_header(request)
+    if header is not None:
+        raw_token = auth.get_raw_token(header)
+    if raw_token is None:
+        raw_token = request.GET.get('token')
+    if not raw_token:
+        return None, '未提供身份认证信息'
+    try:
+        user = auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed) as e:
+        return None, str(getattr(e, 'detail', e))
+    return user, None
+
+
+def _parse_last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return max(int(value), 0) if value else None
+    except ValueError:
+        return None
+
+
+def _replay(user_id, after_id):
+    """读取 after_id 之后的一批通知（按 id 升序）。"""
+    queryset = Notification.objects.filter(user_id=user_id, id__gt=after_id).order_by('id')
+    return NotificationSerializer(queryset[:REPLAY_BATCH_SIZE], many=True).data
+
+
+class NotificationStreamView(View):
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'detail': '实时推送需要 ASGI 服务器，请改为轮询通知接口'}, status=501)
+        user, error = await sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse({'detail': error}, status=401)
+
+        response = StreamingHttpResponse(
+            self._stream(user.id, _parse_last_event_id(request)),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # 关闭 nginx 等反向代理的响应缓冲
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def _stream(self, user_id, last_id):
+        # 先订阅再补发，补发期间到达的实时消息按 (id, count) 去重，不会漏也不会重复
+        subscription = get_broker().subscribe(user_id)
+        replayed = set()
+        try:
+            yield f'retry: {RECONNECT_DELAY_MS}\n\n'.encode()
+            if last_id is not None:
+                while True:
+                    batch = await sync_to_async(_replay)(user_id, last_id)
+                    for item in batch:
+                        last_id = item['id']
+                        replayed.add((item['id'], item['count']))
+                        yield _event(item, last_id)
+                    if len(batch) < REPLAY_BATCH_SIZE:
+                        break
+
+            while True:
+                message = await subscription.get(timeout=_heartbeat_interval())
+                if message is None:
+                    # 补发期间积压的实时消息此时已处理完
+                    replayed.clear()
+                    yield b': ping\n\n'
+                elif message is LAGGED:
+                    # 积压溢出：结束连接，客户端带 Last-Event-ID 重连后从数据库补齐
+                    return
+                elif (message['id'], message['count']) not in replayed:
+                    # 事件 id 只增不减，聚合通知更新旧行时不回退续传位置
+                    last_id = max(last_id or 0, message['id'])
+                    yield _event(message, last_id)
+        finally:
+            subscription.close()